@@ -0,0 +1,255 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import APIException
+
+from user.authentication import CachedTokenAuthentication
+from .cache import LRUCache
+from .routing import SAFE_METHODS
+
+READ = 'read'
+HEAVY = 'heavy'
+WRITE = 'write'
+
+ADMITTED = 'admitted'
+QUEUED = 'queued'
+QUEUE_FULL = 'queue_full'
+TIMED_OUT = 'timed_out'
+RATE_LIMITED = 'rate_limited'
+
+DEFAULT_LIMITS = {
+    READ: {'CONCURRENCY': 32, 'QUEUE_SIZE': 64},
+    HEAVY: {'CONCURRENCY': 4, 'QUEUE_SIZE': 8},
+    WRITE: {'CONCURRENCY': 8, 'QUEUE_SIZE': 16},
+}
+
+
+def _settings():
+    return getattr(settings, 'CALENDAR_ADMISSION', {})
+
+
+def is_enabled():
+    return _settings().get('ENABLED', True)
+
+
+class _Waiter:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def wake(self):
+        self.event.set()
+
+
+class _AsyncWaiter:
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def wake(self):
+        self.loop.call_soon_threadsafe(self._set)
+
+    def _set(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class Limiter:
+    """
+    At most ``concurrency`` requests at a time, and at most ``queue_size`` more waiting (first come, first
+    served) for up to ``timeout`` seconds. A released slot is handed to the oldest waiter directly, so a
+    newcomer can't overtake the queue. Works for threads and event loops alike.
+    """
+
+    def __init__(self, concurrency, queue_size):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, waiter_class):
+        with self._lock:
+            if self.active < self.concurrency and not self._waiters:
+                self.active += 1
+                return ADMITTED, None
+            if len(self._waiters) >= self.queue_size:
+                return QUEUE_FULL, None
+            waiter = waiter_class()
+            self._waiters.append(waiter)
+            return QUEUED, waiter
+
+    def _abandon(self, waiter):
+        """Leaves the queue; returns False if a slot was handed over in the meantime."""
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return False
+            return True
+
+    def acquire(self, timeout):
+        decision, waiter = self._try_acquire(_Waiter)
+        if decision != QUEUED or waiter.event.wait(timeout) or not self._abandon(waiter):
+            return decision
+        return TIMED_OUT
+
+    async def aacquire(self, timeout):
+        decision, waiter = self._try_acquire(_AsyncWaiter)
+        if decision != QUEUED:
+            return decision
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                return TIMED_OUT
+        except asyncio.CancelledError:
+            if not self._abandon(waiter):
+                self.release()
+            raise
+        return decision
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().wake()
+            else:
+                self.active -= 1
+
+
+class RateBudgets:
+    """
+    Token buckets per identity: ``burst`` requests at once, refilled at ``rate`` requests per second.
+    """
+
+    def __init__(self, maxsize=10000):
+        self._buckets = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def spend(self, identity, rate, burst):
+        """Takes one request from the identity's budget; returns 0, or the seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(identity) or (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets.set(identity, (tokens - 1, now))
+                return 0
+            self._buckets.set(identity, (tokens, now))
+            return (1 - tokens) / rate
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class Decisions:
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, route_class, decision):
+        with self._lock:
+            self._counts[route_class, decision] = self._counts.get((route_class, decision), 0) + 1
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+decisions = Decisions()
+budgets = RateBudgets()
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(route_class):
+    limits = {**DEFAULT_LIMITS[route_class], **_settings().get('LIMITS', {}).get(route_class, {})}
+    key = (route_class, limits['CONCURRENCY'], limits['QUEUE_SIZE'])
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = Limiter(limits['CONCURRENCY'], limits['QUEUE_SIZE'])
+        return limiter
+
+
+def classify(request):
+    """
+    The route class of ``request``: ``write`` for unsafe methods, ``heavy`` for reads of the views named in
+    ``HEAVY_VIEWS``, ``read`` otherwise; None for the views in ``EXEMPT_VIEWS``.
+    """
+    try:
+        view_name = resolve(request.path_info, getattr(request, 'urlconf', None)).view_name
+    except Resolver404:
+        view_name = None
+    options = _settings()
+    if view_name in options.get('EXEMPT_VIEWS', ()):
+        return None
+    if request.method not in SAFE_METHODS:
+        return WRITE
+    return HEAVY if view_name in options.get('HEAVY_VIEWS', ()) else READ
+
+
+def _rate(options):
+    rate, burst = options.get('TOKEN_RATE'), options.get('TOKEN_BURST')
+    return (rate, burst) if rate and burst else None
+
+
+def check_budget(request):
+    """
+    Spends one request from the budget of the request's token; returns 0, or the seconds to wait if it is
+    exhausted. Requests without a valid token are left to the view, which rejects them anyway.
+    """
+    rate = _rate(_settings())
+    if rate is None:
+        return 0
+    try:
+        auth = CachedTokenAuthentication().authenticate(request)
+    except APIException:
+        auth = None
+    return 0 if auth is None else budgets.spend(auth[1].key, *rate)
+
+
+async def acheck_budget(request):
+    rate = _rate(_settings())
+    if rate is None:
+        return 0
+    auth = await CachedTokenAuthentication().aauthenticate(request)
+    return 0 if auth is None else budgets.spend(auth[1].key, *rate)
+
+
+def queue_timeout():
+    return _settings().get('QUEUE_TIMEOUT', 1.0)
+
+
+def rejected(route_class, decision, retry_after=None):
+    decisions.record(route_class, decision)
+    if decision == RATE_LIMITED:
+        response = JsonResponse({"message": "Request rate limit exceeded."}, status=429)
+    else:
+        response = JsonResponse({"message": "The server is busy, try again later."}, status=503)
+        retry_after = _settings().get('RETRY_AFTER', 1)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def render_metrics():
+    """The limit decisions in the Prometheus text exposition format."""
+    name = 'calendar_admission_decisions_total'
+    lines = [f'# HELP {name} Admission control decisions, by route class.', f'# TYPE {name} counter']
+    for (route_class, decision), count in sorted(decisions.as_dict().items()):
+        lines.append(f'{name}{{class="{route_class}",decision="{decision}"}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def clear():
+    decisions.clear()
+    budgets.clear()
@@ -0,0 +1,105 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import AgendaEntry, Calendar, Event
+
+# Keeps statements under SQLite's bound-parameter limit.
+BATCH_SIZE = 500
+
+
+def is_enabled():
+    """
+    The agenda table is optional; when disabled it is neither written nor read, and /api/agenda/ joins
+    events against the membership table instead.
+    """
+    return getattr(settings, 'CALENDAR_AGENDA', {}).get('ENABLED', True)
+
+
+def _batches(items, size=BATCH_SIZE):
+    items = list(items)
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+def fan_out(events, created_ids=()):
+    """
+    Rewrites the agenda entries of ``events``: one per member of each event's calendar. Constant in
+    the number of queries: the members of every calendar involved, then a delete and an insert per batch.
+    Events in ``created_ids`` are new and have no entries to delete.
+    """
+    events = list({event.pk: event for event in events if event.pk is not None}.values())
+    if not events or not is_enabled():
+        return
+    members = defaultdict(list)
+    memberships = Calendar.users.through.objects.filter(calendar_id__in={event.calendar_id for event in events})
+    for calendar_id, user_id in memberships.values_list('calendar_id', 'customuser_id'):
+        members[calendar_id].append(user_id)
+    for batch in _batches({event.pk for event in events} - set(created_ids)):
+        AgendaEntry.objects.filter(event_id__in=batch).delete()
+    AgendaEntry.objects.bulk_create([
+        AgendaEntry(user_id=user_id, calendar_id=event.calendar_id, event_id=event.pk, timestamp=event.timestamp)
+        for event in events for user_id in members[event.calendar_id]
+    ], batch_size=BATCH_SIZE)
+
+
+def update_event(event, created):
+    if not is_enabled():
+        return
+    if not created:
+        # Same calendar: the members are the same, only the timestamp may have moved.
+        if AgendaEntry.objects.filter(event_id=event.pk, calendar_id=event.calendar_id).update(
+                timestamp=event.timestamp):
+            return
+    fan_out([event], [event.pk] if created else ())
+
+
+def add_memberships(calendar_ids, user_ids):
+    """
+    Adds the events of ``calendar_ids`` to the agendas of ``user_ids`` for the memberships that exist
+    between them, in one ``INSERT ... SELECT``.
+    """
+    if not calendar_ids or not user_ids or not is_enabled():
+        return
+    quote = connection.ops.quote_name
+    through = Calendar.users.through._meta.db_table
+    calendar_ids, user_ids = list(calendar_ids), list(user_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(AgendaEntry._meta.db_table)} (user_id, calendar_id, event_id, timestamp) "
+            f"SELECT m.customuser_id, e.calendar_id, e.id, e.timestamp FROM {quote(Event._meta.db_table)} e "
+            f"INNER JOIN {quote(through)} m ON m.calendar_id = e.calendar_id "
+            f"WHERE m.calendar_id IN ({', '.join(['%s'] * len(calendar_ids))}) "
+            f"AND m.customuser_id IN ({', '.join(['%s'] * len(user_ids))})", calendar_ids + user_ids)
+
+
+def remove_memberships(calendar_ids=None, user_ids=None):
+    if not is_enabled():
+        return
+    entries = AgendaEntry.objects.all()
+    if calendar_ids is not None:
+        entries = entries.filter(calendar_id__in=calendar_ids)
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+    entries.delete()
+
+
+def backfill(batch_size=1000, progress=None):
+    """
+    Rewrites the agenda entries of every event, walking the events table by primary key in batches of
+    ``batch_size`` with one transaction per batch, so it can run on a live database.
+    Returns the number of events processed.
+    """
+    queryset = Event.objects.order_by('id').only('id', 'calendar_id', 'timestamp')
+    last_id, total = 0, 0
+    while True:
+        events = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not events:
+            break
+        with transaction.atomic():
+            fan_out(events)
+        last_id, total = events[-1].pk, total + len(events)
+        if progress is not None:
+            progress(total)
+    return total
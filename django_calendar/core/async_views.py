@@ -0,0 +1,192 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from user.authentication import CachedTokenAuthentication
+from user.models import CustomUser
+from .etags import etag_matches, not_modified
+from .filters import parse_window_params
+from .freebusy import aget_busy_intervals
+from .membership import ahas_calendar_access
+from .models import Calendar
+from .permissions import HasEventAccess
+from .representation import get_fast_representation
+from .routing import ReplicaReadMixin, aroute_request
+from .views import CalendarViewSet, EventViewSet, FreeBusyView
+
+
+class AsyncReadView(View):
+    """
+    Serves ``GET`` on the event loop for token-authenticated JSON clients, reusing the querysets, filters,
+    serializers and responses of the DRF ``view_class`` and only reading the database through the async ORM.
+
+    Everything else (writes, session auth, invalid tokens, the browsable API) is handed to the regular
+    DRF view in a worker thread, so both paths answer the same URL identically.
+    """
+
+    view_class = None
+    actions = None
+    object_permissions = ()
+    fallback = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        fallback = cls.view_class.as_view(cls.actions) if cls.actions else cls.view_class.as_view()
+        view = super().as_view(fallback=fallback, **initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return await self.delegate(request, *args, **kwargs)
+        auth = await CachedTokenAuthentication().aauthenticate(request)
+        if auth is None:
+            return await self.delegate(request, *args, **kwargs)
+        self.view = view = self.view_class()
+        if self.actions:
+            view.action_map = self.actions
+            view.action = self.actions['get']
+        view.args, view.kwargs, view.format_kwarg = args, kwargs, None
+        drf_request = view.initialize_request(request, *args, **kwargs)
+        try:
+            renderer, media_type = view.perform_content_negotiation(drf_request)
+        except NotAcceptable:
+            return await self.delegate(request, *args, **kwargs)
+        if not isinstance(renderer, JSONRenderer):
+            return await self.delegate(request, *args, **kwargs)
+        drf_request.accepted_renderer, drf_request.accepted_media_type = renderer, media_type
+        drf_request.user, drf_request.auth = auth
+        if isinstance(view, ReplicaReadMixin):
+            await aroute_request(drf_request)
+        view.request = drf_request
+        view.headers = view.default_response_headers
+        try:
+            view.check_permissions(drf_request)
+            response = await self.get(drf_request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        return self.render(view.finalize_response(drf_request, response, *args, **kwargs))
+
+    async def delegate(self, request, *args, **kwargs):
+        return await sync_to_async(self.fallback)(request, *args, **kwargs)
+
+    @staticmethod
+    def render(response):
+        # Django renders responses that still have a ``render`` method in a worker thread; return the bytes instead.
+        response.render()
+        rendered = HttpResponse(response.content, status=response.status_code, headers=response.headers)
+        rendered.data = response.data
+        return rendered
+
+    async def aget_object(self):
+        view = self.view
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        queryset = view.filter_queryset(view.get_queryset())
+        try:
+            obj = await queryset.filter(**{view.lookup_field: view.kwargs[lookup_url_kwarg]}).afirst()
+        except (TypeError, ValueError, ValidationError):
+            obj = None
+        if obj is None:
+            raise Http404
+        for permission in self.object_permissions:
+            if not await permission.ahas_object_permission(view.request, view, obj):
+                view.permission_denied(view.request, message=getattr(permission, 'message', None),
+                                       code=getattr(permission, 'code', None))
+        return obj
+
+
+class VersionedListAsyncView(AsyncReadView):
+    async def get(self, request, *args, **kwargs):
+        etag = await self.view.aget_list_etag()
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response = await self.list(request)
+        response['ETag'] = etag
+        return response
+
+
+class EventListAsyncView(VersionedListAsyncView):
+    view_class = EventViewSet
+    actions = {'get': 'list', 'post': 'create'}
+
+    async def list(self, request):
+        view = self.view
+        queryset = view.filter_queryset(view.get_queryset())
+        representation = get_fast_representation(view.get_serializer_class())
+        if representation is not None:
+            page = await view.paginator.apaginate_queryset(representation.prepare(queryset), request, view)
+            return view.get_paginated_response(await representation.arepresent(page))
+        page = await view.paginator.apaginate_queryset(queryset, request, view)
+        return view.get_paginated_response(view.get_serializer(page, many=True).data)
+
+
+class EventDetailAsyncView(AsyncReadView):
+    view_class = EventViewSet
+    actions = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+    object_permissions = (HasEventAccess(),)
+
+    async def get(self, request, *args, **kwargs):
+        view = self.view
+        detail_version = await view.aget_detail_version()
+        etag = None
+        if detail_version is not None:
+            etag = view.get_detail_etag(detail_version)
+            if await ahas_calendar_access(request.user, detail_version[0]) and etag_matches(request, etag):
+                return not_modified(etag)
+        response = Response(view.get_serializer(await self.aget_object()).data)
+        if etag is not None:
+            response['ETag'] = etag
+        return response
+
+
+class CalendarListAsyncView(VersionedListAsyncView):
+    view_class = CalendarViewSet
+    actions = {'get': 'list', 'post': 'create'}
+
+    async def list(self, request):
+        view = self.view
+        queryset = view.filter_queryset(view.get_queryset()).prefetch_related(None)
+        representation = get_fast_representation(view.get_serializer_class())
+        if representation is not None:
+            rows = [row async for row in representation.prepare(queryset).aiterator()]
+            return Response(await representation.arepresent(rows))
+        calendars = [calendar async for calendar in queryset.aiterator()]
+        await aprefetch_calendar_users(calendars)
+        return Response(view.get_serializer(calendars, many=True).data)
+
+
+class FreeBusyAsyncView(AsyncReadView):
+    view_class = FreeBusyView
+
+    async def get(self, request, *args, **kwargs):
+        view = self.view
+        start, end = parse_window_params(request, view.max_window)
+        usernames, error = view.get_usernames(request)
+        if error is not None:
+            return error
+        queryset = CustomUser.objects.filter(username__in=usernames).values_list('id', 'username', named=True)
+        users = {user_id: username async for user_id, username in queryset.aiterator()}
+        error = view.check_users_exist(usernames, users)
+        if error is not None:
+            return error
+        return view.get_busy_response(start, end, users, await aget_busy_intervals(list(users), start, end))
+
+
+async def aprefetch_calendar_users(calendars):
+    """
+    Fills the ``users`` prefetch cache of ``calendars`` with one async query over the through table,
+    as ``prefetch_related('users')`` would (which ``aiterator()`` doesn't support).
+    """
+    members = {calendar.pk: [] for calendar in calendars}
+    memberships = Calendar.users.through.objects.filter(calendar_id__in=members).select_related('customuser')
+    async for membership in memberships.order_by('customuser_id').aiterator():
+        members[membership.calendar_id].append(membership.customuser)
+    for calendar in calendars:
+        queryset = calendar.users.get_queryset()
+        queryset._result_cache = members[calendar.pk]
+        queryset._prefetch_done = True
+        calendar._prefetched_objects_cache = {'users': queryset}
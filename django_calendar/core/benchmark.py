@@ -0,0 +1,380 @@
+import math
+import platform
+import random
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Optional
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from user import directory
+from user.models import CustomUser
+from user.serializers import CustomUserShortSerializer
+from . import agenda, membership, recurrence, search, summary, sync
+from .models import Calendar, Event
+from .representation import FastRepresentation
+from .serializers import CalendarSerializer, EventSerializer
+from .views import CalendarViewSet
+
+SEED_BATCH_SIZE = 1000
+SEED_START = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+@dataclass
+class Dataset:
+    users: int = 100
+    calendars: int = 200
+    events: int = 10000
+    members_per_calendar: int = 5
+    recurring_ratio: float = 0.1
+    seed: int = 0
+
+
+@dataclass
+class SeededData:
+    dataset: Dataset
+    user_ids: list
+    calendar_ids: list
+    event_ids: list
+    client_user: CustomUser
+    token: str
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: Callable
+    data: Optional[Callable] = None
+    format: str = 'json'
+    writes: bool = False
+    expected_status: tuple = (200,)
+
+
+@dataclass
+class Measurement:
+    scenario: Scenario
+    status: int
+    timings: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    peak_memory: int = 0
+    response_bytes: int = 0
+
+    def as_dict(self):
+        timings = sorted(self.timings)
+        return {
+            'method': self.scenario.method.upper(),
+            'status': self.status,
+            'iterations': len(timings),
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 95) * 1000, 3),
+            'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+            'max_ms': round(timings[-1] * 1000, 3),
+            'queries': max(self.queries),
+            'peak_memory_kb': round(self.peak_memory / 1024, 1),
+            'response_kb': round(self.response_bytes / 1024, 1),
+        }
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    return sorted_values[max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)]
+
+
+def seed_data(dataset):
+    """
+    Creates ``dataset.users`` users (with tokens), ``dataset.calendars`` calendars owned round-robin and
+    shared with ``members_per_calendar - 1`` random users, and ``dataset.events`` events spread over a year.
+    Uses bulk inserts only, so seeding large datasets stays fast; the same seed gives the same rows.
+    """
+    rng = random.Random(dataset.seed)
+    password = make_password('benchmark')
+    users = CustomUser.objects.bulk_create(
+        [CustomUser(username=f'bench-user-{index}', password=password) for index in range(dataset.users)],
+        batch_size=SEED_BATCH_SIZE)
+    Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users],
+                              batch_size=SEED_BATCH_SIZE)
+    calendars = Calendar.objects.bulk_create(
+        [Calendar(name=f'bench-calendar-{index}', owner=users[index % len(users)])
+         for index in range(dataset.calendars)], batch_size=SEED_BATCH_SIZE)
+    memberships = []
+    for calendar in calendars:
+        size = max(0, dataset.members_per_calendar - 1)
+        others = [user.pk for user in rng.sample(users, min(len(users), size + 1)) if user.pk != calendar.owner_id]
+        members = [calendar.owner_id, *others[:size]]
+        memberships.extend(Calendar.users.through(calendar_id=calendar.pk, customuser_id=user_id)
+                           for user_id in sorted(members))
+    Calendar.users.through.objects.bulk_create(memberships, batch_size=SEED_BATCH_SIZE)
+    events = []
+    for index in range(dataset.events):
+        timestamp = SEED_START + timedelta(minutes=15 * rng.randrange(365 * 24 * 4))
+        event = Event(calendar=rng.choice(calendars), name=f'bench-event-{index}', description='benchmark',
+                      timestamp=timestamp, end=timestamp + timedelta(minutes=15 * rng.randint(1, 8)))
+        if rng.random() < dataset.recurring_ratio:
+            event.recurrence_frequency = rng.choice(Event.Frequency.values)
+            event.recurrence_count = rng.randint(2, 50)
+        event.duration_class = event.get_duration_class()
+        events.append(event)
+    events = Event.objects.bulk_create(events, batch_size=SEED_BATCH_SIZE)
+    search.index_events(events)
+    agenda.backfill(SEED_BATCH_SIZE)
+    client_user = users[0]
+    return SeededData(dataset=dataset, user_ids=[user.pk for user in users],
+                      calendar_ids=[calendar.pk for calendar in calendars], event_ids=[event.pk for event in events],
+                      client_user=client_user, token=Token.objects.get(user=client_user).key)
+
+
+def _own_calendar(data):
+    return data.calendar_ids[0]
+
+
+def _own_event(data):
+    event = Event.objects.filter(calendar_id=_own_calendar(data)).order_by('id').first()
+    return event.pk if event is not None else data.event_ids[0]
+
+
+def _outsider(data):
+    members = set(Calendar.users.through.objects.filter(calendar_id=_own_calendar(data))
+                  .values_list('customuser_id', flat=True))
+    outsider = next((user_id for user_id in data.user_ids if user_id not in members), data.user_ids[-1])
+    return CustomUser.objects.get(pk=outsider).username
+
+
+def _member(data):
+    owner = Calendar.objects.get(pk=_own_calendar(data)).owner_id
+    member = (Calendar.users.through.objects.filter(calendar_id=_own_calendar(data))
+              .exclude(customuser_id=owner).values_list('customuser__username', flat=True).first())
+    return member or _outsider(data)
+
+
+def _ics_file(data, iteration):
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//django-calendar//benchmark//EN']
+    for index in range(100):
+        start = SEED_START + timedelta(hours=index)
+        lines += ['BEGIN:VEVENT', f'UID:bench-import-{iteration}-{index}@example.com',
+                  f'DTSTART:{start:%Y%m%dT%H%M%SZ}', f'DTEND:{start + timedelta(minutes=30):%Y%m%dT%H%M%SZ}',
+                  f'SUMMARY:Imported {index}', 'END:VEVENT']
+    lines.append('END:VCALENDAR')
+    return {'file': SimpleUploadedFile('calendar.ics', '\r\n'.join(lines).encode())}
+
+
+def _window(days):
+    return {'start': SEED_START.isoformat(), 'end': (SEED_START + timedelta(days=days)).isoformat()}
+
+
+def _sync_token(data):
+    # A fresh token: the steady state of a client that syncs regularly (the seed data is older).
+    user_id = data.client_user.pk
+    return {'token': sync.dump_token(user_id, datetime.now(dt_timezone.utc), membership.get_calendar_ids(user_id))}
+
+
+SCENARIOS = [
+    Scenario('users-list', 'get', lambda data: reverse('users-list')),
+    Scenario('users-detail', 'get', lambda data: reverse('users-detail', kwargs={'pk': data.client_user.pk})),
+    Scenario('users-create', 'post', lambda data: reverse('users-list'),
+             lambda data, i: {'username': f'bench-new-user-{i}'}, writes=True, expected_status=(201,)),
+    Scenario('users-update', 'patch', lambda data: reverse('users-detail', kwargs={'pk': data.client_user.pk}),
+             lambda data, i: {'username': f'bench-renamed-{i}'}, writes=True),
+    Scenario('users-delete', 'delete', lambda data: reverse('users-detail', kwargs={'pk': data.user_ids[-1]}),
+             writes=True, expected_status=(204,)),
+    Scenario('calendars-list', 'get', lambda data: reverse('calendars-list')),
+    Scenario('calendars-list-columnar', 'get', lambda data: reverse('calendars-list'),
+             lambda data, i: {'format': 'columnar'}),
+    Scenario('calendars-detail', 'get', lambda data: reverse('calendars-detail', kwargs={'pk': _own_calendar(data)})),
+    Scenario('calendars-create', 'post', lambda data: reverse('calendars-list'),
+             lambda data, i: {'name': f'bench-new-calendar-{i}', 'users': []}, writes=True,
+             expected_status=(201,)),
+    Scenario('calendars-update', 'patch', lambda data: reverse('calendars-detail', kwargs={'pk': _own_calendar(data)}),
+             lambda data, i: {'name': f'bench-renamed-{i}'}, writes=True),
+    Scenario('calendars-delete', 'delete',
+             lambda data: reverse('calendars-detail', kwargs={'pk': _own_calendar(data)}), writes=True,
+             expected_status=(204,)),
+    Scenario('calendars-add-users', 'post', lambda data: reverse('add-users', kwargs={'pk': _own_calendar(data)}),
+             lambda data, i: {'users': [_outsider(data)]}, writes=True),
+    Scenario('calendars-remove-users', 'post',
+             lambda data: reverse('remove-users', kwargs={'pk': _own_calendar(data)}),
+             lambda data, i: {'users': [_member(data)]}, writes=True, expected_status=(200, 400)),
+    Scenario('calendars-export', 'get', lambda data: reverse('calendar-export', kwargs={'pk': _own_calendar(data)})),
+    Scenario('calendars-import', 'post', lambda data: reverse('calendar-import', kwargs={'pk': _own_calendar(data)}),
+             _ics_file, format='multipart', writes=True),
+    Scenario('events-list', 'get', lambda data: reverse('events-list')),
+    Scenario('events-list-page', 'get', lambda data: reverse('events-list'), lambda data, i: {'page_size': 1000}),
+    Scenario('events-list-columnar', 'get', lambda data: reverse('events-list'),
+             lambda data, i: {'format': 'columnar', 'page_size': 1000}),
+    Scenario('events-list-window', 'get', lambda data: reverse('events-list'), lambda data, i: _window(30)),
+    Scenario('events-detail', 'get', lambda data: reverse('events-detail', kwargs={'pk': _own_event(data)})),
+    Scenario('events-create', 'post', lambda data: reverse('events-list'),
+             lambda data, i: {'calendar': _own_calendar(data), 'name': f'bench-new-event-{i}',
+                              'timestamp': SEED_START.isoformat()}, writes=True, expected_status=(201,)),
+    Scenario('events-update', 'patch', lambda data: reverse('events-detail', kwargs={'pk': _own_event(data)}),
+             lambda data, i: {'name': f'bench-renamed-{i}'}, writes=True),
+    Scenario('events-delete', 'delete', lambda data: reverse('events-detail', kwargs={'pk': _own_event(data)}),
+             writes=True, expected_status=(204,)),
+    Scenario('events-bulk', 'post', lambda data: reverse('events-bulk'),
+             lambda data, i: {'create': [{'calendar': _own_calendar(data), 'name': f'bench-bulk-{i}-{index}',
+                                          'timestamp': SEED_START.isoformat()} for index in range(100)]},
+             writes=True),
+    Scenario('events-occurrences', 'get', lambda data: reverse('events-occurrences'), lambda data, i: _window(30)),
+    Scenario('events-conflicts', 'get', lambda data: reverse('events-conflicts'), lambda data, i: _window(30)),
+    Scenario('events-summary', 'get', lambda data: reverse('events-summary'),
+             lambda data, i: {**_window(31), 'bucket': 'day'}),
+    Scenario('agenda', 'get', lambda data: reverse('agenda'), lambda data, i: _window(30)),
+    Scenario('sync', 'get', lambda data: reverse('sync'), lambda data, i: _sync_token(data)),
+    Scenario('events-search', 'get', lambda data: reverse('events-search'), lambda data, i: {'q': 'benchmark'}),
+    Scenario('freebusy', 'get', lambda data: reverse('freebusy'),
+             lambda data, i: {'users': ','.join(CustomUser.objects.filter(pk__in=data.user_ids[:10])
+                                                .values_list('username', flat=True)), **_window(7)}),
+]
+
+
+# Lists rendered both through their serializer and through ``FastRepresentation`` by ``compare_representations``.
+REPRESENTATIONS = [
+    ('events', EventSerializer, lambda data: Event.objects.order_by('timestamp', 'id')),
+    ('calendars', CalendarSerializer, lambda data: CalendarViewSet.queryset.all()),
+    ('users', CustomUserShortSerializer, lambda data: CustomUser.objects.order_by('id')),
+]
+
+
+def compare_representations(data, iterations=5):
+    """
+    Renders every list of ``REPRESENTATIONS`` to JSON through its serializer and through ``FastRepresentation``
+    and returns, per list, the rows, the median time of each path and the speedup. Raises ``AssertionError``
+    if the two paths don't give the same bytes.
+    """
+    renderer = JSONRenderer()
+    results = {}
+    for name, serializer_class, queryset in REPRESENTATIONS:
+        representation = FastRepresentation(serializer_class)
+        paths = {
+            'serializer': lambda: renderer.render(serializer_class(queryset(data), many=True).data),
+            'fast': lambda: renderer.render(representation.represent(representation.prepare(queryset(data)))),
+        }
+        timings, content = {}, {}
+        for path, render in paths.items():
+            content[path] = render()
+            elapsed = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                render()
+                elapsed.append(time.perf_counter() - started)
+            timings[path] = percentile(sorted(elapsed), 50)
+        if content['fast'] != content['serializer']:
+            raise AssertionError(f"{name}: the fast representation differs from the serializer's")
+        results[name] = {
+            'rows': queryset(data).count(),
+            'serializer_ms': round(timings['serializer'] * 1000, 3),
+            'fast_ms': round(timings['fast'] * 1000, 3),
+            'speedup': round(timings['serializer'] / timings['fast'], 2),
+        }
+    return results
+
+
+def reset_caches():
+    membership.clear_cache()
+    recurrence.clear_cache()
+    directory.clear_cache()
+    summary.clear_cache()
+
+
+class BenchmarkRunner:
+    """
+    Drives every scenario through the test client as the first seeded user and measures latency,
+    queries per request and peak traced memory. Writes run inside a transaction that is rolled back,
+    so every iteration sees the same seeded data.
+    """
+
+    def __init__(self, data, iterations=20, scenarios=None):
+        self.data = data
+        self.iterations = iterations
+        self.scenarios = SCENARIOS if scenarios is None else scenarios
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + data.token)
+
+    def measure_once(self, scenario, iteration):
+        if not scenario.writes:
+            return self._timed(scenario, iteration)
+        with transaction.atomic():
+            result = self._timed(scenario, iteration)
+            transaction.set_rollback(True)
+        reset_caches()
+        return result
+
+    def _timed(self, scenario, iteration):
+        path = scenario.path(self.data)
+        payload = scenario.data(self.data, iteration) if scenario.data is not None else None
+        send = getattr(self.client, scenario.method)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = send(path, payload, format=scenario.format)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, len(queries), len(content)
+
+    def run_scenario(self, scenario):
+        status, _, _, size = self.measure_once(scenario, 0)
+        if status not in scenario.expected_status:
+            raise AssertionError(f"{scenario.name} answered {status}, expected one of {scenario.expected_status}")
+        measurement = Measurement(scenario=scenario, status=status, response_bytes=size)
+        for iteration in range(1, self.iterations + 1):
+            _, elapsed, queries, _ = self.measure_once(scenario, iteration)
+            measurement.timings.append(elapsed)
+            measurement.queries.append(queries)
+        tracemalloc.start()
+        try:
+            self.measure_once(scenario, self.iterations + 1)
+            measurement.peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return measurement
+
+    def run(self):
+        # A single client sending requests back to back would soon run out of its token's rate budget.
+        admission_settings = {**getattr(settings, 'CALENDAR_ADMISSION', {}), 'TOKEN_RATE': None}
+        with override_settings(CALENDAR_ADMISSION=admission_settings):
+            return {scenario.name: self.run_scenario(scenario).as_dict() for scenario in self.scenarios}
+
+
+def build_report(data, results, iterations, representations=None):
+    report = {
+        'created': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+        },
+        'dataset': asdict(data.dataset),
+        'iterations': iterations,
+        'endpoints': results,
+    }
+    if representations is not None:
+        report['representations'] = representations
+    return report
+
+
+def compare_reports(baseline, report, tolerance=0.2):
+    """
+    Returns a list of human readable regressions of ``report`` against ``baseline``: more queries per request
+    on any endpoint, or p95 latency / peak memory growing by more than ``tolerance`` (a fraction).
+    """
+    regressions = []
+    for name, current in report['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f"{name}: queries {previous['queries']} -> {current['queries']}")
+        for metric in ('p95_ms', 'peak_memory_kb'):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {current[metric]}")
+    return regressions
@@ -0,0 +1,191 @@
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from .membership import get_calendar_ids
+from .pubsub import deferred_messages
+from .models import Calendar, Event
+from .serializers import EventBulkItemSerializer, EventSerializer
+from .signals import events_bulk_changed
+from .sync import deferred_tombstones
+from .versioning import deferred_version_bumps
+
+# An upper bound: bulk_create/bulk_update also cap their batches at what the backend accepts in one statement,
+# ``connection.ops.bulk_batch_size()``. On SQLite, with 999 bound parameters, that's 76 new events per INSERT.
+BULK_BATCH_SIZE = 1000
+
+
+def _result(index, status_code, **extra):
+    return {"index": index, "status": status_code, **extra}
+
+
+class EventBulkOperation:
+    """
+    Applies a batch of event creates, updates and deletes for one user.
+
+    Calendar access is resolved once per distinct calendar and all valid items are written
+    with ``bulk_create``/``bulk_update`` in a single transaction. Invalid items are reported
+    per item and do not prevent the valid ones from being written.
+    """
+
+    def __init__(self, user, create, update, delete):
+        self.user = user
+        self.create_items = create
+        self.update_items = update
+        self.delete_ids = delete
+        self.results = {"create": [None] * len(create), "update": [None] * len(update), "delete": [None] * len(delete)}
+        self._allowed_calendars = set()
+        self._missing_calendars = set()
+
+    def _load_allowed_calendars(self, calendar_ids):
+        if self.user.is_staff:
+            self._allowed_calendars = set(Calendar.objects.filter(pk__in=calendar_ids).values_list('id', flat=True))
+            self._missing_calendars = calendar_ids - self._allowed_calendars
+            return
+        member_of = get_calendar_ids(self.user.pk)
+        self._allowed_calendars = calendar_ids & member_of
+        unknown = calendar_ids - member_of
+        existing = set(Calendar.objects.filter(pk__in=unknown).values_list('id', flat=True)) if unknown else set()
+        self._missing_calendars = unknown - existing
+
+    def _calendar_status(self, calendar_id):
+        if calendar_id in self._allowed_calendars:
+            return status.HTTP_200_OK
+        if calendar_id in self._missing_calendars:
+            return status.HTTP_400_BAD_REQUEST
+        return status.HTTP_403_FORBIDDEN
+
+    @staticmethod
+    def _validate(items, partial):
+        """
+        Returns a ``(validated_data, errors)`` pair per item, one of them None. A single serializer validates
+        every item: building its fields costs as much as validating an item.
+        """
+        serializer = EventBulkItemSerializer(partial=partial)
+        validated = []
+        for item in items:
+            try:
+                validated.append((serializer.run_validation(item), None))
+            except ValidationError as error:
+                validated.append((None, error.detail))
+        return validated
+
+    def execute(self):
+        validated_creates = self._validate(self.create_items, partial=False)
+        validated_updates = self._validate(self.update_items, partial=True)
+
+        existing = {}
+        touched_ids = {item.get('id') for item in self.update_items} | set(self.delete_ids)
+        touched_ids = {pk for pk in touched_ids if isinstance(pk, int)}
+        if touched_ids:
+            existing = Event.objects.in_bulk(touched_ids)
+
+        calendar_ids = {event.calendar_id for event in existing.values()}
+        for data, errors in validated_creates + validated_updates:
+            if errors is None and 'calendar' in data:
+                calendar_ids.add(data['calendar'])
+        self._load_allowed_calendars(calendar_ids)
+
+        to_create, create_indexes = self._prepare_creates(validated_creates)
+        to_update, update_indexes, update_fields = self._prepare_updates(validated_updates, existing)
+        to_delete, delete_indexes = self._prepare_deletes(existing)
+
+        calendar_ids = {event.calendar_id for event in to_create + to_update}
+        calendar_ids.update(existing[pk].calendar_id for pk in to_delete)
+        calendar_ids.update(event._loaded_calendar_id for event in to_update)
+        with transaction.atomic(), deferred_version_bumps(), deferred_tombstones(), deferred_messages():
+            for event in to_create + to_update:
+                event.duration_class = event.get_duration_class()
+            if to_create:
+                Event.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+            if to_update and update_fields:
+                now = timezone.now()
+                for event in to_update:
+                    event.updated_at = now
+                Event.objects.bulk_update(to_update, sorted(update_fields | {'updated_at', 'duration_class'}),
+                                          batch_size=BULK_BATCH_SIZE)
+            if to_delete:
+                Event.objects.filter(pk__in=to_delete).delete()
+            if to_create or to_update:
+                written = to_create + to_update
+                events_bulk_changed.send(sender=Event, calendar_ids=calendar_ids,
+                                         event_ids=[event.pk for event in written], events=written,
+                                         created_ids=[event.pk for event in to_create])
+
+        # One serializer for every written event, as for validation.
+        for index, data in zip(create_indexes, EventSerializer(to_create, many=True).data):
+            self.results["create"][index] = _result(index, status.HTTP_201_CREATED, data=data)
+        for index, data in zip(update_indexes, EventSerializer(to_update, many=True).data):
+            self.results["update"][index] = _result(index, status.HTTP_200_OK, data=data)
+        for index in delete_indexes:
+            self.results["delete"][index] = _result(index, status.HTTP_204_NO_CONTENT)
+        return self.results
+
+    def _prepare_creates(self, validated_creates):
+        events, indexes = [], []
+        for index, (data, errors) in enumerate(validated_creates):
+            if errors is not None:
+                self.results["create"][index] = _result(index, status.HTTP_400_BAD_REQUEST, errors=errors)
+                continue
+            data = dict(data)
+            calendar_id = data.pop('calendar')
+            calendar_status = self._calendar_status(calendar_id)
+            if calendar_status != status.HTTP_200_OK:
+                self.results["create"][index] = _result(index, calendar_status)
+                continue
+            events.append(Event(calendar_id=calendar_id, **data))
+            indexes.append(index)
+        return events, indexes
+
+    def _prepare_updates(self, validated_updates, existing):
+        events, indexes, fields = [], [], set()
+        seen = set()
+        for index, (data, errors) in enumerate(validated_updates):
+            pk = self.update_items[index].get('id')
+            event = existing.get(pk) if isinstance(pk, int) else None
+            if event is None or self._calendar_status(event.calendar_id) != status.HTTP_200_OK:
+                self.results["update"][index] = _result(index, status.HTTP_404_NOT_FOUND)
+                continue
+            if pk in seen:
+                self.results["update"][index] = _result(index, status.HTTP_400_BAD_REQUEST,
+                                                        errors={"id": ["Duplicate id."]})
+                continue
+            if errors is not None:
+                self.results["update"][index] = _result(index, status.HTTP_400_BAD_REQUEST, errors=errors)
+                continue
+            data = dict(data)
+            if 'calendar' in data:
+                calendar_id = data.pop('calendar')
+                calendar_status = self._calendar_status(calendar_id)
+                if calendar_status != status.HTTP_200_OK:
+                    self.results["update"][index] = _result(index, calendar_status)
+                    continue
+                event.calendar_id = calendar_id
+                fields.add('calendar')
+            for field, value in data.items():
+                setattr(event, field, value)
+                fields.add(field)
+            if event.end is not None and event.end < event.timestamp:
+                self.results["update"][index] = _result(index, status.HTTP_400_BAD_REQUEST, errors={
+                    "end": ["'end' must not be before 'timestamp'."]})
+                continue
+            if event.recurrence_count is not None and event.recurrence_until is not None:
+                self.results["update"][index] = _result(index, status.HTTP_400_BAD_REQUEST, errors={
+                    "non_field_errors": ["'recurrence_count' and 'recurrence_until' can't both be set."]})
+                continue
+            seen.add(pk)
+            events.append(event)
+            indexes.append(index)
+        return events, indexes, fields
+
+    def _prepare_deletes(self, existing):
+        pks, indexes = [], []
+        for index, pk in enumerate(self.delete_ids):
+            event = existing.get(pk)
+            if event is None or self._calendar_status(event.calendar_id) != status.HTTP_200_OK:
+                self.results["delete"][index] = _result(index, status.HTTP_404_NOT_FOUND)
+                continue
+            pks.append(pk)
+            indexes.append(index)
+        return pks, indexes
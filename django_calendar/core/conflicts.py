@@ -0,0 +1,143 @@
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import DURATION_CLASS_BOUNDS, Event
+from .recurrence import get_occurrences, iter_occurrences
+
+
+def _settings():
+    return getattr(settings, 'CALENDAR_CONFLICTS', {})
+
+
+def rejects_overlaps():
+    return _settings().get('REJECT_OVERLAPS', False)
+
+
+class OverlapConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+
+    def __init__(self, event_ids):
+        super().__init__()
+        # Set as is: the detail would turn the ids into strings.
+        self.detail = {"message": "The event overlaps other events of its calendar.", "events": event_ids}
+
+
+# What conflicts need of events: other fields are deferred.
+_COLUMNS = ('id', 'calendar', 'name', 'timestamp', 'end', 'recurrence_frequency', 'recurrence_interval',
+            'recurrence_count', 'recurrence_until', 'recurrence_exceptions', 'time_zone')
+
+
+def _candidates(calendar_ids, start, end, exclude=None):
+    """
+    Reads, with one statement, the non-recurring events of ``calendar_ids`` overlapping ``[start, end)`` and
+    every series with a duration that starts before ``end``.
+
+    An event can't start longer before ``start`` than the bound of its duration class, so every class is one
+    range of ``core_event_conflict_idx`` instead of a scan of everything that starts before ``end``; only the
+    (rare) events longer than every bound are read from the start of their calendar. Series come from
+    ``core_event_series_idx``. The statement is written by hand: compiling the same ``union()`` of querysets
+    takes longer than running it.
+    """
+    calendar_ids = list(calendar_ids)
+    if not calendar_ids:
+        return []
+    using = router.db_for_read(Event)
+    connection = connections[using]
+    quote, adapt = connection.ops.quote_name, connection.ops.adapt_datetimefield_value
+    meta = Event._meta
+    columns = ', '.join(quote(meta.get_field(name).column) for name in _COLUMNS)
+    select = (f'SELECT {columns} FROM {quote(meta.db_table)} WHERE {quote("calendar_id")} IN '
+              f'({", ".join(["%s"] * len(calendar_ids))}) AND {quote("timestamp")} < %s')
+    common = [*calendar_ids, adapt(end)]
+    if exclude is not None:
+        select += f' AND {quote(meta.pk.column)} <> %s'
+        common.append(exclude)
+    single = f'{select} AND {quote("end")} > %s AND {quote("duration_class")} = %s'
+    branches, params = [], []
+    for duration_class, bound in enumerate(DURATION_CLASS_BOUNDS):
+        branches.append(f'{single} AND {quote("timestamp")} > %s')
+        params.extend([*common, adapt(start), duration_class, adapt(start - bound)])
+    branches.append(single)
+    params.extend([*common, adapt(start), len(DURATION_CLASS_BOUNDS)])
+    # A literal, as in the condition of the partial index.
+    branches.append(f"{select} AND NOT ({quote('recurrence_frequency')} = '') AND {quote('end')} IS NOT NULL")
+    params.extend(common)
+    return Event.objects.using(using).raw(' UNION ALL '.join(branches), params)
+
+
+def get_intervals(calendar_ids, start, end, exclude=None):
+    """
+    Returns the ``(start, end, event)`` occurrences of the events of ``calendar_ids`` that overlap
+    ``[start, end)``, sorted by start. Events without an end, or ending when they start, take no time.
+    """
+    intervals = []
+    for event in _candidates(calendar_ids, start, end, exclude):
+        if not event.is_recurring:
+            intervals.append((event.timestamp, event.end, event))
+            continue
+        duration = event.duration
+        if not duration:
+            continue
+        for occurrence in get_occurrences(event, start - duration, end):
+            if occurrence + duration > start:
+                intervals.append((occurrence, occurrence + duration, event))
+    intervals.sort(key=lambda interval: (interval[0], interval[1], interval[2].pk))
+    return intervals
+
+
+def find_conflicts(calendar_ids, start, end):
+    """
+    Returns every pair of overlapping occurrences in ``[start, end)`` of the events of ``calendar_ids``, as
+    ``{'start', 'end', 'occurrences'}`` dicts ordered by the start of the overlap. Occurrences of the same
+    series don't conflict with each other.
+    """
+    conflicts, active = [], []
+    for interval in get_intervals(calendar_ids, start, end):
+        interval_start, interval_end, event = interval
+        active = [other for other in active if other[1] > interval_start]
+        for other in active:
+            if other[2].pk != event.pk:
+                conflicts.append({
+                    'start': interval_start,
+                    'end': min(interval_end, other[1]),
+                    'occurrences': [_occurrence(other), _occurrence(interval)],
+                })
+        active.append(interval)
+    return conflicts
+
+
+def _occurrence(interval):
+    return {'event': interval[2], 'timestamp': interval[0], 'end': interval[1]}
+
+
+def find_overlapping_events(event):
+    """
+    Returns the ids of the other events of ``event``'s calendar that overlap it; for a series, any of its
+    occurrences in the first ``HORIZON_DAYS`` days.
+    """
+    duration = event.duration
+    if not duration:
+        return []
+    if event.is_recurring:
+        horizon = event.timestamp + timedelta(days=_settings().get('HORIZON_DAYS', 365))
+        # Not get_occurrences: the event may be unsaved, or differ from the saved series.
+        starts = list(iter_occurrences(event, event.timestamp, horizon))
+    else:
+        starts = [event.timestamp]
+    if not starts:
+        return []
+    # Every occurrence lasts as long, so their ends are sorted too: the only occurrence that can overlap an
+    # interval is the first one ending after the interval starts.
+    ends = [start + duration for start in starts]
+    overlapping = {}
+    for interval_start, interval_end, other in get_intervals([event.calendar_id], starts[0], ends[-1],
+                                                             exclude=event.pk):
+        index = bisect_right(ends, interval_start)
+        if index < len(starts) and starts[index] < interval_end:
+            overlapping[other.pk] = None
+    return list(overlapping)
@@ -0,0 +1,95 @@
+import hashlib
+
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .membership import has_calendar_access
+from .models import Calendar
+
+
+def compute_etag(request, parts):
+    digest = hashlib.sha1(f'{request.get_full_path()}|{request.accepted_renderer.format}'.encode())
+    for part in parts:
+        digest.update(f'|{part}'.encode())
+    return quote_etag(digest.hexdigest())
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or etag.removeprefix('W/') in (candidate.removeprefix('W/') for candidate in etags)
+
+
+def not_modified(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
+class CalendarVersionETagMixin:
+    """
+    Adds ETags derived from calendar versions to ``list`` and ``retrieve`` and answers a matching
+    ``If-None-Match`` with 304 before any object is loaded or serialized.
+
+    By default a list depends on every calendar the user can see; views provide ``get_detail_versions()``
+    returning the ``(calendar_id, version)`` pairs of the requested object as a ``values_list`` queryset.
+    """
+
+    def get_versioned_calendars(self):
+        user = self.request.user
+        if user.is_staff:
+            return Calendar.objects.all()
+        return Calendar.objects.filter(users=user)
+
+    def get_detail_versions(self):
+        raise NotImplementedError
+
+    def get_detail_version(self):
+        try:
+            return self.get_detail_versions().first()
+        except ValueError:
+            return None
+
+    async def aget_detail_version(self):
+        try:
+            return await self.get_detail_versions().afirst()
+        except ValueError:
+            return None
+
+    def get_list_versions(self):
+        # Plain values_list() rows can't be read with aiterator() on Django 4.2, named ones can.
+        return self.get_versioned_calendars().order_by('id').values_list('id', 'version', named=True)
+
+    def get_list_etag(self):
+        versions = self.get_list_versions()
+        return compute_etag(self.request, (f'{calendar_id}:{version}' for calendar_id, version in versions))
+
+    async def aget_list_etag(self):
+        versions = [f'{calendar_id}:{version}' async for calendar_id, version in self.get_list_versions().aiterator()]
+        return compute_etag(self.request, versions)
+
+    def get_detail_etag(self, detail_version):
+        calendar_id, version = detail_version
+        return compute_etag(self.request, (f'{calendar_id}:{version}',))
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag()
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        detail_version = self.get_detail_version()
+        etag = None
+        if detail_version is not None:
+            etag = self.get_detail_etag(detail_version)
+            if has_calendar_access(request.user, detail_version[0]) and etag_matches(request, etag):
+                return not_modified(etag)
+        response = super().retrieve(request, *args, **kwargs)
+        if etag is not None and response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
@@ -0,0 +1,73 @@
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+def parse_datetime_param(request, name):
+    value = request.query_params.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: f"'{value}' is not a valid ISO 8601 datetime."})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def parse_int_param(request, name):
+    value = request.query_params.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: f"'{value}' is not a valid integer."})
+
+
+def parse_window_params(request, max_length=None):
+    start = parse_datetime_param(request, 'start')
+    end = parse_datetime_param(request, 'end')
+    errors = {name: "This query parameter is required." for name, value in (('start', start), ('end', end))
+              if value is None}
+    if errors:
+        raise ValidationError(errors)
+    if start > end:
+        raise ValidationError({"end": "'end' must not be before 'start'."})
+    if max_length is not None and end - start > max_length:
+        raise ValidationError({"end": f"The window can't be longer than {max_length.days} days."})
+    return start, end
+
+
+class EventWindowFilter(BaseFilterBackend):
+    """
+    Restricts events to ``?calendar=``, ``?start=`` (inclusive) and ``?end=`` (exclusive),
+    which together hit the (calendar, timestamp) index.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        calendar_id = parse_int_param(request, 'calendar')
+        start = parse_datetime_param(request, 'start')
+        end = parse_datetime_param(request, 'end')
+        if start is not None and end is not None and start > end:
+            raise ValidationError({"end": "'end' must not be before 'start'."})
+        if calendar_id is not None:
+            queryset = queryset.filter(calendar_id=calendar_id)
+        if start is not None:
+            queryset = queryset.filter(timestamp__gte=start)
+        if end is not None:
+            queryset = queryset.filter(timestamp__lt=end)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': 'calendar', 'required': False, 'in': 'query', 'schema': {'type': 'integer'}},
+            {'name': 'start', 'required': False, 'in': 'query', 'schema': {'type': 'string', 'format': 'date-time'}},
+            {'name': 'end', 'required': False, 'in': 'query', 'schema': {'type': 'string', 'format': 'date-time'}},
+        ]
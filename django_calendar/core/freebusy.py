@@ -0,0 +1,78 @@
+from django.db.models import DateTimeField, ExpressionWrapper, F, Q, Value
+
+from .models import DURATION_CLASS_BOUNDS, Event
+from .recurrence import get_occurrences
+
+
+def merge_intervals(intervals):
+    """
+    Sorts ``(start, end)`` pairs and sweeps them into a list of disjoint intervals,
+    joining any that overlap or touch.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+_FIELDS = ('id', 'timestamp', 'end', 'recurrence_frequency', 'recurrence_interval', 'recurrence_count',
+           'recurrence_until', 'recurrence_exceptions', 'time_zone')
+
+
+def _busy_events_query(user_ids, start, end):
+    """
+    The events of the calendars of ``user_ids`` that may be busy in ``[start, end)``, annotated with the
+    ``member_id`` they are busy for, in one statement.
+
+    An event can't start longer before ``start`` than the bound of its duration class (see core.conflicts), so
+    each class is one range of ``core_event_conflict_idx`` instead of the whole history of the calendars; a
+    single ``OR`` of them would be planned as that scan. Series come from ``core_event_series_idx``, without
+    those whose last occurrence, lasting as long as the first, ends before ``start``.
+    """
+    events = (
+        Event.objects
+        .filter(calendar__users__in=user_ids, end__isnull=False, timestamp__lt=end)
+        .annotate(member_id=F('calendar__users'))
+        .only(*_FIELDS)
+        .order_by()
+    )
+    single = events.filter(recurrence_frequency='', end__gt=start)
+    branches = [single.filter(duration_class=duration_class, timestamp__gt=start - bound)
+                for duration_class, bound in enumerate(DURATION_CLASS_BOUNDS)]
+    branches.append(single.filter(duration_class=len(DURATION_CLASS_BOUNDS)))
+    last_busy_start = ExpressionWrapper(Value(start) - (F('end') - F('timestamp')), output_field=DateTimeField())
+    branches.append(events.exclude(recurrence_frequency='').filter(
+        Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=start) | Q(recurrence_until__gte=last_busy_start)
+    ))
+    return branches[0].union(*branches[1:], all=True)
+
+
+def get_busy_intervals(user_ids, start, end):
+    """
+    Returns ``{user_id: [(start, end), ...]}`` with the merged busy time of every user in
+    ``[start, end)``, read with a single query over the calendars those users are members of.
+    Events without an end, or ending when they start, don't block any time.
+    """
+    return _collect_busy_intervals(_busy_events_query(user_ids, start, end), user_ids, start, end)
+
+
+async def aget_busy_intervals(user_ids, start, end):
+    events = [event async for event in _busy_events_query(user_ids, start, end).aiterator()]
+    return _collect_busy_intervals(events, user_ids, start, end)
+
+
+def _collect_busy_intervals(events, user_ids, start, end):
+    intervals = {user_id: [] for user_id in user_ids}
+    for event in events:
+        duration = event.duration
+        if not duration:
+            continue
+        for occurrence in get_occurrences(event, start - duration, end):
+            occurrence_end = occurrence + duration
+            if occurrence_end > start:
+                intervals[event.member_id].append((max(occurrence, start), min(occurrence_end, end)))
+    return {user_id: merge_intervals(user_intervals) for user_id, user_intervals in intervals.items()}
@@ -0,0 +1,295 @@
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from asgiref.sync import sync_to_async
+from django.utils.dateparse import parse_datetime
+
+PRODID = '-//django-calendar//EN'
+EXPORT_CHUNK_SIZE = 2000
+_FLUSH_SIZE = 64 * 1024
+
+
+def escape_text(value):
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def format_start(event):
+    """
+    The DTSTART property: in the event's zone when it has one, so that clients repeat it at the same local time.
+    """
+    if not event.time_zone:
+        return f'DTSTART:{format_datetime(event.timestamp)}'
+    local = event.timestamp.astimezone(ZoneInfo(event.time_zone))
+    return f'DTSTART;TZID={event.time_zone}:{local.strftime("%Y%m%dT%H%M%S")}'
+
+
+def fold_line(line):
+    """
+    Folds a content line into chunks of at most 75 octets, as required by RFC 5545.
+    """
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def event_uid(event):
+    return event.uid or f'event-{event.pk}@django-calendar'
+
+
+def serialize_rrule(event):
+    parts = [f'FREQ={event.recurrence_frequency}']
+    if event.recurrence_interval != 1:
+        parts.append(f'INTERVAL={event.recurrence_interval}')
+    if event.recurrence_count is not None:
+        parts.append(f'COUNT={event.recurrence_count}')
+    if event.recurrence_until is not None:
+        parts.append(f'UNTIL={format_datetime(event.recurrence_until)}')
+    return ';'.join(parts)
+
+
+def serialize_event(event, dtstamp):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{escape_text(event_uid(event))}',
+        f'DTSTAMP:{dtstamp}',
+        format_start(event),
+    ]
+    if event.end is not None:
+        lines.append(f'DTEND:{format_datetime(event.end)}')
+    lines.append(f'SUMMARY:{escape_text(event.name)}')
+    if event.description:
+        lines.append(f'DESCRIPTION:{escape_text(event.description)}')
+    if event.is_recurring:
+        lines.append(f'RRULE:{serialize_rrule(event)}')
+        for exception in event.recurrence_exceptions:
+            lines.append(f'EXDATE:{format_datetime(parse_datetime(exception))}')
+    lines.append('END:VEVENT')
+    return ''.join(fold_line(line) for line in lines)
+
+
+def iter_calendar(calendar, events, dtstamp):
+    """
+    Yields an iCalendar document for ``calendar`` in pieces of roughly 64 KiB,
+    consuming ``events`` lazily so the whole calendar never has to be held in memory.
+    """
+    buffer = [
+        fold_line('BEGIN:VCALENDAR'),
+        fold_line('VERSION:2.0'),
+        fold_line(f'PRODID:{PRODID}'),
+        fold_line(f'X-WR-CALNAME:{escape_text(calendar.name)}'),
+    ]
+    size = 0
+    for event in events:
+        chunk = serialize_event(event, dtstamp)
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= _FLUSH_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    buffer.append(fold_line('END:VCALENDAR'))
+    yield ''.join(buffer).encode('utf-8')
+
+
+async def aiter_chunks(chunks):
+    """
+    Async iterator over ``chunks`` (e.g. ``iter_calendar()``): under ASGI, a streaming response consumes a
+    sync iterator whole before sending anything. Each chunk is produced in the thread the ORM runs in.
+    """
+    next_chunk = sync_to_async(next)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
+
+
+class ICalendarParseError(ValueError):
+    pass
+
+
+def unescape_text(value):
+    return re.sub(r'\\([\\;,nN])', lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+
+
+def iter_unfolded_lines(raw_lines):
+    """
+    Joins folded content lines back together, reading ``raw_lines`` (bytes or str) lazily.
+    """
+    current = None
+    for raw_line in raw_lines:
+        if isinstance(raw_line, bytes):
+            raw_line = raw_line.decode('utf-8', errors='replace')
+        line = raw_line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line or None
+    if current is not None:
+        yield current
+
+
+def parse_content_line(line):
+    name_and_params, separator, value = line.partition(':')
+    if not separator:
+        raise ICalendarParseError(f"Malformed content line '{line[:50]}'.")
+    name, *raw_params = name_and_params.split(';')
+    params = {}
+    for raw_param in raw_params:
+        key, _, param_value = raw_param.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+
+_DATE_TIME = re.compile(r'^(\d{4})(\d{2})(\d{2})(?:T(\d{2})(\d{2})(\d{2})(Z)?)?$')
+
+
+def parse_datetime_value(value, params):
+    match = _DATE_TIME.match(value)
+    if match is None:
+        raise ICalendarParseError(f"Invalid date-time '{value}'.")
+    year, month, day, hour, minute, second, utc = match.groups()
+    if utc or hour is None:
+        tzinfo = dt_timezone.utc
+    else:
+        try:
+            tzinfo = ZoneInfo(params['TZID']) if 'TZID' in params else dt_timezone.utc
+        except (ZoneInfoNotFoundError, ValueError):
+            tzinfo = dt_timezone.utc
+    try:
+        parsed = datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0),
+                          tzinfo=tzinfo)
+    except ValueError:
+        raise ICalendarParseError(f"Invalid date-time '{value}'.")
+    return parsed if tzinfo is dt_timezone.utc else parsed.astimezone(dt_timezone.utc)
+
+
+def parse_time_zone(value, params):
+    """
+    The TZID of a local date-time value if it names a zone we know, else '' (UTC).
+    """
+    if 'TZID' not in params or value.endswith('Z') or 'T' not in value:
+        return ''
+    try:
+        ZoneInfo(params['TZID'])
+    except (ZoneInfoNotFoundError, ValueError):
+        return ''
+    return params['TZID']
+
+
+_DURATION = re.compile(r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+
+def parse_duration(value):
+    match = _DURATION.match(value)
+    if match is None or value.rstrip('T').endswith('P'):
+        raise ICalendarParseError(f"Invalid duration '{value}'.")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                         minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -duration if sign == '-' else duration
+
+
+_SUPPORTED_RRULE_PARTS = {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'WKST'}
+
+
+def parse_rrule(value):
+    parts = dict(part.split('=', 1) for part in value.split(';') if '=' in part)
+    unsupported = set(parts) - _SUPPORTED_RRULE_PARTS
+    if unsupported:
+        raise ICalendarParseError(f"Unsupported RRULE part '{sorted(unsupported)[0]}'.")
+    rule = {'recurrence_frequency': parts.get('FREQ', '')}
+    try:
+        if 'INTERVAL' in parts:
+            rule['recurrence_interval'] = int(parts['INTERVAL'])
+        if 'COUNT' in parts:
+            rule['recurrence_count'] = int(parts['COUNT'])
+    except ValueError:
+        raise ICalendarParseError(f"Invalid RRULE '{value}'.")
+    if 'UNTIL' in parts:
+        until = parse_datetime_value(parts['UNTIL'], {})
+        if len(parts['UNTIL']) == 8:
+            until += timedelta(days=1, seconds=-1)
+        rule['recurrence_until'] = until
+    return rule
+
+
+def parse_vevent(properties):
+    """
+    Turns the ``(name, params, value)`` properties of one VEVENT into ``Event`` field values.
+    """
+    fields = {'name': '', 'description': '', 'uid': ''}
+    duration = None
+    exceptions = []
+    for name, params, value in properties:
+        if name == 'UID':
+            fields['uid'] = value
+        elif name == 'SUMMARY':
+            fields['name'] = unescape_text(value)
+        elif name == 'DESCRIPTION':
+            fields['description'] = unescape_text(value)
+        elif name == 'DTSTART':
+            fields['timestamp'] = parse_datetime_value(value, params)
+            fields['time_zone'] = parse_time_zone(value, params)
+        elif name == 'DTEND':
+            fields['end'] = parse_datetime_value(value, params)
+        elif name == 'DURATION':
+            duration = parse_duration(value)
+        elif name == 'RRULE':
+            fields.update(parse_rrule(value))
+        elif name == 'EXDATE':
+            exceptions.extend(parse_datetime_value(item, params) for item in value.split(','))
+    if 'timestamp' not in fields:
+        raise ICalendarParseError("VEVENT has no DTSTART.")
+    if duration is not None and 'end' not in fields:
+        fields['end'] = fields['timestamp'] + duration
+    if exceptions:
+        fields['recurrence_exceptions'] = exceptions
+    return fields
+
+
+def iter_vevents(raw_lines):
+    """
+    Yields ``(fields, error)`` for every VEVENT in an iCalendar stream, one component at a time.
+    ``fields`` is ``None`` when the component couldn't be parsed and ``error`` says why.
+    """
+    properties = None
+    depth = 0
+    for line in iter_unfolded_lines(raw_lines):
+        try:
+            name, params, value = parse_content_line(line)
+        except ICalendarParseError as error:
+            if properties is not None:
+                properties = None
+                yield None, str(error)
+            continue
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT' and properties is None:
+                properties, depth = [], 0
+            elif properties is not None:
+                depth += 1
+        elif name == 'END':
+            if properties is None:
+                continue
+            if depth:
+                depth -= 1
+            elif value.upper() == 'VEVENT':
+                try:
+                    yield parse_vevent(properties), None
+                except ICalendarParseError as error:
+                    yield None, str(error)
+                properties = None
+        elif properties is not None and not depth:
+            properties.append((name, params, value))
@@ -0,0 +1,140 @@
+import hashlib
+import time
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .ical import iter_vevents
+from .models import Event
+from .recurrence import format_exception
+from .signals import events_bulk_changed
+from .versioning import deferred_version_bumps
+
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 20
+
+_UPDATE_FIELDS = ['name', 'description', 'timestamp', 'end', 'recurrence_frequency', 'recurrence_interval',
+                  'recurrence_count', 'recurrence_until', 'recurrence_exceptions', 'time_zone', 'updated_at',
+                  'duration_class']
+# Optional properties missing from a re-imported VEVENT are cleared on the stored event.
+_UPDATE_DEFAULTS = {'end': None, 'recurrence_frequency': '', 'recurrence_interval': 1, 'recurrence_count': None,
+                    'recurrence_until': None, 'recurrence_exceptions': [], 'time_zone': ''}
+_NAME_LENGTH = Event._meta.get_field('name').max_length
+_DESCRIPTION_LENGTH = Event._meta.get_field('description').max_length
+_UID_LENGTH = Event._meta.get_field('uid').max_length
+
+
+def _generated_uid(fields):
+    digest = hashlib.sha1(
+        '\x1f'.join([fields['timestamp'].isoformat(), fields['name'], fields['description']]).encode('utf-8')
+    ).hexdigest()
+    return f'{digest}@import.django-calendar'
+
+
+def clean_imported_event(fields):
+    """
+    Normalizes parsed VEVENT fields in place and returns an error message if they can't be stored.
+    """
+    fields['name'] = fields['name'][:_NAME_LENGTH]
+    fields['description'] = fields['description'][:_DESCRIPTION_LENGTH]
+    if not fields['uid']:
+        fields['uid'] = _generated_uid(fields)
+    if len(fields['uid']) > _UID_LENGTH:
+        return f"UID is longer than {_UID_LENGTH} characters."
+    if fields.get('end') is not None and fields['end'] < fields['timestamp']:
+        return "DTEND is before DTSTART."
+    frequency = fields.get('recurrence_frequency', '')
+    if frequency and frequency not in Event.Frequency.values:
+        return f"Unsupported recurrence frequency '{frequency}'."
+    if fields.get('recurrence_interval', 1) < 1:
+        return "RRULE INTERVAL must be positive."
+    if fields.get('recurrence_count') is not None and fields.get('recurrence_until') is not None:
+        return "RRULE can't have both COUNT and UNTIL."
+    if 'recurrence_exceptions' in fields:
+        fields['recurrence_exceptions'] = sorted({format_exception(value) for value in fields['recurrence_exceptions']})
+    return None
+
+
+class ICalendarImporter:
+    """
+    Imports the VEVENTs of an iCalendar stream into ``calendar`` in fixed-size batches.
+
+    Events are matched on their UID, so importing the same file again updates the events
+    it created instead of duplicating them. The stream is parsed lazily and at most one
+    batch is held in memory at a time.
+    """
+
+    def __init__(self, calendar, batch_size=IMPORT_BATCH_SIZE):
+        self.calendar = calendar
+        self.batch_size = batch_size
+        self.stats = {'parsed': 0, 'created': 0, 'updated': 0, 'invalid': 0, 'batches': 0}
+        self.errors = []
+
+    def run(self, raw_lines):
+        started = time.monotonic()
+        batch = {}
+        with transaction.atomic(), deferred_version_bumps():
+            for fields, error in iter_vevents(raw_lines):
+                self.stats['parsed'] += 1
+                error = error or clean_imported_event(fields)
+                if error:
+                    self._record_error(error)
+                    continue
+                batch[fields['uid']] = fields
+                if len(batch) >= self.batch_size:
+                    self._write_batch(batch)
+                    batch = {}
+            if batch:
+                self._write_batch(batch)
+        elapsed = time.monotonic() - started
+        return {
+            **self.stats,
+            'errors': self.errors,
+            'seconds': round(elapsed, 3),
+            'events_per_second': round(self.stats['parsed'] / elapsed) if elapsed else None,
+        }
+
+    def _record_error(self, error):
+        self.stats['invalid'] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'event': self.stats['parsed'], 'error': error})
+
+    def _existing_events(self, batch):
+        return {event.uid: event for event in Event.objects.filter(calendar=self.calendar, uid__in=list(batch))}
+
+    def _write_batch(self, batch):
+        existing = self._existing_events(batch)
+        try:
+            with transaction.atomic():
+                to_create, to_update = self._save_batch(batch, existing)
+        except IntegrityError:
+            # Another import created some of these UIDs since they were read; reading them again turns their
+            # inserts into updates.
+            to_create, to_update = self._save_batch(batch, self._existing_events(batch))
+        written = to_create + to_update
+        events_bulk_changed.send(sender=Event, calendar_ids=[self.calendar.pk],
+                                 event_ids=[event.pk for event in written], events=written,
+                                 created_ids=[event.pk for event in to_create])
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+        self.stats['batches'] += 1
+
+    def _save_batch(self, batch, existing):
+        to_create, to_update = [], []
+        now = timezone.now()
+        for uid, fields in batch.items():
+            event = existing.get(uid)
+            if event is None:
+                to_create.append(Event(calendar=self.calendar, **fields))
+                continue
+            for field, value in {**_UPDATE_DEFAULTS, **fields}.items():
+                setattr(event, field, value)
+            event.updated_at = now
+            to_update.append(event)
+        for event in to_create + to_update:
+            event.duration_class = event.get_duration_class()
+        if to_create:
+            Event.objects.bulk_create(to_create, batch_size=self.batch_size)
+        if to_update:
+            Event.objects.bulk_update(to_update, _UPDATE_FIELDS, batch_size=self.batch_size)
+        return to_create, to_update
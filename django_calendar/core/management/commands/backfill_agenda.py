@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import agenda
+
+
+class Command(BaseCommand):
+    help = "Writes the agenda entries of every existing event, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Events processed per transaction.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if not agenda.is_enabled():
+            raise CommandError("The agenda is disabled (CALENDAR_AGENDA['ENABLED']).")
+
+        def progress(total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Processed {total} events")
+
+        total = agenda.backfill(options['batch_size'], progress)
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} events."))
@@ -0,0 +1,81 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.benchmark import (SCENARIOS, BenchmarkRunner, Dataset, build_report, compare_reports,
+                            compare_representations, seed_data)
+
+
+class Command(BaseCommand):
+    help = ("Seeds a throwaway test database, drives every API endpoint through the test client and writes "
+            "p50/p95 latency, queries per request and peak memory to a JSON report.")
+
+    def add_arguments(self, parser):
+        defaults = Dataset()
+        parser.add_argument('--users', type=int, default=defaults.users)
+        parser.add_argument('--calendars', type=int, default=defaults.calendars)
+        parser.add_argument('--events', type=int, default=defaults.events)
+        parser.add_argument('--members-per-calendar', type=int, default=defaults.members_per_calendar)
+        parser.add_argument('--recurring-ratio', type=float, default=defaults.recurring_ratio)
+        parser.add_argument('--seed', type=int, default=defaults.seed)
+        parser.add_argument('--iterations', type=int, default=20, help="Measured requests per endpoint.")
+        parser.add_argument('--scenario', action='append', dest='scenarios', metavar='NAME',
+                            help="Only run the named scenario; can be repeated.")
+        parser.add_argument('--output', default='benchmark.json', help="Where to write the JSON report.")
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help="A previous report; fail if any endpoint regressed against it.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed relative growth of p95 latency and peak memory when comparing.")
+        parser.add_argument('--skip-representations', action='store_true',
+                            help="Don't time the serializer against the fast list representation.")
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['calendars'] < 1 or options['iterations'] < 1:
+            raise CommandError("--users, --calendars and --iterations must be at least 1.")
+        scenarios = SCENARIOS
+        if options['scenarios']:
+            known = {scenario.name: scenario for scenario in SCENARIOS}
+            unknown = sorted(set(options['scenarios']) - set(known))
+            if unknown:
+                raise CommandError(f"Unknown scenario(s): {', '.join(unknown)}. Known: {', '.join(known)}.")
+            scenarios = [known[name] for name in options['scenarios']]
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+        dataset = Dataset(users=options['users'], calendars=options['calendars'], events=options['events'],
+                          members_per_calendar=options['members_per_calendar'],
+                          recurring_ratio=options['recurring_ratio'], seed=options['seed'])
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            data = seed_data(dataset)
+            results = BenchmarkRunner(data, iterations=options['iterations'], scenarios=scenarios).run()
+            representations = None
+            if not options['skip_representations']:
+                representations = compare_representations(data, min(options['iterations'], 5))
+            report = build_report(data, results, options['iterations'], representations)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(f"{'endpoint':<24}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'peak KiB':>11}{'body KiB':>11}")
+        for name, result in report['endpoints'].items():
+            self.stdout.write(f"{name:<24}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                              f"{result['queries']:>9}{result['peak_memory_kb']:>11.1f}{result['response_kb']:>11.1f}")
+        if representations is not None:
+            self.stdout.write(f"{'list':<24}{'rows':>10}{'serializer ms':>15}{'fast ms':>10}{'speedup':>9}")
+            for name, result in representations.items():
+                self.stdout.write(f"{name:<24}{result['rows']:>10}{result['serializer_ms']:>15.2f}"
+                                  f"{result['fast_ms']:>10.2f}{result['speedup']:>8.2f}x")
+        self.stdout.write(f"Report written to {options['output']}")
+        if baseline is not None:
+            regressions = compare_reports(baseline, report, options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from core import sync
+
+
+class Command(BaseCommand):
+    help = "Deletes event tombstones older than CALENDAR_SYNC['TOMBSTONE_RETENTION_DAYS']."
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"Deleted {sync.prune_tombstones()} tombstones."))
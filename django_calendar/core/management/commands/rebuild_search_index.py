@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Repopulates the event full-text search index from the events table, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Events indexed per transaction.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if not search.is_enabled(options['database']):
+            raise CommandError("The search index needs an SQLite database with FTS5.")
+
+        def progress(total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Indexed {total} events")
+
+        total = search.rebuild(options['batch_size'], options['database'], progress)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} events."))
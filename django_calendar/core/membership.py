@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.db import transaction
+
+from .cache import LRUCache
+from .models import Calendar
+
+_cache_settings = getattr(settings, 'CALENDAR_MEMBERSHIP_CACHE', {})
+_calendar_ids = LRUCache(maxsize=_cache_settings.get('MAXSIZE', 10000), ttl=_cache_settings.get('TTL', 60))
+
+
+def _membership_query(user_id):
+    return Calendar.users.through.objects.filter(customuser_id=user_id).values_list('calendar_id', flat=True)
+
+
+def get_calendar_ids(user_id):
+    """
+    Returns the ids of every calendar the user is a member of, read from the
+    ``Calendar.users`` through table (indexed on the user column) and cached per process.
+    """
+    calendar_ids = _calendar_ids.get(user_id)
+    if calendar_ids is None:
+        calendar_ids = frozenset(_membership_query(user_id))
+        _calendar_ids.set(user_id, calendar_ids)
+    return calendar_ids
+
+
+async def aget_calendar_ids(user_id):
+    calendar_ids = _calendar_ids.get(user_id)
+    if calendar_ids is None:
+        calendar_ids = frozenset([calendar_id async for calendar_id in _membership_query(user_id).aiterator()])
+        _calendar_ids.set(user_id, calendar_ids)
+    return calendar_ids
+
+
+def has_calendar_access(user, calendar_id):
+    if not user.is_authenticated:
+        return False
+    return calendar_id in get_calendar_ids(user.pk)
+
+
+async def ahas_calendar_access(user, calendar_id):
+    if not user.is_authenticated:
+        return False
+    return calendar_id in await aget_calendar_ids(user.pk)
+
+
+def invalidate_users(user_ids):
+    """
+    Drops the cached memberships of ``user_ids`` now and again once the current transaction commits, so a
+    read of the not yet committed through table can't keep serving the old set until TTL.
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    _calendar_ids.delete_many(user_ids)
+    transaction.on_commit(lambda: _calendar_ids.delete_many(user_ids), robust=True)
+
+
+def clear_cache():
+    _calendar_ids.clear()
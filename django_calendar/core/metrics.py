@@ -0,0 +1,141 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_settings = getattr(settings, 'CALENDAR_METRICS', {})
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('request_db_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+class Histogram:
+    """
+    Cumulative Prometheus-style histogram over fixed ``buckets`` (upper bounds), plus sum and count.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+
+class MetricsRegistry:
+    """
+    Per-process request metrics keyed by resolved view name: wall time, DB time and DB query count.
+    """
+
+    metrics = (
+        ('calendar_request_duration_seconds', "Wall time spent handling requests, by view.", DURATION_BUCKETS),
+        ('calendar_request_db_duration_seconds', "Time spent in database queries per request, by view.",
+         DURATION_BUCKETS),
+        ('calendar_request_db_queries', "Database queries issued per request, by view.", QUERY_BUCKETS),
+    )
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, duration, db_duration, queries):
+        with self._lock:
+            histograms = self._views.get(view)
+            if histograms is None:
+                histograms = self._views[view] = tuple(Histogram(buckets) for _, _, buckets in self.metrics)
+            for histogram, value in zip(histograms, (duration, db_duration, queries)):
+                histogram.observe(value)
+
+    def render(self):
+        """Returns every histogram in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            views = sorted(self._views.items())
+            for index, (name, description, buckets) in enumerate(self.metrics):
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for view, histograms in views:
+                    histogram = histograms[index]
+                    label = f'view="{_escape_label(view)}"'
+                    bounds = [_format_value(bound) for bound in buckets] + ['+Inf']
+                    for bound, count in zip(bounds, histogram.cumulative_counts()):
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{{label}}} {_format_value(histogram.sum)}')
+                    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+def _format_value(value):
+    return repr(float(value))
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def start_request():
+    """
+    Starts collecting the DB time and query count of the current request. The stats live in a context variable,
+    so queries run by ``sync_to_async`` on behalf of an async view are attributed to the right request.
+    """
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def abandon_request(token):
+    _current.reset(token)
+
+
+def finish_request(request, response, stats, token, duration):
+    _current.reset(token)
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match is not None and match.view_name else '<unresolved>'
+    registry.observe(view, duration, stats.db_time, stats.queries)
+    if _settings.get('SERVER_TIMING', True):
+        response['Server-Timing'] = (f'app;dur={duration * 1000:.1f}, '
+                                     f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"')
+    return response
@@ -0,0 +1,157 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+from . import admission, metrics, routing
+
+
+class AsyncRoutesMiddleware:
+    """
+    Resolves requests that came in through ASGI against ``settings.ASGI_URLCONF``, which mounts the async
+    read views; WSGI requests keep ``ROOT_URLCONF``. Comes first so every other middleware resolves the same.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        urlconf = getattr(settings, 'ASGI_URLCONF', None)
+        if urlconf and isinstance(request, ASGIRequest):
+            request.urlconf = urlconf
+        return self.get_response(request)
+
+
+class PerformanceMiddleware:
+    """
+    Records the wall time, DB time and DB query count of every request under its resolved view name and reports
+    them in a ``Server-Timing`` header. Streaming responses are measured up to their first byte.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            metrics.abandon_request(token)
+            raise
+        return metrics.finish_request(request, response, stats, token, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            metrics.abandon_request(token)
+            raise
+        return metrics.finish_request(request, response, stats, token, time.perf_counter() - started)
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Scopes replica routing (``core.routing``) to a single request and pins users who wrote something to the
+    primary for a few seconds, so they read their own writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routing.start_request()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            routing.abandon_request(token)
+            raise
+        routing.finish_request(request, response, token)
+        return response
+
+    async def __acall__(self, request):
+        token = routing.start_request()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            routing.abandon_request(token)
+            raise
+        await routing.afinish_request(request, response, token)
+        return response
+
+
+class AdmissionControlMiddleware:
+    """
+    Sheds load before it reaches the views (see ``core.admission``): every request spends from its token's
+    rate budget (429 once exhausted) and then takes a slot of its route class, waiting in a bounded queue
+    if they are all busy (503 if the queue is full or the wait times out). Separate classes for cheap reads,
+    heavy reads and writes keep a flood of one from slowing the others down.
+
+    Slots are held until the view returns, so streamed bodies are sent after the slot is released.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        route_class = admission.classify(request) if admission.is_enabled() else None
+        if route_class is None:
+            return self.get_response(request)
+        retry_after = admission.check_budget(request)
+        if retry_after:
+            return admission.rejected(route_class, admission.RATE_LIMITED, retry_after)
+        limiter = admission.get_limiter(route_class)
+        decision = limiter.acquire(admission.queue_timeout())
+        if decision in (admission.QUEUE_FULL, admission.TIMED_OUT):
+            return admission.rejected(route_class, decision)
+        admission.decisions.record(route_class, decision)
+        try:
+            return self.get_response(request)
+        finally:
+            limiter.release()
+
+    async def __acall__(self, request):
+        route_class = admission.classify(request) if admission.is_enabled() else None
+        if route_class is None:
+            return await self.get_response(request)
+        retry_after = await admission.acheck_budget(request)
+        if retry_after:
+            return admission.rejected(route_class, admission.RATE_LIMITED, retry_after)
+        limiter = admission.get_limiter(route_class)
+        decision = await limiter.aacquire(admission.queue_timeout())
+        if decision in (admission.QUEUE_FULL, admission.TIMED_OUT):
+            return admission.rejected(route_class, decision)
+        admission.decisions.record(route_class, decision)
+        try:
+            return await self.get_response(request)
+        finally:
+            limiter.release()
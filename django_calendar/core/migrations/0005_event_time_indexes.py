@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_calendar_owner_alter_calendar_users'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['calendar', 'timestamp'], name='core_event_cal_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['timestamp', 'id'], name='core_event_ts_id_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_event_end'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='uid',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.UniqueConstraint(condition=models.Q(('uid', ''), _negated=True), fields=('calendar', 'uid'), name='core_event_unique_uid'),
+        ),
+    ]
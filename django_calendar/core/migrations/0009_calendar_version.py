@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_event_uid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendar',
+            name='version',
+            field=models.PositiveBigIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# Copied rather than imported: the migration must keep working whatever core.search becomes.
+SEARCH_TABLE = 'core_event_search'
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                          f"name, description, calendar, tokenize='unicode61 remove_diacritics 2')")
+    schema_editor.execute(f"INSERT INTO {SEARCH_TABLE} (rowid, name, description, calendar) "
+                          f"SELECT id, name, description, 'c' || calendar_id FROM core_event")
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_calendar_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0010_event_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgendaEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('calendar', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.calendar')),
+                ('event', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.event')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'timestamp', 'event'], name='core_agenda_user_ts_idx'), models.Index(fields=['calendar', 'user'], name='core_agenda_cal_user_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='agendaentry',
+            constraint=models.UniqueConstraint(fields=('event', 'user'), name='core_agenda_unique_event_user'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:19
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+# Copied from core.models as of this migration: the backfill must not change with the model.
+DURATION_CLASS_BOUNDS = tuple(timedelta(minutes=15 * 4 ** exponent) for exponent in range(7))
+
+BATCH_SIZE = 1000
+
+
+def _duration_class(event):
+    if event.recurrence_frequency or event.end is None or event.end <= event.timestamp:
+        return None
+    duration = event.end - event.timestamp
+    return next((index for index, bound in enumerate(DURATION_CLASS_BOUNDS) if duration <= bound),
+                len(DURATION_CLASS_BOUNDS))
+
+
+def classify_events(apps, schema_editor):
+    Event = apps.get_model('core', 'Event')
+    events = (Event.objects.filter(recurrence_frequency='', end__gt=models.F('timestamp'))
+              .only('timestamp', 'end', 'recurrence_frequency'))
+    batch = []
+    for event in events.iterator(chunk_size=BATCH_SIZE):
+        event.duration_class = _duration_class(event)
+        batch.append(event)
+        if len(batch) >= BATCH_SIZE:
+            Event.objects.bulk_update(batch, ['duration_class'])
+            batch = []
+    Event.objects.bulk_update(batch, ['duration_class'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_sync_changes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='duration_class',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['calendar', 'duration_class', 'timestamp'], name='core_event_conflict_idx'),
+        ),
+        migrations.RunPython(classify_events, migrations.RunPython.noop),
+    ]
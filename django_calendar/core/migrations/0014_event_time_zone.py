@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_event_duration_class'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='time_zone',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
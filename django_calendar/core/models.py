@@ -1,16 +1,144 @@
+from datetime import timedelta
+
 from django.db import models
 
 from user.models import CustomUser
 
 
+# The longest duration of each conflict class (see core.conflicts); longer events are in the next class.
+DURATION_CLASS_BOUNDS = tuple(timedelta(minutes=15 * 4 ** exponent) for exponent in range(7))
+
+
 class Calendar(models.Model):
     name = models.CharField(max_length=100)
     owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="calendar_owner_set")
     users = models.ManyToManyField(CustomUser, default=[], related_name="calendar_set")
+    version = models.PositiveBigIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        # The version is only ever incremented in the database (see core.versioning), so a
+        # regular save must not write back a possibly stale in-memory value.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name != 'version']
+        super().save(*args, **kwargs)
 
 
 class Event(models.Model):
+    class Frequency(models.TextChoices):
+        DAILY = 'DAILY'
+        WEEKLY = 'WEEKLY'
+        MONTHLY = 'MONTHLY'
+        YEARLY = 'YEARLY'
+
     calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
     description = models.CharField(max_length=255, blank=True)
     timestamp = models.DateTimeField()
+    end = models.DateTimeField(null=True, blank=True)
+    recurrence_frequency = models.CharField(max_length=7, choices=Frequency.choices, blank=True, default='')
+    recurrence_interval = models.PositiveIntegerField(default=1)
+    recurrence_count = models.PositiveIntegerField(null=True, blank=True)
+    recurrence_until = models.DateTimeField(null=True, blank=True)
+    recurrence_exceptions = models.JSONField(default=list, blank=True)
+    # IANA name of the zone a series repeats in, keeping its wall-clock time across DST changes; '' for UTC.
+    time_zone = models.CharField(max_length=64, blank=True, default='')
+    uid = models.CharField(max_length=255, blank=True, default='')
+    # Set by every save; code that writes with bulk_update must set it itself.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Set by every save; code that writes with bulk_create/bulk_update must set it itself.
+    duration_class = models.PositiveSmallIntegerField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['calendar', 'updated_at'], name='core_event_cal_updated_idx'),
+            models.Index(fields=['calendar', 'timestamp'], name='core_event_cal_ts_idx'),
+            models.Index(fields=['timestamp', 'id'], name='core_event_ts_id_idx'),
+            models.Index(fields=['calendar', 'timestamp'], condition=~models.Q(recurrence_frequency=''),
+                         name='core_event_series_idx'),
+            models.Index(fields=['calendar', 'duration_class', 'timestamp'], name='core_event_conflict_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['calendar', 'uid'], condition=~models.Q(uid=''),
+                                    name='core_event_unique_uid'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_calendar_id = instance.__dict__.get('calendar_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or {'timestamp', 'end', 'recurrence_frequency'} & set(update_fields):
+            # Times may still be strings, as assigned.
+            for name in ('timestamp', 'end'):
+                setattr(self, name, self._meta.get_field(name).to_python(getattr(self, name)))
+            self.duration_class = self.get_duration_class()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'duration_class'}
+        super().save(*args, **kwargs)
+        # Only now, so post_save receivers can still tell which calendar the event moved from.
+        self._loaded_calendar_id = self.calendar_id
+
+    @property
+    def is_recurring(self):
+        return bool(self.recurrence_frequency)
+
+    @property
+    def duration(self):
+        if self.end is None:
+            return None
+        return self.end - self.timestamp
+
+    def get_duration_class(self):
+        """
+        The index of the first of ``DURATION_CLASS_BOUNDS`` the event's duration fits in, so overlap queries
+        know how far back to look; None for recurring events and events that take no time.
+        """
+        duration = self.duration
+        if self.is_recurring or not duration:
+            return None
+        for duration_class, bound in enumerate(DURATION_CLASS_BOUNDS):
+            if duration <= bound:
+                return duration_class
+        return len(DURATION_CLASS_BOUNDS)
+
+
+class AgendaEntry(models.Model):
+    """
+    One row per (member, event) of every calendar, so a user's agenda is a single range over
+    (user, timestamp) instead of a join through every calendar they belong to. Maintained by core.agenda.
+    """
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+', db_index=False)
+    calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE, related_name='+', db_index=False)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='+', db_index=False)
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp', 'event'], name='core_agenda_user_ts_idx'),
+            models.Index(fields=['calendar', 'user'], name='core_agenda_cal_user_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'user'], name='core_agenda_unique_event_user'),
+        ]
+
+
+class EventTombstone(models.Model):
+    """
+    Left behind when an event is deleted from, or moved out of, a calendar, so /api/sync/ can tell the
+    calendar's members about it. Events removed with their whole calendar need none.
+    """
+
+    event_id = models.BigIntegerField()
+    calendar = models.ForeignKey(Calendar, on_delete=models.CASCADE, related_name='+', db_index=False)
+    deleted_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['calendar', 'deleted_at'], name='core_tombstone_cal_deleted_idx'),
+        ]
@@ -0,0 +1,30 @@
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination
+
+from .models import AgendaEntry
+
+
+class EventCursorPagination(CursorPagination):
+    ordering = ('timestamp', 'id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async counterpart of ``paginate_queryset``: DRF's own method, with its cursors and links, run in the
+        thread the async ORM would read the page from anyway.
+        """
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+
+class AgendaCursorPagination(EventCursorPagination):
+    """
+    Pages agenda entries in their events' order; the cursors are the same as for events, so they stay
+    valid when the agenda table is switched off and /api/agenda/ reads events directly.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        if queryset.model is AgendaEntry:
+            return ('timestamp', 'event_id')
+        return super().get_ordering(request, queryset, view)
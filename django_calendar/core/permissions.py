@@ -1,11 +1,19 @@
 from rest_framework.permissions import BasePermission
 
+from .membership import ahas_calendar_access, has_calendar_access
+
 
 class HasCalendarAccess(BasePermission):
     def has_object_permission(self, request, view, obj):
-        return request.user in obj.users.all()
+        return has_calendar_access(request.user, obj.pk)
+
+    async def ahas_object_permission(self, request, view, obj):
+        return await ahas_calendar_access(request.user, obj.pk)
 
 
 class HasEventAccess(BasePermission):
     def has_object_permission(self, request, view, obj):
-        return request.user in obj.calendar.users.all()
+        return has_calendar_access(request.user, obj.calendar_id)
+
+    async def ahas_object_permission(self, request, view, obj):
+        return await ahas_calendar_access(request.user, obj.calendar_id)
@@ -0,0 +1,257 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+_deferred = ContextVar('deferred_messages', default=None)
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _settings():
+    return getattr(settings, 'CALENDAR_PUBSUB', {})
+
+
+def calendar_channel(calendar_id):
+    return f'calendar:{calendar_id}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """
+    The channels one connection listens to and the bounded queue their messages land in. Lives on the event
+    loop that created it; ``deliver`` is always scheduled onto that loop.
+    """
+
+    OVERFLOW = object()
+
+    def __init__(self, hub, maxsize):
+        self.hub = hub
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.channels = set()
+        self.overflowed = False
+
+    def deliver(self, message):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A reader this far behind can't catch up from notifications; tell it to resync instead.
+            self.resync()
+
+    def resync(self):
+        """Drops the pending messages and tells the reader to resync: it missed, or will miss, some."""
+        if self.overflowed:
+            return
+        self.overflowed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(self.OVERFLOW)
+
+    async def get(self, timeout):
+        """Returns the next message, or None if none arrived within ``timeout`` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def subscribe(self, channels):
+        self.hub.subscribe(self, channels)
+
+    def unsubscribe(self, channels):
+        self.hub.unsubscribe(self, channels)
+
+    def close(self):
+        self.hub.unsubscribe(self, list(self.channels))
+
+
+class Hub:
+    """
+    Per-process fan-out from channels to the subscriptions listening to them. ``dispatch`` may be called
+    from any thread; an idle subscription costs a dictionary entry per channel.
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, subscription, channels):
+        with self._lock:
+            for channel in channels:
+                self._subscriptions[channel].add(subscription)
+                subscription.channels.add(channel)
+
+    def unsubscribe(self, subscription, channels):
+        with self._lock:
+            for channel in channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[channel]
+                subscription.channels.discard(channel)
+
+    def dispatch(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+
+    def resync(self):
+        """Tells every subscription to resync, e.g. after messages were lost on their way to this process."""
+        for subscription in self._all_subscriptions():
+            subscription.loop.call_soon_threadsafe(subscription.resync)
+
+    def _all_subscriptions(self):
+        with self._lock:
+            return {subscription for subscribers in self._subscriptions.values() for subscription in subscribers}
+
+    def subscriber_count(self):
+        return len(self._all_subscriptions())
+
+
+hub = Hub()
+
+
+class LocalBackend:
+    """
+    Delivers messages to the subscribers of this process only: enough for a single worker and for tests.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publish(self, channel, message):
+        self.hub.dispatch(channel, message)
+
+    async def start(self):
+        pass
+
+
+class RedisBackend:
+    """
+    Shares messages between workers through Redis pub/sub (needs the ``redis`` package). Every process
+    holds one pattern subscription and fans messages out to its own subscribers through the hub.
+
+    Messages published while the subscription is down are lost, so when it drops every subscriber is told
+    to resync, and again once it is back for those who connected in between. Reconnection attempts back off
+    exponentially from ``reconnect_delay`` to ``max_reconnect_delay`` seconds.
+    """
+
+    def __init__(self, hub, url='redis://localhost:6379/0', prefix='calendar-changes', reconnect_delay=0.5,
+                 max_reconnect_delay=30):
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise ImproperlyConfigured("CALENDAR_PUBSUB's RedisBackend needs the 'redis' package.")
+        self.hub = hub
+        self.url = url
+        self.prefix = prefix
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._redis = redis
+        self._client = redis.Redis.from_url(url)
+        self._listener = None
+
+    def publish(self, channel, message):
+        self._client.publish(f'{self.prefix}:{channel}', json.dumps(message))
+
+    async def start(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self):
+        client = self._redis.asyncio.Redis.from_url(self.url)
+        offset = len(self.prefix) + 1
+        failures = 0
+        while True:
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f'{self.prefix}:*')
+                if failures:
+                    self.hub.resync()
+                    failures = 0
+                async for item in pubsub.listen():
+                    if item['type'] == 'pmessage':
+                        self.hub.dispatch(item['channel'].decode()[offset:], json.loads(item['data']))
+            except (self._redis.exceptions.RedisError, OSError):
+                # The connection dropped: resync and reconnect below.
+                pass
+            finally:
+                await pubsub.reset()
+            self.hub.resync()
+            await asyncio.sleep(min(self.reconnect_delay * 2 ** failures, self.max_reconnect_delay))
+            failures += 1
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            options = _settings()
+            backend_class = import_string(options.get('BACKEND', 'core.pubsub.LocalBackend'))
+            _backend = backend_class(hub, **options.get('OPTIONS', {}))
+        return _backend
+
+
+def _send(messages):
+    backend = get_backend()
+    for channel, message in messages:
+        backend.publish(channel, message)
+
+
+def publish(channel, message):
+    """
+    Publishes ``message`` to ``channel`` once the current transaction commits (right away outside of one),
+    or collects it if called inside ``deferred_messages()``.
+    """
+    deferred = _deferred.get()
+    if deferred is not None:
+        deferred.append((channel, message))
+        return
+    # Robust: a backend outage must not fail a write that already committed.
+    transaction.on_commit(lambda: _send([(channel, message)]), robust=True)
+
+
+def _coalesce(messages):
+    # Messages that only differ by their ``events`` are merged into one listing all of them, in order.
+    merged = {}
+    for channel, message in messages:
+        rest = {key: value for key, value in message.items() if key != 'events'}
+        key = (channel, json.dumps(rest, sort_keys=True), 'events' in message)
+        if key not in merged:
+            merged[key] = (channel, rest, {})
+        merged[key][2].update(dict.fromkeys(message.get('events', ())))
+    return [(channel, {**rest, 'events': list(events)} if has_events else rest)
+            for (channel, _, has_events), (_, rest, events) in merged.items()]
+
+
+@contextmanager
+def deferred_messages():
+    """
+    Collects the messages published inside the block and publishes them, coalesced per channel, at the end.
+    """
+    if _deferred.get() is not None:
+        yield
+        return
+    token = _deferred.set([])
+    try:
+        yield
+        messages = _deferred.get()
+    finally:
+        _deferred.reset(token)
+    if messages:
+        messages = _coalesce(messages)
+        transaction.on_commit(lambda: _send(messages), robust=True)
@@ -0,0 +1,144 @@
+import calendar as calendar_module
+from datetime import timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+
+from .cache import LRUCache
+from .models import Event
+
+_cache_settings = getattr(settings, 'CALENDAR_OCCURRENCE_CACHE', {})
+_occurrences = LRUCache(maxsize=_cache_settings.get('MAXSIZE', 4096), ttl=_cache_settings.get('TTL', None))
+
+_FIXED_STEPS = {
+    Event.Frequency.DAILY: timedelta(days=1),
+    Event.Frequency.WEEKLY: timedelta(weeks=1),
+}
+_MONTH_STEPS = {
+    Event.Frequency.MONTHLY: 1,
+    Event.Frequency.YEARLY: 12,
+}
+
+
+def format_exception(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _exception_set(event):
+    return {parse_datetime(value) for value in event.recurrence_exceptions}
+
+
+def _to_local(value, zone):
+    """
+    The wall-clock time of ``value`` in ``zone``, naive so that adding days steps the clock rather than the
+    UTC instant; ``value`` itself without a zone.
+    """
+    return value if zone is None else value.astimezone(zone).replace(tzinfo=None)
+
+
+def _to_utc(value, zone):
+    # Like RFC 5545, a wall-clock time skipped by a DST change moves forward by the gap (fold=0).
+    return value if zone is None else value.replace(tzinfo=zone).astimezone(dt_timezone.utc)
+
+
+def _add_months(value, months):
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    if value.day > calendar_module.monthrange(year, month)[1]:
+        return None
+    return value.replace(year=year, month=month)
+
+
+def _iter_fixed(event, step, start, zone):
+    origin, start = _to_local(event.timestamp, zone), _to_local(start, zone)
+    first = 0
+    if start > origin:
+        # One step early: in a zone, the UTC offsets of the origin and of the window may differ.
+        first = max(0, -((origin - start) // step) - (zone is not None))
+    index = first
+    while True:
+        yield index, _to_utc(origin + step * index, zone)
+        index += 1
+
+
+def _iter_months(event, step, start, zone):
+    origin, start = _to_local(event.timestamp, zone), _to_local(start, zone)
+    first = 0
+    if start > origin:
+        months = (start.year - origin.year) * 12 + start.month - origin.month
+        first = max(0, months // step - 1)
+    # RFC 5545 drops occurrences on days missing from a month (e.g. the 31st) and they do not
+    # count towards COUNT, so those skipped before the window still have to be accounted for.
+    skipped = 0
+    if event.recurrence_count is not None and origin.day > 28:
+        skipped = sum(1 for index in range(first) if _add_months(origin, index * step) is None)
+    position = first - skipped
+    index = first
+    while True:
+        occurrence = _add_months(origin, index * step)
+        if occurrence is not None:
+            yield position, _to_utc(occurrence, zone)
+            position += 1
+        index += 1
+
+
+def iter_occurrences(event, start, end):
+    """
+    Lazily yields the start of every occurrence of ``event`` in ``[start, end)``.
+
+    The first candidate is computed arithmetically from ``start`` instead of walking the
+    series from its beginning, so the cost depends on the window rather than on the series length.
+    Series with a ``time_zone`` are stepped in its wall-clock time, so they keep their local hour across DST.
+    """
+    if not event.is_recurring:
+        if start <= event.timestamp < end:
+            yield event.timestamp
+        return
+    interval = max(event.recurrence_interval, 1)
+    zone = ZoneInfo(event.time_zone) if event.time_zone else None
+    if event.recurrence_frequency in _FIXED_STEPS:
+        candidates = _iter_fixed(event, _FIXED_STEPS[event.recurrence_frequency] * interval, start, zone)
+    else:
+        candidates = _iter_months(event, _MONTH_STEPS[event.recurrence_frequency] * interval, start, zone)
+    exceptions = _exception_set(event) if event.recurrence_exceptions else ()
+    for position, occurrence in candidates:
+        if occurrence >= end:
+            return
+        if event.recurrence_count is not None and position >= event.recurrence_count:
+            return
+        if event.recurrence_until is not None and occurrence > event.recurrence_until:
+            return
+        if occurrence >= start and occurrence not in exceptions:
+            yield occurrence
+
+
+def _series_key(event):
+    return (event.timestamp, event.recurrence_frequency, event.recurrence_interval, event.recurrence_count,
+            event.recurrence_until, tuple(event.recurrence_exceptions), event.time_zone)
+
+
+def get_occurrences(event, start, end):
+    """
+    Returns the occurrences of ``event`` in ``[start, end)`` as a tuple, cached per series and window.
+
+    The key includes the recurrence fields themselves, so an edited series never reads a stale entry
+    even in a process that missed the invalidation signal.
+    """
+    if not event.is_recurring:
+        return tuple(iter_occurrences(event, start, end))
+    key = (event.pk, _series_key(event), start, end)
+    occurrences = _occurrences.get(key)
+    if occurrences is None:
+        occurrences = tuple(iter_occurrences(event, start, end))
+        _occurrences.set(key, occurrences)
+    return occurrences
+
+
+def invalidate_series(event_ids):
+    event_ids = set(event_ids)
+    _occurrences.delete_where(lambda key: key[0] in event_ids)
+
+
+def clear_cache():
+    _occurrences.clear()
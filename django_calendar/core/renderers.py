@@ -0,0 +1,40 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return JSONRenderer().render(data, accepted_media_type, renderer_context)
+
+
+class ColumnarRenderer(BaseRenderer):
+    """
+    Compact JSON for list reads laid out column by column (see ``FastRepresentation.represent_columns``);
+    opt in with ``?format=columnar`` or ``Accept: application/vnd.calendar.columnar+json``. Anything
+    else (details, errors) is rendered as plain JSON.
+    """
+    media_type = 'application/vnd.calendar.columnar+json'
+    format = 'columnar'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data, None, renderer_context)
+
+
+class ICalendarRenderer(BaseRenderer):
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        # Errors raised before the calendar is streamed are still reported as JSON.
+        return JSONRenderer().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,259 @@
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+
+from django.db import models
+from rest_framework import ISO_8601, fields as serializer_fields, relations, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .renderers import ColumnarRenderer
+
+# Fields whose representation of the column types below is the value itself.
+_IDENTITY_FIELDS = (serializer_fields.IntegerField, serializer_fields.CharField, serializer_fields.ReadOnlyField)
+_IDENTITY_COLUMNS = (models.IntegerField, models.AutoField, models.CharField, models.TextField)
+_UNSUPPORTED_FIELDS = (serializers.BaseSerializer, serializer_fields.SerializerMethodField,
+                       serializer_fields.HiddenField)
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class Unsupported(Exception):
+    pass
+
+
+class FastRepresentation:
+    """
+    Builds the exact ``serializer_class(many=True).data`` of a list from ``values_list()`` rows, without model
+    instances or per-row serializer machinery: every field gets an encoder chosen once, from its serializer
+    field, that turns the raw column value into what the field's ``to_representation`` would return. Encoders
+    are factories bound at the start of every list, so per-request state (the current timezone) is read once.
+
+    Plain model fields, primary-key and slug relations are supported, including many-to-many slug relations
+    (read with one query per page, in related primary-key order). Serializers with anything else raise
+    ``Unsupported`` and keep going through the serializer.
+    """
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer_class.Meta.model
+        self.names, self.row_names, self.row_columns, self.encoders, self.many = [], [], [], [], []
+        # Columns the columnar format sends as epoch offsets and as dictionary indexes.
+        self.datetimes, self.relations = set(), set()
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            self.names.append(name)
+            if isinstance(field, relations.ManyRelatedField):
+                self.many.append((name, self._many_lookup(model, field)))
+                self.relations.add(name)
+                continue
+            column, encoder = self._column(model, field)
+            self.row_names.append(name)
+            self.row_columns.append(column)
+            if encoder is not None:
+                self.encoders.append((name, encoder))
+            if isinstance(field, relations.RelatedField):
+                self.relations.add(name)
+            elif isinstance(field, serializer_fields.DateTimeField):
+                self.datetimes.add(name)
+        pk_column = model._meta.pk.name
+        if self.many and pk_column not in self.row_columns:
+            self.row_names.append(pk_column)
+            self.row_columns.append(pk_column)
+        self.pk_index = self.row_columns.index(pk_column) if self.many else None
+
+    @staticmethod
+    def _column(model, field):
+        if isinstance(field, _UNSUPPORTED_FIELDS) or field.source == '*' or '.' in field.source:
+            raise Unsupported(field)
+        try:
+            model_field = model._meta.get_field(field.source)
+        except Exception:
+            raise Unsupported(field)
+        if isinstance(field, relations.SlugRelatedField):
+            if not model_field.many_to_one:
+                raise Unsupported(field)
+            return f'{field.source}__{field.slug_field}', None
+        if isinstance(field, relations.PrimaryKeyRelatedField):
+            if not model_field.many_to_one or field.pk_field is not None:
+                raise Unsupported(field)
+            return field.source, None
+        if isinstance(field, relations.RelatedField) or not model_field.concrete or model_field.is_relation:
+            raise Unsupported(field)
+        if (isinstance(field, _IDENTITY_FIELDS) and not isinstance(field, serializer_fields.ChoiceField)
+                and isinstance(model_field, _IDENTITY_COLUMNS)):
+            return field.source, None
+        if isinstance(field, serializer_fields.DateTimeField):
+            return field.source, _datetime_encoder(field)
+        return field.source, lambda: field.to_representation
+
+    @staticmethod
+    def _many_lookup(model, field):
+        child = field.child_relation
+        if not isinstance(child, relations.SlugRelatedField):
+            raise Unsupported(field)
+        try:
+            model_field = model._meta.get_field(field.source)
+        except Exception:
+            raise Unsupported(field)
+        if not model_field.many_to_many or not model_field.concrete:
+            raise Unsupported(field)
+        through = model_field.remote_field.through
+        source_column = model_field.m2m_field_name()
+        target_column = model_field.m2m_reverse_field_name()
+        return (through.objects.order_by(f'{target_column}_id').values_list(
+            f'{source_column}_id', f'{target_column}__{child.slug_field}', named=True), f'{source_column}_id__in')
+
+    def prepare(self, queryset):
+        """Turns a model queryset into the rows ``represent`` expects, keeping its filters and ordering."""
+        return queryset.prefetch_related(None).values_list(*self.row_columns, named=True)
+
+    def _encode(self, rows, related):
+        names, row_names, pk_index = self.names, self.row_names, self.pk_index
+        encoders = [(name, bind()) for name, bind in self.encoders]
+        data = []
+        for row in rows:
+            item = dict(zip(row_names, row))
+            for name, encode in encoders:
+                value = item[name]
+                if value is not None:
+                    item[name] = encode(value)
+            if related:
+                for name, values_by_pk in related:
+                    item[name] = values_by_pk.get(row[pk_index], [])
+                # The serializer's key order, without a primary key only read to look related values up.
+                item = {name: item[name] for name in names}
+            data.append(item)
+        return data
+
+    def _group(self, pairs):
+        grouped = defaultdict(list)
+        for pk, value in pairs:
+            grouped[pk].append(value)
+        return grouped
+
+    def _related(self, rows):
+        related = []
+        if self.many and rows:
+            pks = [row[self.pk_index] for row in rows]
+            for name, (queryset, lookup) in self.many:
+                related.append((name, self._group(queryset.filter(**{lookup: pks}))))
+        return related
+
+    def represent(self, rows):
+        rows = list(rows)
+        return self._encode(rows, self._related(rows))
+
+    async def arepresent(self, rows):
+        related = []
+        if self.many and rows:
+            pks = [row[self.pk_index] for row in rows]
+            for name, (queryset, lookup) in self.many:
+                pairs = [pair async for pair in queryset.filter(**{lookup: pks}).aiterator()]
+                related.append((name, self._group(pairs)))
+        return self._encode(rows, related)
+
+    def represent_columns(self, rows):
+        """
+        The same list as ``represent``, transposed: ``columns`` maps every field to the array of its values.
+        Datetimes are integer offsets, in ``time_unit`` (``s``, or ``us`` if any has a fraction of a second),
+        from the ``epoch`` Unix timestamp; relations hold indexes into their array of ``dictionaries``.
+        """
+        rows = list(rows)
+        related = self._related(rows)
+        columns = dict.fromkeys(self.names, ())
+        columns.update(zip(self.row_names, zip(*rows)))
+        for name, bind in self.encoders:
+            if name not in self.datetimes:
+                encode = bind()
+                columns[name] = [value if value is None else encode(value) for value in columns[name]]
+        for name, values_by_pk in related:
+            columns[name] = [values_by_pk.get(row[self.pk_index], []) for row in rows]
+        epoch, time_unit = self._encode_datetimes(columns)
+        dictionaries = {}
+        many = {name for name, _ in self.many}
+        for name in self.names:
+            if name in self.relations:
+                columns[name], dictionaries[name] = self._encode_dictionary(columns[name], name in many)
+        return {
+            'count': len(rows),
+            'fields': self.names,
+            'epoch': epoch,
+            'time_unit': time_unit,
+            'columns': {name: list(columns[name]) for name in self.names},
+            'dictionaries': dictionaries,
+        }
+
+    def _encode_datetimes(self, columns):
+        offsets, fractional = {}, False
+        for name in self.datetimes:
+            offsets[name] = [None if value is None else value - _EPOCH for value in columns[name]]
+            fractional = fractional or any(delta.microseconds for delta in offsets[name] if delta is not None)
+        seconds = [delta.days * 86400 + delta.seconds for deltas in offsets.values()
+                   for delta in deltas if delta is not None]
+        epoch = min(seconds, default=0)
+        for name, deltas in offsets.items():
+            if fractional:
+                columns[name] = [None if delta is None else (delta.days * 86400 + delta.seconds - epoch) * 1000000
+                                 + delta.microseconds for delta in deltas]
+            else:
+                columns[name] = [None if delta is None else delta.days * 86400 + delta.seconds - epoch
+                                 for delta in deltas]
+        return epoch, 'us' if fractional else 's'
+
+    @staticmethod
+    def _encode_dictionary(values, many):
+        indexes = {}
+        if many:
+            encoded = [[indexes.setdefault(value, len(indexes)) for value in row_values] for row_values in values]
+        else:
+            encoded = [None if value is None else indexes.setdefault(value, len(indexes)) for value in values]
+        return encoded, list(indexes)
+
+
+def _datetime_encoder(field):
+    """
+    ``field.to_representation`` for ISO 8601 output, with the timezone looked up once per list instead of
+    once per value (which dominates the cost of encoding datetimes).
+    """
+    def bind():
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+            return field.to_representation
+
+        def encode(value):
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return encode
+    return bind
+
+
+@lru_cache(maxsize=None)
+def get_fast_representation(serializer_class):
+    """The ``FastRepresentation`` of ``serializer_class``, or None if its fields need the serializer."""
+    try:
+        return FastRepresentation(serializer_class)
+    except Unsupported:
+        return None
+
+
+class FastListMixin:
+    """
+    Serves ``list()`` from ``values_list()`` rows encoded by ``FastRepresentation`` when the serializer allows
+    it; the response is the same, byte for byte, as the serializer's. Requests accepting a ``ColumnarRenderer``
+    get the rows (or the page's ``results``) in the columnar format instead.
+    """
+
+    def list(self, request, *args, **kwargs):
+        representation = get_fast_representation(self.get_serializer_class())
+        if representation is None:
+            return super().list(request, *args, **kwargs)
+        represent = representation.represent
+        if isinstance(request.accepted_renderer, ColumnarRenderer):
+            represent = representation.represent_columns
+        rows = representation.prepare(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(represent(page))
+        return Response(represent(rows))
@@ -0,0 +1,115 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Tokens are read right after login, before a replica may have caught up; they are cached anyway. Memberships
+# feed the process-wide cache of core.membership, where a lagging replica would undo an invalidation and keep
+# a removed member's access alive until the entry expires.
+PRIMARY_ONLY_MODELS = {'authtoken.token', 'authtoken.tokenproxy', 'core.calendar_users'}
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def _settings():
+    return getattr(settings, 'CALENDAR_DATABASE_ROUTING', {})
+
+
+def get_replicas():
+    return _settings().get('READ_REPLICAS', [])
+
+
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def _pin_cache():
+    return caches[_settings().get('CACHE_ALIAS', 'default')]
+
+
+def _pin_seconds():
+    return _settings().get('STICKY_SECONDS', 5)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to the replica chosen for the current request (see ``route_request``) and everything else,
+    including every write, to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in PRIMARY_ONLY_MODELS:
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def start_request():
+    return _read_alias.set(None)
+
+
+def abandon_request(token):
+    _read_alias.reset(token)
+
+
+def route_request(request):
+    """
+    Reads the rest of a safe request from a replica, unless its user wrote something in the last
+    ``STICKY_SECONDS`` and must keep reading their own writes from the primary.
+    """
+    replicas = get_replicas()
+    if not replicas or request.method not in SAFE_METHODS:
+        return
+    if request.user.is_authenticated and _pin_cache().get(_pin_key(request.user.pk)) is not None:
+        return
+    _read_alias.set(random.choice(replicas))
+
+
+async def aroute_request(request):
+    replicas = get_replicas()
+    if not replicas or request.method not in SAFE_METHODS:
+        return
+    if request.user.is_authenticated and await _pin_cache().aget(_pin_key(request.user.pk)) is not None:
+        return
+    _read_alias.set(random.choice(replicas))
+
+
+def _wrote(request, response):
+    if request.method in SAFE_METHODS or response.status_code >= 400 or not get_replicas() or not _pin_seconds():
+        return None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def finish_request(request, response, token):
+    _read_alias.reset(token)
+    user_id = _wrote(request, response)
+    if user_id is not None:
+        _pin_cache().set(_pin_key(user_id), True, _pin_seconds())
+
+
+async def afinish_request(request, response, token):
+    _read_alias.reset(token)
+    user_id = _wrote(request, response)
+    if user_id is not None:
+        await _pin_cache().aset(_pin_key(user_id), True, _pin_seconds())
+
+
+class ReplicaReadMixin:
+    """
+    Lets safe requests to a DRF view read from a replica once the user is known.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        route_request(request)
@@ -0,0 +1,128 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import Q
+
+from .models import Event
+
+SEARCH_TABLE = 'core_event_search'
+# Keeps statements under SQLite's bound-parameter limit.
+BATCH_SIZE = 500
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+
+def is_enabled(using=DEFAULT_DB_ALIAS):
+    """
+    The inverted index is an SQLite FTS5 table (see migration 0010); other databases fall back to a
+    ``LIKE`` scan in ``search_event_ids``.
+    """
+    return connections[using].vendor == 'sqlite'
+
+
+def _calendar_token(calendar_id):
+    return f'c{calendar_id}'
+
+
+def _row(event_id, calendar_id, name, description):
+    return event_id, name, description, _calendar_token(calendar_id)
+
+
+def _batches(items, size=BATCH_SIZE):
+    items = list(items)
+    for index in range(0, len(items), size):
+        yield items[index:index + size]
+
+
+def index_events(events, using=DEFAULT_DB_ALIAS):
+    rows = [_row(event.pk, event.calendar_id, event.name, event.description) for event in events]
+    _write_rows(rows, using)
+
+
+def _write_rows(rows, using):
+    if not rows or not is_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f'INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, name, description, calendar) '
+                           f'VALUES (%s, %s, %s, %s)', rows)
+
+
+def unindex_event_ids(event_ids, using=DEFAULT_DB_ALIAS):
+    if not is_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        for batch in _batches(event_ids):
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', batch)
+
+
+def rebuild(batch_size=1000, using=DEFAULT_DB_ALIAS, progress=None):
+    """
+    Rewrites the index from the events table, walking it by primary key in batches of ``batch_size``. Each
+    batch replaces the index rows of its id range in one transaction, so searches running meanwhile never see
+    an empty or partial index. Returns the number of events indexed.
+    """
+    connection = connections[using]
+    queryset = Event.objects.using(using).order_by('id').values_list('id', 'calendar_id', 'name', 'description')
+    last_id, total = 0, 0
+    while True:
+        with transaction.atomic(using=using):
+            rows = list(queryset.filter(id__gt=last_id)[:batch_size])
+            with connection.cursor() as cursor:
+                # Past the last batch, the range is open-ended: it drops rows of events deleted since.
+                if rows:
+                    cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid > %s AND rowid <= %s',
+                                   [last_id, rows[-1][0]])
+                else:
+                    cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid > %s', [last_id])
+            _write_rows([_row(*row) for row in rows], using)
+        if not rows:
+            break
+        last_id, total = rows[-1][0], total + len(rows)
+        if progress is not None:
+            progress(total)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def build_match_expression(query, calendar_ids):
+    """
+    Turns free text into an FTS5 expression: every word must appear in the name or description (the last
+    one as a prefix, for search-as-you-type), and the event must carry the token of one of ``calendar_ids``,
+    so the index intersects both posting lists instead of filtering the matches afterwards.
+    Returns None when ``query`` has no searchable word.
+    """
+    terms = _TERM.findall(query)
+    if not terms or not calendar_ids:
+        return None
+    words = ' '.join(f'"{term}"' for term in terms) + '*'
+    calendars = ' OR '.join(_calendar_token(calendar_id) for calendar_id in sorted(calendar_ids))
+    return f'{{name description}} : ({words}) AND calendar : ({calendars})'
+
+
+def search_event_ids(query, calendar_ids, limit):
+    """
+    Returns the ids of at most ``limit`` events of ``calendar_ids`` matching ``query``, best match first.
+    """
+    using = router.db_for_read(Event)
+    if not is_enabled(using):
+        return _scan_event_ids(query, calendar_ids, limit, using)
+    expression = build_match_expression(query, calendar_ids)
+    if expression is None:
+        return []
+    with connections[using].cursor() as cursor:
+        # Names weigh more than descriptions; the calendar column only restricts the match.
+        cursor.execute(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s '
+                       f'ORDER BY bm25({SEARCH_TABLE}, 10.0, 1.0, 0.0), rowid LIMIT %s', [expression, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _scan_event_ids(query, calendar_ids, limit, using):
+    terms = _TERM.findall(query)
+    if not terms or not calendar_ids:
+        return []
+    queryset = Event.objects.using(using).filter(calendar_id__in=calendar_ids)
+    for term in terms:
+        queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+    return list(queryset.order_by('-timestamp', 'id').values_list('id', flat=True)[:limit])
@@ -1,7 +1,10 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from rest_framework import serializers
 
 from user.models import CustomUser
 from .models import Calendar, Event
+from .recurrence import format_exception
 
 
 class CalendarSerializer(serializers.ModelSerializer):
@@ -33,7 +36,116 @@ class CalendarEmptySerializer(serializers.ModelSerializer):
         fields = []
 
 
-class EventSerializer(serializers.ModelSerializer):
+class EventValidationMixin(serializers.Serializer):
+    recurrence_exceptions = serializers.ListField(child=serializers.DateTimeField(), required=False)
+
+    def validate_recurrence_exceptions(self, value):
+        return sorted({format_exception(exception) for exception in value})
+
+    def validate_time_zone(self, value):
+        if value:
+            try:
+                ZoneInfo(value)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise serializers.ValidationError(f"Unknown time zone '{value}'.")
+        return value
+
+    def validate(self, attrs):
+        def current(field, default=None):
+            if field in attrs:
+                return attrs[field]
+            return getattr(self.instance, field, default)
+
+        if current('end') is not None and current('timestamp') is not None and current('end') < current('timestamp'):
+            raise serializers.ValidationError({"end": "'end' must not be before 'timestamp'."})
+        if current('recurrence_count') is not None and current('recurrence_until') is not None:
+            raise serializers.ValidationError("'recurrence_count' and 'recurrence_until' can't both be set.")
+        return attrs
+
+
+class EventSerializer(EventValidationMixin, serializers.ModelSerializer):
     class Meta:
         model = Event
-        fields = ['id', 'calendar', 'name', 'description', 'timestamp']
+        fields = ['id', 'calendar', 'name', 'description', 'timestamp', 'end', 'recurrence_frequency',
+                  'recurrence_interval', 'recurrence_count', 'recurrence_until', 'recurrence_exceptions', 'time_zone',
+                  'uid']
+        read_only_fields = ['uid']
+        extra_kwargs = {'recurrence_interval': {'min_value': 1}}
+
+
+class OccurrenceSerializer(serializers.Serializer):
+    event = serializers.IntegerField(source='event.id')
+    calendar = serializers.IntegerField(source='event.calendar_id')
+    name = serializers.CharField(source='event.name')
+    timestamp = serializers.DateTimeField()
+    end = serializers.DateTimeField(allow_null=True)
+
+
+class ConflictSerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    occurrences = OccurrenceSerializer(many=True)
+
+
+class CalendarSummarySerializer(serializers.Serializer):
+    calendar = serializers.IntegerField()
+    counts = serializers.DictField(child=serializers.IntegerField())
+
+
+class EventSummarySerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    bucket = serializers.CharField()
+    tz = serializers.CharField()
+    calendars = CalendarSummarySerializer(many=True)
+
+
+class EventBulkItemSerializer(EventValidationMixin, serializers.ModelSerializer):
+    calendar = serializers.IntegerField()
+
+    class Meta:
+        model = Event
+        fields = ['calendar', 'name', 'description', 'timestamp', 'end', 'recurrence_frequency',
+                  'recurrence_interval', 'recurrence_count', 'recurrence_until', 'recurrence_exceptions', 'time_zone']
+        extra_kwargs = {'recurrence_interval': {'min_value': 1}}
+
+
+class CalendarImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+
+
+class EventBulkSerializer(serializers.Serializer):
+    create = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    update = serializers.ListField(child=serializers.DictField(), required=False, default=list)
+    delete = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, attrs):
+        total = len(attrs['create']) + len(attrs['update']) + len(attrs['delete'])
+        max_items = self.context.get('max_items')
+        if max_items is not None and total > max_items:
+            raise serializers.ValidationError(f"At most {max_items} items can be sent in one request.")
+        return attrs
+
+
+class IntervalSerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+
+class FreeBusySerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    busy = IntervalSerializer(many=True)
+    users = serializers.DictField(child=IntervalSerializer(many=True))
+
+
+class SyncDeletedSerializer(serializers.Serializer):
+    calendars = serializers.ListField(child=serializers.IntegerField(), source='deleted_calendars')
+    events = serializers.ListField(child=serializers.IntegerField(), source='deleted_events')
+
+
+class SyncSerializer(serializers.Serializer):
+    calendars = CalendarSerializer(many=True)
+    events = EventSerializer(many=True)
+    deleted = SyncDeletedSerializer(source='*')
+    token = serializers.CharField()
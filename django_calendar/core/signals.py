@@ -0,0 +1,281 @@
+from django.db import models
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from user import directory
+from user.models import CustomUser
+from . import agenda, membership, metrics, pubsub, recurrence, search, sync
+from .models import Calendar, Event
+from .versioning import bump_calendar_versions
+
+# Sent by code paths that write events with bulk_create/bulk_update, which bypass the model
+# signals. Receives ``calendar_ids`` (every calendar touched), ``event_ids`` (every event written),
+# ``events`` (the written instances themselves) and ``created_ids`` (those of them that were just created).
+events_bulk_changed = Signal()
+
+
+def _membership_changed_users(instance, action, reverse, pk_set):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return []
+    if reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        return getattr(instance, '_cleared_user_ids', [])
+    return pk_set
+
+
+@receiver(m2m_changed, sender=Calendar.users.through)
+def invalidate_membership_on_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        instance._cleared_user_ids = list(instance.users.values_list('id', flat=True))
+    membership.invalidate_users(_membership_changed_users(instance, action, reverse, pk_set))
+
+
+@receiver(pre_delete, sender=Calendar)
+def collect_calendar_members(sender, instance, **kwargs):
+    instance._member_ids = list(instance.users.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Calendar)
+def invalidate_membership_on_calendar_delete(sender, instance, **kwargs):
+    membership.invalidate_users(getattr(instance, '_member_ids', []))
+
+
+@receiver(post_delete, sender=CustomUser)
+def invalidate_membership_on_user_delete(sender, instance, **kwargs):
+    membership.invalidate_users([instance.pk])
+
+
+@receiver(pre_delete, sender=CustomUser)
+def collect_user_calendars(sender, instance, **kwargs):
+    # The user's memberships go by cascade, which sends no m2m_changed; calendars they own go with them.
+    instance._member_of_ids = list(Calendar.users.through.objects.filter(customuser_id=instance.pk)
+                                   .exclude(calendar__owner_id=instance.pk).values_list('calendar_id', flat=True))
+
+
+@receiver(post_delete, sender=CustomUser)
+def remove_deleted_user_from_calendars(sender, instance, **kwargs):
+    calendar_ids = getattr(instance, '_member_of_ids', [])
+    bump_calendar_versions(calendar_ids)
+    sync.touch_calendars(calendar_ids)
+    for calendar_id in calendar_ids:
+        pubsub.publish(pubsub.calendar_channel(calendar_id),
+                       {'type': 'membership.removed', 'calendar': calendar_id, 'users': [instance.pk]})
+
+
+# The user directory lists the calendars of every member (see user.directory).
+@receiver(post_save, sender=Calendar)
+def invalidate_directory_on_calendar_save(sender, instance, created, **kwargs):
+    if not created and directory.is_enabled():
+        directory.invalidate(Calendar.users.through.objects.filter(calendar_id=instance.pk)
+                             .values_list('customuser_id', flat=True))
+
+
+@receiver(post_delete, sender=Calendar)
+def invalidate_directory_on_calendar_delete(sender, instance, **kwargs):
+    directory.invalidate(getattr(instance, '_member_ids', []))
+
+
+@receiver(m2m_changed, sender=Calendar.users.through)
+def invalidate_directory_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    directory.invalidate(_membership_changed_users(instance, action, reverse, pk_set))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_occurrences(sender, instance, **kwargs):
+    if instance.is_recurring:
+        recurrence.invalidate_series([instance.pk])
+
+
+@receiver(post_save, sender=Event)
+def bump_versions_on_event_save(sender, instance, **kwargs):
+    bump_calendar_versions({instance.calendar_id, getattr(instance, '_loaded_calendar_id', None)})
+
+
+@receiver(post_delete, sender=Event)
+def bump_versions_on_event_delete(sender, instance, origin=None, **kwargs):
+    # Events deleted in cascade from their calendar (or its owner) have no calendar left to bump.
+    if isinstance(origin, models.Model) and not isinstance(origin, Event):
+        return
+    bump_calendar_versions([instance.calendar_id])
+
+
+@receiver(post_save, sender=Calendar)
+def bump_version_on_calendar_save(sender, instance, created, **kwargs):
+    if not created:
+        bump_calendar_versions([instance.pk])
+
+
+def _membership_changed_calendars(instance, action, reverse, pk_set):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return []
+    if not reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        return getattr(instance, '_cleared_calendar_ids', [])
+    return pk_set
+
+
+@receiver(m2m_changed, sender=Calendar.users.through)
+def bump_versions_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    bump_calendar_versions(_membership_changed_calendars(instance, action, reverse, pk_set))
+
+
+@receiver(m2m_changed, sender=Calendar.users.through)
+def touch_calendars_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    sync.touch_calendars(_membership_changed_calendars(instance, action, reverse, pk_set))
+
+
+@receiver(m2m_changed, sender=Calendar.users.through)
+def collect_cleared_calendars(sender, instance, action, reverse, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_calendar_ids = list(instance.calendar_set.values_list('id', flat=True))
+
+
+@receiver(events_bulk_changed)
+def bump_versions_on_bulk_change(sender, calendar_ids, **kwargs):
+    bump_calendar_versions(calendar_ids)
+
+
+@receiver(post_save, sender=Event)
+def index_event_on_save(sender, instance, using, **kwargs):
+    search.index_events([instance], using)
+
+
+@receiver(post_delete, sender=Event)
+def unindex_event_on_delete(sender, instance, using, origin=None, **kwargs):
+    # Events deleted in cascade from a calendar are removed in batches by ``unindex_calendar_events``.
+    if isinstance(origin, models.Model) and not isinstance(origin, Event):
+        return
+    search.unindex_event_ids([instance.pk], using)
+
+
+@receiver(pre_delete, sender=Calendar)
+def collect_calendar_events(sender, instance, using, **kwargs):
+    if search.is_enabled(using):
+        events = Event.objects.using(using).filter(calendar=instance)
+        instance._event_ids = list(events.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Calendar)
+def unindex_calendar_events(sender, instance, using, **kwargs):
+    search.unindex_event_ids(getattr(instance, '_event_ids', []), using)
+
+
+@receiver(events_bulk_changed)
+def index_events_on_bulk_change(sender, events=(), **kwargs):
+    search.index_events(events)
+
+
+@receiver(post_save, sender=Event)
+def update_agenda_on_event_save(sender, instance, created, **kwargs):
+    agenda.update_event(instance, created)
+
+
+@receiver(events_bulk_changed)
+def update_agenda_on_bulk_change(sender, events=(), created_ids=(), **kwargs):
+    agenda.fan_out(events, created_ids)
+
+
+@receiver(m2m_changed, sender=Calendar.users.through)
+def update_agenda_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # Deleted events, calendars and users take their agenda entries with them through the foreign keys.
+    calendar_ids, user_ids = ([instance.pk], pk_set) if not reverse else (pk_set, [instance.pk])
+    if action == 'post_add':
+        agenda.add_memberships(calendar_ids, user_ids)
+    elif action == 'post_remove':
+        agenda.remove_memberships(calendar_ids, user_ids)
+    elif action == 'post_clear':
+        if reverse:
+            agenda.remove_memberships(user_ids=[instance.pk])
+        else:
+            agenda.remove_memberships(calendar_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Event)
+def record_moved_event(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_calendar_id', None)
+    if not created and previous not in (None, instance.calendar_id):
+        sync.record_deleted_events([(instance.pk, previous)])
+
+
+@receiver(events_bulk_changed)
+def record_moved_events_on_bulk_change(sender, events=(), **kwargs):
+    sync.record_deleted_events([(event.pk, event._loaded_calendar_id) for event in events
+                                if getattr(event, '_loaded_calendar_id', None) not in (None, event.calendar_id)])
+
+
+@receiver(post_delete, sender=Event)
+def record_deleted_event(sender, instance, origin=None, **kwargs):
+    # Events deleted with their calendar need no tombstone: the calendar disappears from every sync.
+    if isinstance(origin, models.Model) and not isinstance(origin, Event):
+        return
+    sync.record_deleted_events([(instance.pk, instance.calendar_id)])
+
+
+def _publish_events(message_type, calendar_id, event_ids):
+    pubsub.publish(pubsub.calendar_channel(calendar_id),
+                   {'type': message_type, 'calendar': calendar_id, 'events': list(event_ids)})
+
+
+@receiver(post_save, sender=Event)
+def publish_event_change(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_loaded_calendar_id', None)
+    if not created and previous not in (None, instance.calendar_id):
+        _publish_events('event.deleted', previous, [instance.pk])
+    _publish_events('event.changed', instance.calendar_id, [instance.pk])
+
+
+@receiver(events_bulk_changed)
+def publish_bulk_event_changes(sender, events=(), **kwargs):
+    with pubsub.deferred_messages():
+        for event in events:
+            previous = getattr(event, '_loaded_calendar_id', None)
+            if previous not in (None, event.calendar_id):
+                _publish_events('event.deleted', previous, [event.pk])
+            _publish_events('event.changed', event.calendar_id, [event.pk])
+
+
+@receiver(post_delete, sender=Event)
+def publish_event_delete(sender, instance, origin=None, **kwargs):
+    # Events deleted with their calendar are covered by its 'calendar.deleted'.
+    if isinstance(origin, models.Model) and not isinstance(origin, Event):
+        return
+    _publish_events('event.deleted', instance.calendar_id, [instance.pk])
+
+
+@receiver(post_save, sender=Calendar)
+def publish_calendar_change(sender, instance, created, **kwargs):
+    if not created:
+        pubsub.publish(pubsub.calendar_channel(instance.pk), {'type': 'calendar.changed', 'calendar': instance.pk})
+
+
+@receiver(post_delete, sender=Calendar)
+def publish_calendar_delete(sender, instance, **kwargs):
+    pubsub.publish(pubsub.calendar_channel(instance.pk), {'type': 'calendar.deleted', 'calendar': instance.pk})
+
+
+@receiver(m2m_changed, sender=Calendar.users.through)
+def publish_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        pairs = [(instance.pk, pk_set if action != 'post_clear' else getattr(instance, '_cleared_user_ids', []))]
+    else:
+        calendar_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_calendar_ids', [])
+        pairs = [(calendar_id, [instance.pk]) for calendar_id in calendar_ids]
+    message_type = 'membership.added' if action == 'post_add' else 'membership.removed'
+    for calendar_id, user_ids in pairs:
+        message = {'type': message_type, 'calendar': calendar_id, 'users': sorted(user_ids)}
+        pubsub.publish(pubsub.calendar_channel(calendar_id), message)
+        if action == 'post_add':
+            # New members aren't listening to the calendar yet.
+            for user_id in user_ids:
+                pubsub.publish(pubsub.user_channel(user_id), message)
+
+
+@receiver(connection_created)
+def record_queries_for_metrics(sender, connection, **kwargs):
+    metrics.install_query_recorder(connection)
@@ -0,0 +1,102 @@
+import asyncio
+import io
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+
+from user.authentication import CachedTokenAuthentication
+from . import pubsub
+from .membership import aget_calendar_ids
+
+STREAM_PATH = '/api/stream/'
+
+
+def _settings():
+    return getattr(settings, 'CALENDAR_PUBSUB', {})
+
+
+def format_message(message):
+    return f"event: {message['type']}\ndata: {json.dumps(message, separators=(',', ':'))}\n\n".encode()
+
+
+class ChangeStream:
+    """
+    ASGI application streaming, as server-sent events, the change notifications (``core.pubsub``) of every
+    calendar the token's user belongs to, following them as they join and leave calendars. Notifications only
+    carry ids; clients fetch the data with /api/sync/.
+
+    It is mounted in front of Django by ``django_calendar.asgi`` so it can notice disconnects. An idle
+    connection holds no database connection, only a subscription and a task waiting on its queue.
+    """
+
+    def __init__(self, heartbeat=None, queue_size=None):
+        self.heartbeat = heartbeat if heartbeat is not None else _settings().get('HEARTBEAT_SECONDS', 15)
+        self.queue_size = queue_size if queue_size is not None else _settings().get('QUEUE_SIZE', 100)
+
+    async def __call__(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            await self.reply(send, 405, {"detail": f"Method \"{scope['method']}\" not allowed."}, [(b'allow', b'GET')])
+            return
+        auth = await CachedTokenAuthentication().aauthenticate(ASGIRequest(scope, io.BytesIO()))
+        if auth is None:
+            await self.reply(send, 401, {"detail": "Authentication credentials were not provided."},
+                             [(b'www-authenticate', b'Token')])
+            return
+        user = auth[0]
+        calendar_ids = await aget_calendar_ids(user.pk)
+        await sync_to_async(close_old_connections)()
+        await pubsub.get_backend().start()
+
+        subscription = pubsub.Subscription(pubsub.hub, self.queue_size)
+        subscription.subscribe([pubsub.user_channel(user.pk), *map(pubsub.calendar_channel, calendar_ids)])
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no')]})
+            await send({'type': 'http.response.body', 'body': b': connected\n\n', 'more_body': True})
+            await self.stream(subscription, user.pk, disconnected, send)
+        finally:
+            subscription.close()
+            disconnected.cancel()
+
+    async def stream(self, subscription, user_id, disconnected, send):
+        while True:
+            getter = asyncio.ensure_future(subscription.get(self.heartbeat))
+            await asyncio.wait({getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                getter.cancel()
+                return
+            message = getter.result()
+            if message is None:
+                body = b': keepalive\n\n'
+            elif message is subscription.OVERFLOW:
+                await send({'type': 'http.response.body', 'body': b'event: resync\ndata: {}\n\n', 'more_body': False})
+                return
+            else:
+                self.follow(subscription, user_id, message)
+                body = format_message(message)
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    @staticmethod
+    def follow(subscription, user_id, message):
+        channel = pubsub.calendar_channel(message['calendar'])
+        concerns_user = user_id in message.get('users', ())
+        if message['type'] == 'membership.added' and concerns_user:
+            subscription.subscribe([channel])
+        elif message['type'] == 'membership.removed' and concerns_user or message['type'] == 'calendar.deleted':
+            subscription.unsubscribe([channel])
+
+    @staticmethod
+    async def wait_for_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    @staticmethod
+    async def reply(send, status, data, headers=()):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'application/json'), *headers]})
+        await send({'type': 'http.response.body', 'body': json.dumps(data).encode()})
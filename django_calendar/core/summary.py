@@ -0,0 +1,103 @@
+import hashlib
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay, TruncHour, TruncWeek
+
+from .models import Calendar, Event
+from .recurrence import get_occurrences
+
+HOUR = 'hour'
+DAY = 'day'
+WEEK = 'week'
+BUCKETS = {HOUR: TruncHour, DAY: TruncDay, WEEK: TruncWeek}
+KEY_PREFIX = 'event-summary'
+# Bumped by ``clear_cache`` so this process stops seeing the entries it wrote before.
+_generation = 0
+
+
+def _settings():
+    return getattr(settings, 'CALENDAR_SUMMARY', {})
+
+
+def is_enabled():
+    return _settings().get('ENABLED', True)
+
+
+def truncate(value, bucket, tzinfo):
+    """The start of the ``bucket`` ``value`` falls in, in ``tzinfo``, the way the database's ``Trunc*`` does it."""
+    local = value.astimezone(tzinfo).replace(minute=0, second=0, microsecond=0, fold=0)
+    if bucket == HOUR:
+        return local
+    local = local.replace(hour=0)
+    if bucket == WEEK:
+        local -= timedelta(days=local.weekday())
+    return local
+
+
+def _format(value):
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def summarize(calendar_ids, start, end, bucket, tzinfo):
+    """
+    Returns ``[{'calendar', 'counts'}]`` for ``calendar_ids``: how many occurrences start in each ``bucket`` of
+    ``[start, end)``, keyed by the start of the bucket in ``tzinfo``. Single events are counted by the
+    database over the (calendar, timestamp) index; series are expanded, as they can't be.
+    """
+    counts = {calendar_id: Counter() for calendar_id in calendar_ids}
+    rows = (
+        Event.objects
+        .filter(calendar_id__in=calendar_ids, recurrence_frequency='', timestamp__gte=start, timestamp__lt=end)
+        .annotate(bucket=BUCKETS[bucket]('timestamp', tzinfo=tzinfo))
+        .values('calendar_id', 'bucket')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in rows:
+        counts[row['calendar_id']][row['bucket']] += row['count']
+    series = Event.objects.filter(
+        Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=start),
+        calendar_id__in=calendar_ids, timestamp__lt=end,
+    ).exclude(recurrence_frequency='')
+    for event in series:
+        counts[event.calendar_id].update(truncate(occurrence, bucket, tzinfo)
+                                         for occurrence in get_occurrences(event, start, end))
+    return [{'calendar': calendar_id,
+             'counts': {_format(bucket_start): count for bucket_start, count in sorted(counts[calendar_id].items())}}
+            for calendar_id in sorted(counts)]
+
+
+def _key(versions, start, end, bucket, tzinfo):
+    versions = ','.join(f'{calendar_id}:{version}' for calendar_id, version in versions)
+    digest = hashlib.sha1(f'{versions}|{start.isoformat()}|{end.isoformat()}|{bucket}|{tzinfo.key}'.encode())
+    return f'{KEY_PREFIX}:{_generation}:{digest.hexdigest()}'
+
+
+def get_summary(calendar_ids, start, end, bucket, tzinfo):
+    """
+    ``summarize()``, cached under the versions of the calendars: any event write bumps its calendar's version
+    (see core.versioning) and so moves every summary of the calendar to a new key, which is why past ranges
+    and the current month alike can be served from the cache.
+    """
+    if not is_enabled():
+        return summarize(calendar_ids, start, end, bucket, tzinfo)
+    versions = list(Calendar.objects.filter(pk__in=calendar_ids).order_by('id').values_list('id', 'version'))
+    calendar_ids = [calendar_id for calendar_id, _ in versions]
+    cache = caches[_settings().get('CACHE_ALIAS', 'default')]
+    key = _key(versions, start, end, bucket, tzinfo)
+    calendars = cache.get(key)
+    if calendars is None:
+        calendars = summarize(calendar_ids, start, end, bucket, tzinfo)
+        cache.set(key, calendars, _settings().get('TTL', 3600))
+    return calendars
+
+
+def clear_cache():
+    """Forgets every summary this process cached."""
+    global _generation
+    _generation += 1
@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Calendar, Event, EventTombstone
+
+TOKEN_SALT = 'core.sync'
+
+_deferred = ContextVar('deferred_tombstones', default=None)
+
+
+def _settings():
+    return getattr(settings, 'CALENDAR_SYNC', {})
+
+
+def get_retention():
+    return timedelta(days=_settings().get('TOMBSTONE_RETENTION_DAYS', 30))
+
+
+class ExpiredSyncToken(Exception):
+    pass
+
+
+def record_deleted_events(events):
+    """
+    Leaves a tombstone for every ``(event_id, calendar_id)`` pair with a single INSERT,
+    or collects them if called inside ``deferred_tombstones()``.
+    """
+    events = [(event_id, calendar_id) for event_id, calendar_id in events if calendar_id is not None]
+    if not events:
+        return
+    deferred = _deferred.get()
+    if deferred is not None:
+        deferred.extend(events)
+        return
+    now = timezone.now()
+    EventTombstone.objects.bulk_create([EventTombstone(event_id=event_id, calendar_id=calendar_id, deleted_at=now)
+                                        for event_id, calendar_id in events])
+
+
+@contextmanager
+def deferred_tombstones():
+    """
+    Collects the tombstones recorded inside the block and writes them with one INSERT at the end.
+    """
+    if _deferred.get() is not None:
+        yield
+        return
+    token = _deferred.set([])
+    try:
+        yield
+        events = _deferred.get()
+    finally:
+        _deferred.reset(token)
+    record_deleted_events(events)
+
+
+def touch_calendars(calendar_ids):
+    calendar_ids = {calendar_id for calendar_id in calendar_ids if calendar_id is not None}
+    if calendar_ids:
+        Calendar.objects.filter(pk__in=calendar_ids).update(updated_at=timezone.now())
+
+
+def prune_tombstones():
+    """Deletes the tombstones older than the retention; tokens that old can't be used anymore."""
+    return EventTombstone.objects.filter(deleted_at__lt=timezone.now() - get_retention()).delete()[0]
+
+
+def dump_token(user_id, since, calendar_ids):
+    return signing.dumps({'user': user_id, 'since': since.timestamp(), 'calendars': sorted(calendar_ids)},
+                         salt=TOKEN_SALT, compress=True)
+
+
+def load_token(token, user_id):
+    """
+    Returns the ``(since, calendar_ids)`` a token was issued with. Raises ``signing.BadSignature`` for tokens
+    this server didn't issue to ``user_id`` and ``ExpiredSyncToken`` for tokens older than the tombstone
+    retention.
+    """
+    data = signing.loads(token, salt=TOKEN_SALT)
+    # Another user's token would replay its calendar list as ours: what we joined since would be missed.
+    if data.get('user') != user_id:
+        raise signing.BadSignature('Sync token issued to another user.')
+    since = datetime.fromtimestamp(data['since'], tz=dt_timezone.utc)
+    if since < timezone.now() - get_retention():
+        raise ExpiredSyncToken
+    return since, set(data['calendars'])
+
+
+def get_changes(user_id, calendar_ids, since=None, known_calendar_ids=frozenset()):
+    """
+    Collects what changed in ``calendar_ids`` (the calendars of user ``user_id``) since the token that carried ``since``
+    and ``known_calendar_ids``, reading only the (calendar, updated_at) and (calendar, deleted_at) ranges
+    after ``since``. Calendars the user joined since come back whole; the ones they left (or that were
+    deleted) come back as deleted, and their events with them.
+
+    The next token starts ``SETTLE_SECONDS`` in the past so writes that were still being committed when
+    this one was issued aren't missed; clients may see such changes twice.
+    """
+    now = timezone.now()
+    calendar_ids = set(calendar_ids)
+    joined = calendar_ids if since is None else calendar_ids - known_calendar_ids
+    kept = calendar_ids - joined
+    changed_calendars, changed_events, deleted_events = Q(pk__in=joined), Q(calendar_id__in=joined), set()
+    if kept:
+        changed_calendars |= Q(pk__in=kept, updated_at__gte=since)
+        changed_events |= Q(calendar_id__in=kept, updated_at__gte=since)
+        deleted_events.update(EventTombstone.objects.filter(calendar_id__in=kept, deleted_at__gte=since)
+                              .values_list('event_id', flat=True))
+    calendars = Calendar.objects.filter(changed_calendars).select_related('owner').prefetch_related('users')
+    events = list(Event.objects.filter(changed_events).order_by('updated_at', 'id'))
+    # Moved between two of the user's calendars: an update, not a deletion.
+    deleted_events.difference_update(event.pk for event in events)
+    next_since = now - timedelta(seconds=_settings().get('SETTLE_SECONDS', 5))
+    return {
+        'calendars': list(calendars.order_by('id')),
+        'events': events,
+        'deleted_calendars': sorted(known_calendar_ids - calendar_ids),
+        'deleted_events': sorted(deleted_events),
+        'token': dump_token(user_id, next_since, calendar_ids),
+    }
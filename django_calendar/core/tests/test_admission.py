@@ -0,0 +1,143 @@
+import asyncio
+import threading
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core import admission, membership
+from core.admission import Limiter, RateBudgets
+from core.tests.test_api import create_calendar, create_event
+from user.tests.test_api import authenticate_client, create_user, get_user_token
+
+
+class LimiterTestCase(SimpleTestCase):
+    def test_queue_and_hand_over(self):
+        limiter = Limiter(concurrency=1, queue_size=1)
+        self.assertEquals(limiter.acquire(0), admission.ADMITTED)
+        results = []
+        waiting = threading.Thread(target=lambda: results.append(limiter.acquire(5)))
+        waiting.start()
+        while not limiter._waiters:
+            pass
+        self.assertEquals(limiter.acquire(5), admission.QUEUE_FULL)
+        limiter.release()
+        waiting.join()
+        self.assertEquals(results, [admission.QUEUED])
+        self.assertEquals(limiter.active, 1)
+        limiter.release()
+        self.assertEquals(limiter.active, 0)
+
+    def test_timeout(self):
+        limiter = Limiter(concurrency=1, queue_size=5)
+        limiter.acquire(0)
+        self.assertEquals(limiter.acquire(0.01), admission.TIMED_OUT)
+        self.assertEquals(len(limiter._waiters), 0)
+        limiter.release()
+        self.assertEquals(limiter.acquire(0), admission.ADMITTED)
+
+    def test_async(self):
+        limiter = Limiter(concurrency=1, queue_size=1)
+
+        async def run():
+            self.assertEquals(await limiter.aacquire(0), admission.ADMITTED)
+            self.assertEquals(await limiter.aacquire(0.01), admission.TIMED_OUT)
+            waiting = asyncio.ensure_future(limiter.aacquire(5))
+            await asyncio.sleep(0)
+            self.assertEquals(await limiter.aacquire(5), admission.QUEUE_FULL)
+            limiter.release()
+            self.assertEquals(await waiting, admission.QUEUED)
+            cancelled = asyncio.ensure_future(limiter.aacquire(5))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.gather(cancelled, return_exceptions=True)
+            limiter.release()
+
+        asyncio.run(run())
+        self.assertEquals(limiter.active, 0)
+        self.assertEquals(len(limiter._waiters), 0)
+
+    def test_rate_budgets(self):
+        budgets = RateBudgets()
+        self.assertEquals(budgets.spend("token", rate=1, burst=2), 0)
+        self.assertEquals(budgets.spend("token", rate=1, burst=2), 0)
+        self.assertGreater(budgets.spend("token", rate=1, burst=2), 0.9)
+        self.assertEquals(budgets.spend("other", rate=1, burst=2), 0)
+
+
+class AdmissionControlTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        admission.clear()
+        self.user = create_user("test1", "test")
+        authenticate_client(self.client, get_user_token(self.user))
+        self.calendar = create_calendar("calendar", self.user, [self.user])
+        self.event = create_event("event", self.calendar)
+
+    def hold(self, route_class):
+        limiter = admission.get_limiter(route_class)
+        while limiter.acquire(0) == admission.ADMITTED:
+            pass
+        self.addCleanup(lambda: [limiter.release() for _ in range(limiter.active)])
+
+    @override_settings(CALENDAR_ADMISSION={"LIMITS": {"heavy": {"CONCURRENCY": 1, "QUEUE_SIZE": 0}},
+                                           "HEAVY_VIEWS": ["events-list"], "EXEMPT_VIEWS": ["metrics"]})
+    def test_saturated_heavy_class_sheds_only_heavy_reads(self):
+        self.hold(admission.HEAVY)
+        response = self.client.get(reverse("events-list"))
+        self.assertEquals(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEquals(response["Retry-After"], "1")
+        self.assertEquals(response.json(), {"message": "The server is busy, try again later."})
+        response = self.client.get(reverse("events-detail", kwargs={"pk": self.event.pk}))
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(reverse("events-detail", kwargs={"pk": self.event.pk}), {"name": "renamed"})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(admission.decisions.as_dict(), {
+            ("heavy", "queue_full"): 1, ("read", "admitted"): 1, ("write", "admitted"): 1})
+
+    @override_settings(CALENDAR_ADMISSION={"LIMITS": {"read": {"CONCURRENCY": 1, "QUEUE_SIZE": 1}},
+                                           "QUEUE_TIMEOUT": 0.01, "RETRY_AFTER": 3})
+    def test_queue_timeout(self):
+        self.hold(admission.READ)
+        response = self.client.get(reverse("events-detail", kwargs={"pk": self.event.pk}))
+        self.assertEquals(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEquals(response["Retry-After"], "3")
+        self.assertEquals(admission.decisions.as_dict(), {("read", "timed_out"): 1})
+
+    @override_settings(CALENDAR_ADMISSION={"TOKEN_RATE": 0.01, "TOKEN_BURST": 2})
+    def test_token_rate_budget(self):
+        url = reverse("events-detail", kwargs={"pk": self.event.pk})
+        self.assertEquals(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertEquals(self.client.get(url).status_code, status.HTTP_200_OK)
+        response = self.client.get(url)
+        self.assertEquals(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response["Retry-After"]), 99)
+        other = APIClient()
+        authenticate_client(other, get_user_token(create_user("test2", "test")))
+        self.assertEquals(other.get(reverse("users-list")).status_code, status.HTTP_200_OK)
+        # Without a valid token the view decides.
+        self.assertEquals(APIClient().get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(CALENDAR_ADMISSION={"TOKEN_RATE": 0.01, "TOKEN_BURST": 1})
+    def test_async_path(self):
+        async def get():
+            headers = {"authorization": f"Token {get_user_token(self.user)}"}
+            return [(await self.async_client.get(reverse("events-list"), headers=headers)).status_code
+                    for _ in range(2)]
+        self.assertEquals(async_to_sync(get)(), [status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS])
+
+    @override_settings(CALENDAR_ADMISSION={"ENABLED": False, "LIMITS": {"read": {"QUEUE_SIZE": 0}}})
+    def test_disabled(self):
+        self.hold(admission.READ)
+        response = self.client.get(reverse("events-detail", kwargs={"pk": self.event.pk}))
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+    def test_metrics(self):
+        self.client.get(reverse("events-list"))
+        staff = APIClient()
+        authenticate_client(staff, get_user_token(create_user("admin", "test", is_staff=True)))
+        content = staff.get(reverse("metrics")).content.decode()
+        self.assertIn('calendar_admission_decisions_total{class="heavy",decision="admitted"} 1', content)
+        self.assertNotIn('class="read"', content)
@@ -0,0 +1,105 @@
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership
+from core.models import AgendaEntry, Event
+from core.tests.test_api import create_calendar, create_event, ICS_FILE
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+
+class AgendaTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.client1 = APIClient()
+        self.client2 = APIClient()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        self.user3 = create_user("test3", "test")
+        authenticate_client(self.client1, get_user_token(self.user1))
+        authenticate_client(self.client2, get_user_token(self.user2))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1, self.user2])
+        self.other = create_calendar("other", self.user2, [self.user2])
+        self.event1 = create_event("event1", self.calendar, timestamp="2025-01-02T09:00:00Z")
+        self.event2 = create_event("event2", self.other, timestamp="2025-01-01T09:00:00Z")
+        self.event3 = create_event("event3", self.other, timestamp="2025-01-03T09:00:00Z")
+
+    def agenda(self, client=None, **params):
+        response = (client or self.client2).get(reverse("agenda"), params)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        return [event["name"] for event in response.json()["results"]]
+
+    def entries(self, user):
+        return list(AgendaEntry.objects.filter(user=user).order_by("timestamp", "event_id")
+                    .values_list("event__name", flat=True))
+
+    def test_agenda_matches_event_list(self):
+        window = {"start": "2025-01-02T00:00:00Z"}
+        for params in ({}, window, {"calendar": self.other.id}, {"page_size": 1}):
+            expected = self.client2.get(reverse("events-list"), params).json()["results"]
+            response = self.client2.get(reverse("agenda"), params)
+            self.assertEquals(response.json()["results"], expected)
+        self.assertEquals(self.agenda(), ["event2", "event1", "event3"])
+        self.assertEquals(self.agenda(self.client1), ["event1"])
+
+    def test_agenda_pagination(self):
+        url, params, names = reverse("agenda"), {"page_size": 2}, []
+        while url:
+            page = self.client2.get(url, params).json()
+            names.extend(event["name"] for event in page["results"])
+            url, params = page["next"], None
+        self.assertEquals(names, ["event2", "event1", "event3"])
+
+    def test_agenda_follows_event_writes(self):
+        self.client2.patch(reverse("events-detail", kwargs={"pk": self.event1.id}),
+                           {"timestamp": "2025-01-04T09:00:00Z"})
+        self.assertEquals(self.agenda(), ["event2", "event3", "event1"])
+        self.client2.patch(reverse("events-detail", kwargs={"pk": self.event2.id}), {"calendar": self.calendar.id})
+        self.assertEquals(self.agenda(self.client1), ["event2", "event1"])
+        self.client2.delete(reverse("events-detail", kwargs={"pk": self.event3.id}))
+        self.assertEquals(self.agenda(), ["event2", "event1"])
+        self.client2.post(reverse("events-list"), {"calendar": self.other.id, "name": "event4",
+                                                   "timestamp": "2025-01-01T00:00:00Z"})
+        self.assertEquals(self.agenda(), ["event4", "event2", "event1"])
+
+    def test_agenda_follows_membership(self):
+        url_kwargs = {"pk": self.other.id}
+        self.client2.post(reverse("add-users", kwargs=url_kwargs), {"users": ["test1", "test3"]}, format="json")
+        self.assertEquals(self.agenda(self.client1), ["event2", "event1", "event3"])
+        self.assertEquals(self.entries(self.user3), ["event2", "event3"])
+        self.client2.post(reverse("remove-users", kwargs=url_kwargs), {"users": ["test1"]}, format="json")
+        self.assertEquals(self.agenda(self.client1), ["event1"])
+        self.user3.calendar_set.clear()
+        self.assertEquals(self.entries(self.user3), [])
+        self.other.users.clear()
+        self.assertEquals(self.entries(self.user2), ["event1"])
+        self.calendar.delete()
+        self.assertFalse(AgendaEntry.objects.exists())
+
+    def test_agenda_follows_bulk_and_import(self):
+        payload = {"create": [{"calendar": self.calendar.id, "name": "bulk", "timestamp": "2025-01-05T00:00:00Z"}],
+                   "update": [{"id": self.event1.id, "timestamp": "2025-01-06T00:00:00Z"}]}
+        self.client1.post(reverse("events-bulk"), payload, format="json")
+        self.assertEquals(self.agenda(self.client1), ["bulk", "event1"])
+        self.client1.post(reverse("calendar-import", kwargs={"pk": self.calendar.id}),
+                          {"file": SimpleUploadedFile("calendar.ics", ICS_FILE.encode())}, format="multipart")
+        self.assertEquals(len(self.agenda(self.client1)), Event.objects.filter(calendar=self.calendar).count())
+
+    def test_backfill_command(self):
+        AgendaEntry.objects.all().delete()
+        out = StringIO()
+        call_command("backfill_agenda", batch_size=2, stdout=out)
+        self.assertIn("Processed 3 events.", out.getvalue())
+        self.assertEquals(self.agenda(), ["event2", "event1", "event3"])
+        self.assertEquals(AgendaEntry.objects.count(), 4)
+
+    @override_settings(CALENDAR_AGENDA={'ENABLED': False})
+    def test_disabled_agenda_reads_events(self):
+        create_event("event4", self.other, timestamp="2025-01-04T09:00:00Z")
+        self.assertEquals(AgendaEntry.objects.filter(event__name="event4").count(), 0)
+        self.assertEquals(self.agenda(), ["event2", "event1", "event3", "event4"])
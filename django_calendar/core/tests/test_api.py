@@ -1,7 +1,16 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 
+from core import membership
+from core.bulk import BULK_BATCH_SIZE
+from core.importer import ICalendarImporter
 from core.models import Calendar, Event
 from core.serializers import CalendarSerializer, EventSerializer
 from user.models import CustomUser
@@ -16,13 +25,15 @@ def create_calendar(name, owner, users):
     return calendar
 
 
-def create_event(name, calendar, description="test description", timestamp="2025-01-01T00:00:00Z"):
-    event = Event.objects.create(name=name, calendar=calendar, description=description, timestamp=timestamp)
+def create_event(name, calendar, description="test description", timestamp="2025-01-01T00:00:00Z", **kwargs):
+    event = Event.objects.create(name=name, calendar=calendar, description=description, timestamp=timestamp,
+                                 **kwargs)
     return event
 
 
 class CalendarTestCase(APITestCase):
     def setUp(self):
+        membership.clear_cache()
         self.client1 = APIClient()
         self.client2 = APIClient()
         authenticate_client(self.client1, get_user_token(create_user("test1", "test")))
@@ -106,6 +117,38 @@ class CalendarTestCase(APITestCase):
         self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertTrue(self.user1 in calendar.users.all())
 
+    def test_calendar_add_and_remove_many_users(self):
+        calendar = create_calendar("calendar", self.user1, [self.user1])
+        usernames = [user.username for user in
+                     CustomUser.objects.bulk_create([CustomUser(username=f"user{i}") for i in range(60)])]
+        add_url = reverse("add-users", kwargs={"pk": calendar.id})
+        remove_url = reverse("remove-users", kwargs={"pk": calendar.id})
+        self.client1.post(add_url, {"users": usernames[:1]}, format='json')
+        with CaptureQueriesContext(connection) as context:
+            self.client1.post(add_url, {"users": usernames[1:10]}, format='json')
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client1.post(add_url, {"users": usernames[10:] + usernames[:10]}, format='json')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(calendar.users.count(), 61)
+        with CaptureQueriesContext(connection) as context:
+            self.client1.post(remove_url, {"users": usernames[:10]}, format='json')
+        with self.assertNumQueries(len(context.captured_queries)):
+            response = self.client1.post(remove_url, {"users": usernames[10:]}, format='json')
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.data["users"], [self.user1.username])
+
+    def test_calendar_remove_users_is_all_or_nothing(self):
+        calendar = create_calendar("calendar", self.user1, [self.user1, self.user2])
+        create_user("test3", "test")
+        response = self.client1.post(reverse("remove-users", kwargs={"pk": calendar.id}),
+                                     {"users": [self.user2.username, "test3"]}, format='json')
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(self.user2 in calendar.users.all())
+        response = self.client1.post(reverse("add-users", kwargs={"pk": calendar.id}),
+                                     {"users": ["test3", "nobody"]}, format='json')
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEquals(calendar.users.count(), 2)
+
     def test_calendar_patch_users(self):
         calendar = create_calendar("calendar", self.user1, [self.user1])
         response = self.client1.patch(reverse('calendars-detail', kwargs={"pk": calendar.id}),
@@ -134,6 +177,7 @@ class CalendarTestCase(APITestCase):
 
 class EventTestCase(APITestCase):
     def setUp(self):
+        membership.clear_cache()
         self.client1 = APIClient()
         self.client2 = APIClient()
         authenticate_client(self.client1, get_user_token(create_user("test1", "test")))
@@ -154,7 +198,15 @@ class EventTestCase(APITestCase):
             "calendar": self.calendar.id,
             "name": new_event["name"],
             "description": new_event["description"],
-            "timestamp": "2025-01-01T00:00:00Z"
+            "timestamp": "2025-01-01T00:00:00Z",
+            "end": None,
+            "recurrence_frequency": "",
+            "recurrence_interval": 1,
+            "recurrence_count": None,
+            "recurrence_until": None,
+            "recurrence_exceptions": [],
+            "time_zone": "",
+            "uid": ""
         }
         response = self.client1.post(reverse("events-list"), data=new_event, format="json")
         self.assertTrue(response.status_code, status.HTTP_201_CREATED)
@@ -188,5 +240,234 @@ class EventTestCase(APITestCase):
         user2_events.append(shared_event)
         response1 = self.client1.get(reverse("events-list"))
         response2 = self.client2.get(reverse("events-list"))
-        self.assertEquals(response1.data, EventSerializer(user1_events, many=True).data)
-        self.assertEquals(response2.data, EventSerializer(user2_events, many=True).data)
+        self.assertEquals(response1.data["results"], EventSerializer(user1_events, many=True).data)
+        self.assertEquals(response2.data["results"], EventSerializer(user2_events, many=True).data)
+
+    def test_event_list_time_window(self):
+        other_calendar = create_calendar("other", self.user1, [self.user1])
+        inside = create_event("inside", self.calendar, timestamp="2025-01-02T10:00:00Z")
+        create_event("before", self.calendar, timestamp="2025-01-01T10:00:00Z")
+        create_event("at end", self.calendar, timestamp="2025-01-03T00:00:00Z")
+        create_event("other calendar", other_calendar, timestamp="2025-01-02T10:00:00Z")
+        response = self.client1.get(reverse("events-list"), {"calendar": self.calendar.id,
+                                                             "start": "2025-01-02T00:00:00Z",
+                                                             "end": "2025-01-03T00:00:00Z"})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.data["results"], EventSerializer([inside], many=True).data)
+
+    def test_event_list_invalid_window(self):
+        response = self.client1.get(reverse("events-list"), {"start": "yesterday"})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client1.get(reverse("events-list"), {"start": "2025-01-02T00:00:00Z",
+                                                             "end": "2025-01-01T00:00:00Z"})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_event_list_cursor_pagination(self):
+        events = [create_event("event" + str(i), self.calendar, timestamp=f"2025-01-0{5 - i}T00:00:00Z")
+                  for i in range(4)]
+        events.reverse()
+        response = self.client1.get(reverse("events-list"), {"page_size": 3})
+        self.assertEquals(response.data["results"], EventSerializer(events[:3], many=True).data)
+        response = self.client1.get(response.data["next"])
+        self.assertEquals(response.data["results"], EventSerializer(events[3:], many=True).data)
+        self.assertIsNone(response.data["next"])
+
+    def test_event_bulk(self):
+        calendar2 = create_calendar("calendar2", self.user2, [self.user2])
+        to_update = create_event("old name", self.calendar)
+        to_delete = create_event("to delete", self.calendar)
+        foreign = create_event("foreign", calendar2)
+        payload = {
+            "create": [
+                {"calendar": self.calendar.id, "name": "new", "timestamp": "2025-01-01T00:00:00Z"},
+                {"calendar": calendar2.id, "name": "forbidden", "timestamp": "2025-01-01T00:00:00Z"},
+                {"calendar": 1000, "name": "missing calendar", "timestamp": "2025-01-01T00:00:00Z"},
+                {"calendar": self.calendar.id, "name": "no timestamp"},
+            ],
+            "update": [{"id": to_update.id, "name": "new name"}, {"id": foreign.id, "name": "hacked"}],
+            "delete": [to_delete.id, foreign.id],
+        }
+        response = self.client1.post(reverse("events-bulk"), payload, format="json")
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals([item["status"] for item in response.data["create"]], [201, 403, 400, 400])
+        self.assertEquals(response.data["create"][3]["errors"], {"timestamp": ["This field is required."]})
+        self.assertEquals([item["status"] for item in response.data["update"]], [200, 404])
+        self.assertEquals([item["status"] for item in response.data["delete"]], [204, 404])
+        created = Event.objects.get(name="new")
+        self.assertEquals(response.data["create"][0]["data"], EventSerializer(created).data)
+        self.assertEquals(Event.objects.get(id=to_update.id).name, "new name")
+        self.assertFalse(Event.objects.filter(id=to_delete.id).exists())
+        self.assertEquals(Event.objects.get(id=foreign.id).name, "foreign")
+
+    def test_event_bulk_query_count_is_constant(self):
+        def payload(count):
+            return {"create": [{"calendar": self.calendar.id, "name": f"event{i}",
+                                "timestamp": "2025-01-01T00:00:00Z"} for i in range(count)]}
+
+        def insert_batches(count):
+            fields = [field for field in Event._meta.concrete_fields if not field.primary_key]
+            batch_size = min(BULK_BATCH_SIZE, connection.ops.bulk_batch_size(fields, [None] * count))
+            return -(-count // batch_size)
+
+        self.client1.post(reverse("events-bulk"), payload(1), format="json")
+        # Whatever the size of the batch: the savepoint and its release, the search index, the members of the
+        # calendars and the insert of their agenda entries, and the version bump; the token lookup is cached.
+        # Plus one INSERT per batch the backend splits the events into.
+        for count in (10, 200):
+            with self.assertNumQueries(6 + insert_batches(count)):
+                self.client1.post(reverse("events-bulk"), payload(count), format="json")
+        self.assertEquals(insert_batches(200), 3 if connection.vendor == "sqlite" else 1)
+        self.assertEquals(Event.objects.count(), 211)
+
+
+class CalendarExportTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.client1 = APIClient()
+        self.client2 = APIClient()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        authenticate_client(self.client1, get_user_token(self.user1))
+        authenticate_client(self.client2, get_user_token(self.user2))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1])
+
+    def test_export(self):
+        create_event("later", self.calendar, description="a, b; c", timestamp="2025-01-02T10:00:00Z",
+                     end="2025-01-02T11:00:00Z")
+        create_event("standup", self.calendar, timestamp="2025-01-01T09:00:00Z",
+                     recurrence_frequency=Event.Frequency.WEEKLY, recurrence_count=5,
+                     recurrence_exceptions=["2025-01-08T09:00:00Z"])
+        response = self.client1.get(reverse("calendar-export", kwargs={"pk": self.calendar.id}))
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEquals(response["Content-Type"], "text/calendar; charset=utf-8")
+        body = b"".join(response.streaming_content).decode()
+        self.assertTrue(body.startswith("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"))
+        self.assertTrue(body.endswith("END:VCALENDAR\r\n"))
+        self.assertEquals(body.count("BEGIN:VEVENT"), 2)
+        self.assertLess(body.index("SUMMARY:standup"), body.index("SUMMARY:later"))
+        self.assertIn("DTSTART:20250102T100000Z\r\nDTEND:20250102T110000Z\r\n", body)
+        self.assertIn("DESCRIPTION:a\\, b\\; c\r\n", body)
+        self.assertIn("RRULE:FREQ=WEEKLY;COUNT=5\r\nEXDATE:20250108T090000Z\r\n", body)
+
+    def test_export_streams_under_asgi(self):
+        for i in range(3):
+            create_event(f"event{i}", self.calendar)
+
+        async def export():
+            response = await self.async_client.get(reverse("calendar-export", kwargs={"pk": self.calendar.id}),
+                                                   headers={"authorization": f"Token {get_user_token(self.user1)}"})
+            return response, [chunk async for chunk in response.streaming_content]
+        with mock.patch("core.ical._FLUSH_SIZE", 1):
+            response, chunks = async_to_sync(export)()
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        # Consumed chunk by chunk, not buffered whole.
+        self.assertTrue(response.is_async)
+        self.assertEquals(len(chunks), 4)
+        self.assertEquals(b"".join(chunks).decode().count("BEGIN:VEVENT"), 3)
+        self.assertFalse(self.client1.get(reverse("calendar-export", kwargs={"pk": self.calendar.id})).is_async)
+
+    def test_export_folds_long_lines(self):
+        create_event("x" * 100, self.calendar)
+        response = self.client1.get(reverse("calendar-export", kwargs={"pk": self.calendar.id}))
+        lines = b"".join(response.streaming_content).split(b"\r\n")
+        self.assertTrue(all(len(line) <= 75 for line in lines))
+        self.assertIn(b" " + b"x" * 33, lines)
+
+    def test_export_no_access(self):
+        response = self.client2.get(reverse("calendar-export", kwargs={"pk": self.calendar.id}))
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+ICS_FILE = """BEGIN:VCALENDAR\r
+VERSION:2.0\r
+BEGIN:VEVENT\r
+UID:standup@example.com\r
+DTSTART:20250101T090000Z\r
+DURATION:PT15M\r
+SUMMARY:Stand\r
+ up\r
+RRULE:FREQ=DAILY;COUNT=10\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:review@example.com\r
+DTSTART;TZID=Europe/Berlin:20250102T140000\r
+DTEND;TZID=Europe/Berlin:20250102T150000\r
+SUMMARY:Review\r
+DESCRIPTION:Line one\\nLine two\\, continued\r
+BEGIN:VALARM\r
+ACTION:DISPLAY\r
+END:VALARM\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:broken@example.com\r
+SUMMARY:No start\r
+END:VEVENT\r
+END:VCALENDAR\r
+"""
+
+
+class CalendarImportTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.client = APIClient()
+        self.user = create_user("test1", "test")
+        authenticate_client(self.client, get_user_token(self.user))
+        self.calendar = create_calendar("calendar", self.user, [self.user])
+        self.url = reverse("calendar-import", kwargs={"pk": self.calendar.id})
+
+    def upload(self, content):
+        return self.client.post(self.url, {"file": SimpleUploadedFile("calendar.ics", content.encode())},
+                                format="multipart")
+
+    def test_import(self):
+        response = self.upload(ICS_FILE)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals({key: response.data[key] for key in ("parsed", "created", "updated", "invalid")},
+                          {"parsed": 3, "created": 2, "updated": 0, "invalid": 1})
+        standup = Event.objects.get(uid="standup@example.com")
+        self.assertEquals(standup.name, "Standup")
+        self.assertEquals(standup.recurrence_frequency, Event.Frequency.DAILY)
+        self.assertEquals(standup.recurrence_count, 10)
+        self.assertEquals(EventSerializer(standup).data["end"], "2025-01-01T09:15:00Z")
+        review = Event.objects.get(uid="review@example.com")
+        self.assertEquals(EventSerializer(review).data["timestamp"], "2025-01-02T13:00:00Z")
+        self.assertEquals(review.description, "Line one\nLine two, continued")
+
+    def test_reimport_is_idempotent(self):
+        self.upload(ICS_FILE)
+        response = self.upload(ICS_FILE.replace("SUMMARY:Review", "SUMMARY:Renamed"))
+        self.assertEquals((response.data["created"], response.data["updated"]), (0, 2))
+        self.assertEquals(Event.objects.filter(calendar=self.calendar).count(), 2)
+        self.assertEquals(Event.objects.get(uid="review@example.com").name, "Renamed")
+
+    def test_import_racing_another_import(self):
+        read_existing = ICalendarImporter._existing_events
+
+        def racing_read(importer, batch):
+            existing = read_existing(importer, batch)
+            if not Event.objects.filter(uid="standup@example.com").exists():
+                create_event("Concurrent", self.calendar, uid="standup@example.com")
+            return existing
+
+        with mock.patch.object(ICalendarImporter, "_existing_events", racing_read):
+            response = self.upload(ICS_FILE)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals((response.data["created"], response.data["updated"]), (1, 1))
+        self.assertEquals(Event.objects.get(uid="standup@example.com").name, "Standup")
+
+    def test_export_import_round_trip(self):
+        create_event("event", self.calendar, description="a, b; c", timestamp="2025-01-02T10:00:00Z",
+                     end="2025-01-02T11:00:00Z")
+        export = self.client.get(reverse("calendar-export", kwargs={"pk": self.calendar.id}))
+        other = create_calendar("other", self.user, [self.user])
+        response = self.client.post(reverse("calendar-import", kwargs={"pk": other.id}),
+                                    {"file": SimpleUploadedFile("calendar.ics", b"".join(export.streaming_content))},
+                                    format="multipart")
+        self.assertEquals(response.data["created"], 1)
+        imported = Event.objects.get(calendar=other)
+        self.assertEquals((imported.name, imported.description), ("event", "a, b; c"))
+
+    def test_import_without_file(self):
+        response = self.client.post(self.url, {}, format="multipart")
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,105 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.urls import resolve, reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership, recurrence
+from core.async_views import CalendarListAsyncView, EventDetailAsyncView, EventListAsyncView, FreeBusyAsyncView
+from core.views import CalendarViewSet, EventViewSet, FreeBusyView
+from core.tests.test_api import create_calendar, create_event
+from user.tests.test_api import create_user, get_user_token
+
+
+class AsyncReadViewTestCase(APITestCase):
+    """
+    Reads every endpoint through the ASGI client (async path) and through the DRF view it falls back to,
+    and expects the same answer from both.
+    """
+
+    def setUp(self):
+        membership.clear_cache()
+        recurrence.clear_cache()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        self.headers = {"authorization": f"Token {get_user_token(self.user1)}"}
+        self.sync_client = APIClient()
+        self.sync_client.force_authenticate(self.user1)
+        self.calendar = create_calendar("calendar", self.user1, [self.user1, self.user2])
+        self.other = create_calendar("other", self.user2, [self.user2])
+        self.events = [create_event(f"event{i}", self.calendar, timestamp=f"2025-01-0{i + 1}T09:00:00Z",
+                                    end=f"2025-01-0{i + 1}T10:00:00Z") for i in range(5)]
+        self.foreign = create_event("foreign", self.other)
+
+    def get_async(self, url, data=None, **headers):
+        async def get():
+            return await self.async_client.get(url, data, headers={**self.headers, **headers})
+        return async_to_sync(get)()
+
+    def assertSameResponse(self, url, data=None):
+        response = self.get_async(url, data)
+        expected = self.sync_client.get(url, data)
+        self.assertEquals(response.status_code, expected.status_code)
+        self.assertEquals(response.json(), expected.json())
+        self.assertEquals(response.get("ETag"), expected.get("ETag"))
+        return response
+
+    def test_routes_resolve_to_async_views(self):
+        views = {reverse("events-list"): EventListAsyncView, reverse("calendars-list"): CalendarListAsyncView,
+                 reverse("events-detail", kwargs={"pk": 1}): EventDetailAsyncView,
+                 reverse("freebusy"): FreeBusyAsyncView}
+        for url, view_class in views.items():
+            self.assertIs(resolve(url, settings.ASGI_URLCONF).func.view_class, view_class)
+        self.assertEquals(self.get_async(reverse("freebusy")).resolver_match.func.view_class, FreeBusyAsyncView)
+
+    def test_wsgi_routes_resolve_to_drf_views(self):
+        views = {reverse("events-list"): EventViewSet, reverse("calendars-list"): CalendarViewSet,
+                 reverse("events-detail", kwargs={"pk": 1}): EventViewSet, reverse("freebusy"): FreeBusyView}
+        for url, view_class in views.items():
+            self.assertIs(resolve(url).func.cls, view_class)
+        response = self.sync_client.get(reverse("events-list"))
+        self.assertIs(response.resolver_match.func.cls, EventViewSet)
+
+    def test_event_list(self):
+        self.assertSameResponse(reverse("events-list"))
+        self.assertSameResponse(reverse("events-list"), {"start": "2025-01-02T00:00:00Z",
+                                                         "end": "2025-01-04T00:00:00Z"})
+        self.assertSameResponse(reverse("events-list"), {"start": "yesterday"})
+
+    def test_event_list_cursor_pagination(self):
+        url, data, names = reverse("events-list"), {"page_size": 2}, []
+        while url:
+            page = self.assertSameResponse(url, data).json()
+            names.extend(event["name"] for event in page["results"])
+            url, data = page["next"], None
+        self.assertEquals(names, [event.name for event in self.events])
+
+    def test_event_detail(self):
+        response = self.assertSameResponse(reverse("events-detail", kwargs={"pk": self.events[0].id}))
+        self.assertEquals(response.json()["name"], "event0")
+        self.assertSameResponse(reverse("events-detail", kwargs={"pk": self.foreign.id}))
+        self.assertSameResponse(reverse("events-detail", kwargs={"pk": 0}))
+
+    def test_event_detail_not_modified(self):
+        url = reverse("events-detail", kwargs={"pk": self.events[0].id})
+        etag = self.get_async(url)["ETag"]
+        response = self.get_async(url, if_none_match=etag)
+        self.assertEquals(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_calendar_list(self):
+        self.assertSameResponse(reverse("calendars-list"))
+
+    def test_freebusy(self):
+        window = {"start": "2025-01-01T00:00:00Z", "end": "2025-01-04T00:00:00Z"}
+        self.assertSameResponse(reverse("freebusy"), {"users": "test1,test2", **window})
+        self.assertSameResponse(reverse("freebusy"), {"users": "test1,nobody", **window})
+        self.assertSameResponse(reverse("freebusy"), window)
+
+    def test_browsable_api_falls_back(self):
+        response = self.get_async(reverse("events-list"), accept="text/html")
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/html"))
+
+    def test_invalid_token_falls_back(self):
+        response = self.get_async(reverse("events-list"), authorization="Token invalid")
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase, TestCase
+
+from core import membership, recurrence
+from core.benchmark import (BenchmarkRunner, Dataset, SCENARIOS, build_report, compare_reports,
+                            compare_representations, percentile, seed_data)
+from core.models import Calendar, Event
+from user.models import CustomUser
+
+
+class BenchmarkTestCase(TestCase):
+    def setUp(self):
+        membership.clear_cache()
+        recurrence.clear_cache()
+
+    def test_seed_data(self):
+        data = seed_data(Dataset(users=5, calendars=4, events=50, members_per_calendar=3))
+        self.assertEquals(CustomUser.objects.count(), 5)
+        self.assertEquals(Calendar.objects.count(), 4)
+        self.assertEquals(Event.objects.count(), 50)
+        self.assertEquals(Calendar.users.through.objects.count(), 12)
+        self.assertTrue(data.token)
+
+    def test_run_every_scenario(self):
+        data = seed_data(Dataset(users=5, calendars=4, events=50, members_per_calendar=3))
+        report = build_report(data, BenchmarkRunner(data, iterations=2).run(), 2)
+        self.assertEquals(list(report["endpoints"]), [scenario.name for scenario in SCENARIOS])
+        for name, result in report["endpoints"].items():
+            self.assertEquals(result["iterations"], 2)
+            if name in ("users-list", "users-detail"):
+                # Served from the user directory cache.
+                self.assertEquals(result["queries"], 0)
+            else:
+                self.assertGreater(result["queries"], 0)
+            self.assertGreater(result["peak_memory_kb"], 0)
+            self.assertGreaterEqual(result["response_kb"], 0)
+        self.assertEquals(Event.objects.count(), 50)
+        self.assertEquals(compare_reports(report, report), [])
+
+    def test_compare_representations(self):
+        data = seed_data(Dataset(users=5, calendars=4, events=50, members_per_calendar=3))
+        results = compare_representations(data, iterations=1)
+        self.assertEquals(list(results), ["events", "calendars", "users"])
+        self.assertEquals([result["rows"] for result in results.values()], [50, 4, 5])
+        for result in results.values():
+            self.assertGreater(result["speedup"], 0)
+
+
+class CompareReportsTestCase(SimpleTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEquals(percentile(values, 50), 50)
+        self.assertEquals(percentile(values, 95), 95)
+        self.assertEquals(percentile([7], 95), 7)
+
+    def test_regressions(self):
+        baseline = {"endpoints": {"events-list": {"p95_ms": 10.0, "queries": 2, "peak_memory_kb": 100.0}}}
+        report = {"endpoints": {"events-list": {"p95_ms": 11.0, "queries": 3, "peak_memory_kb": 200.0},
+                                "new-endpoint": {"p95_ms": 1.0, "queries": 1, "peak_memory_kb": 1.0}}}
+        self.assertEquals(compare_reports(baseline, report),
+                          ["events-list: queries 2 -> 3", "events-list: peak_memory_kb 100.0 -> 200.0"])
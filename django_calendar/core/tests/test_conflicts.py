@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core import membership, recurrence
+from core.bulk import EventBulkOperation
+from core.conflicts import find_overlapping_events
+from core.models import DURATION_CLASS_BOUNDS, Event
+from core.tests.test_api import create_calendar, create_event
+from user.tests.test_api import authenticate_client, create_user, get_user_token
+
+
+class DurationClassTestCase(APITestCase):
+    def setUp(self):
+        self.user = create_user("test1", "test")
+        self.calendar = create_calendar("calendar", self.user, [self.user])
+
+    def test_classes(self):
+        start = datetime(2025, 1, 1, 9, tzinfo=timezone.utc)
+        cases = [(None, None), (timedelta(0), None), (timedelta(minutes=15), 0), (timedelta(minutes=16), 1),
+                 (DURATION_CLASS_BOUNDS[-1], len(DURATION_CLASS_BOUNDS) - 1),
+                 (DURATION_CLASS_BOUNDS[-1] + timedelta(seconds=1), len(DURATION_CLASS_BOUNDS))]
+        for duration, duration_class in cases:
+            end = None if duration is None else start + duration
+            event = create_event("event", self.calendar, timestamp=start, end=end)
+            self.assertEquals(Event.objects.get(pk=event.pk).duration_class, duration_class)
+        series = create_event("series", self.calendar, timestamp=start, end=start + timedelta(hours=1),
+                              recurrence_frequency=Event.Frequency.DAILY)
+        self.assertIsNone(Event.objects.get(pk=series.pk).duration_class)
+
+    def test_update_fields(self):
+        event = create_event("event", self.calendar, timestamp="2025-01-01T09:00:00Z")
+        event.end = datetime(2025, 1, 1, 10, tzinfo=timezone.utc)
+        event.save(update_fields=['end'])
+        self.assertEquals(Event.objects.get(pk=event.pk).duration_class, 1)
+
+    def test_bulk_writes(self):
+        event = create_event("event", self.calendar, timestamp="2025-01-01T09:00:00Z")
+        EventBulkOperation(self.user, create=[
+            {"calendar": self.calendar.pk, "name": "new", "timestamp": "2025-01-01T09:00:00Z",
+             "end": "2025-01-01T09:10:00Z"}
+        ], update=[{"id": event.pk, "end": "2025-01-01T09:30:00Z"}], delete=[]).execute()
+        self.assertEquals(Event.objects.get(name="new").duration_class, 0)
+        self.assertEquals(Event.objects.get(pk=event.pk).duration_class, 1)
+
+
+class ConflictsTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        recurrence.clear_cache()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        authenticate_client(self.client, get_user_token(self.user1))
+        self.calendar1 = create_calendar("calendar1", self.user1, [self.user1])
+        self.calendar2 = create_calendar("calendar2", self.user2, [self.user2, self.user1])
+        self.other = create_calendar("other", self.user2, [self.user2])
+        self.url = reverse("events-conflicts")
+        self.window = {"start": "2025-01-01T00:00:00Z", "end": "2025-01-02T00:00:00Z"}
+
+    def get_conflicts(self, **params):
+        response = self.client.get(self.url, {**self.window, **params})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        return [(conflict["start"], conflict["end"], [occurrence["name"] for occurrence in conflict["occurrences"]])
+                for conflict in response.data]
+
+    def test_conflicts(self):
+        create_event("meeting", self.calendar1, timestamp="2025-01-01T09:00:00Z", end="2025-01-01T10:00:00Z")
+        create_event("lunch", self.calendar2, timestamp="2025-01-01T09:30:00Z", end="2025-01-01T12:00:00Z")
+        create_event("after", self.calendar1, timestamp="2025-01-01T12:00:00Z", end="2025-01-01T13:00:00Z")
+        create_event("no end", self.calendar1, timestamp="2025-01-01T09:15:00Z")
+        create_event("not mine", self.other, timestamp="2025-01-01T09:00:00Z", end="2025-01-01T10:00:00Z")
+        create_event("trip", self.calendar2, timestamp="2024-11-01T00:00:00Z", end="2025-01-01T09:45:00Z")
+        create_event("standup", self.calendar1, timestamp="2024-12-01T11:45:00Z", end="2024-12-01T12:15:00Z",
+                     recurrence_frequency=Event.Frequency.DAILY)
+        self.assertEquals(self.get_conflicts(), [
+            ("2025-01-01T09:00:00Z", "2025-01-01T09:45:00Z", ["trip", "meeting"]),
+            ("2025-01-01T09:30:00Z", "2025-01-01T09:45:00Z", ["trip", "lunch"]),
+            ("2025-01-01T09:30:00Z", "2025-01-01T10:00:00Z", ["meeting", "lunch"]),
+            ("2025-01-01T11:45:00Z", "2025-01-01T12:00:00Z", ["lunch", "standup"]),
+            ("2025-01-01T12:00:00Z", "2025-01-01T12:15:00Z", ["standup", "after"]),
+        ])
+        self.assertEquals(self.get_conflicts(calendar=self.calendar1.pk), [
+            ("2025-01-01T12:00:00Z", "2025-01-01T12:15:00Z", ["standup", "after"]),
+        ])
+
+    def test_series_does_not_conflict_with_itself(self):
+        create_event("shift", self.calendar1, timestamp="2024-12-31T20:00:00Z", end="2025-01-01T21:00:00Z",
+                     recurrence_frequency=Event.Frequency.DAILY)
+        self.assertEquals(self.get_conflicts(), [])
+
+    def test_window_is_required(self):
+        response = self.client.get(self.url, {"start": "2025-01-01T00:00:00Z"})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_queries(self):
+        create_event("meeting", self.calendar1, timestamp="2025-01-01T09:00:00Z", end="2025-01-01T10:00:00Z")
+        self.get_conflicts()
+        # Single events and series, with one statement.
+        with self.assertNumQueries(1):
+            self.get_conflicts()
+
+
+@override_settings(CALENDAR_CONFLICTS={"REJECT_OVERLAPS": True, "HORIZON_DAYS": 30})
+class RejectOverlapsTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.user = create_user("test1", "test")
+        authenticate_client(self.client, get_user_token(self.user))
+        self.calendar = create_calendar("calendar", self.user, [self.user])
+        self.other = create_calendar("other", self.user, [self.user])
+        self.meeting = create_event("meeting", self.calendar, timestamp="2025-01-01T09:00:00Z",
+                                    end="2025-01-01T10:00:00Z")
+
+    def create(self, **data):
+        return self.client.post(reverse("events-list"), {"calendar": self.calendar.pk, "name": "new", **data},
+                                format="json")
+
+    def test_create(self):
+        response = self.create(timestamp="2025-01-01T09:30:00Z", end="2025-01-01T11:00:00Z")
+        self.assertEquals(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEquals(response.data["events"], [self.meeting.pk])
+        self.assertFalse(Event.objects.filter(name="new").exists())
+        response = self.create(timestamp="2025-01-01T10:00:00Z", end="2025-01-01T11:00:00Z")
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        response = self.create(timestamp="2025-01-01T09:30:00Z")
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        response = self.create(calendar=self.other.pk, timestamp="2025-01-01T09:30:00Z", end="2025-01-01T11:00:00Z")
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+
+    def test_create_series(self):
+        response = self.create(timestamp="2024-12-20T09:45:00Z", end="2024-12-20T10:15:00Z",
+                               recurrence_frequency="WEEKLY")
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        response = self.create(timestamp="2024-12-20T09:45:00Z", end="2024-12-20T10:15:00Z",
+                               recurrence_frequency="DAILY")
+        self.assertEquals(response.status_code, status.HTTP_409_CONFLICT)
+        # Beyond the horizon.
+        response = self.create(timestamp="2024-11-01T09:45:00Z", end="2024-11-01T10:15:00Z",
+                               recurrence_frequency="DAILY")
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+
+    def test_update(self):
+        url = reverse("events-detail", kwargs={"pk": self.meeting.pk})
+        response = self.client.patch(url, {"end": "2025-01-01T10:30:00Z"}, format="json")
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        lunch = create_event("lunch", self.calendar, timestamp="2025-01-01T12:00:00Z", end="2025-01-01T13:00:00Z")
+        response = self.client.patch(url, {"end": "2025-01-01T12:30:00Z"}, format="json")
+        self.assertEquals(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEquals(response.data["events"], [lunch.pk])
+        self.assertEquals(Event.objects.get(pk=self.meeting.pk).end, datetime(2025, 1, 1, 10, 30, tzinfo=timezone.utc))
+
+    def test_long_events(self):
+        long_event = create_event("long", self.calendar, timestamp="2024-01-01T00:00:00Z", end="2025-06-01T00:00:00Z")
+        event = Event(calendar=self.calendar, name="new", timestamp=datetime(2025, 3, 1, tzinfo=timezone.utc),
+                      end=datetime(2025, 3, 1, 1, tzinfo=timezone.utc))
+        self.assertEquals(find_overlapping_events(event), [long_event.pk])
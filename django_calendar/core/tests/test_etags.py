@@ -0,0 +1,133 @@
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership
+from core.models import Calendar, Event
+from core.tests.test_api import create_calendar, create_event, ICS_FILE
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+
+class ETagTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.client1 = APIClient()
+        self.client2 = APIClient()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        authenticate_client(self.client1, get_user_token(self.user1))
+        authenticate_client(self.client2, get_user_token(self.user2))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1])
+        self.event = create_event("event", self.calendar)
+
+    def get_etag(self, url, client=None):
+        response = (client or self.client1).get(url)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        return response["ETag"]
+
+    def assertNotModified(self, url, etag, client=None):
+        response = (client or self.client1).get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEquals(response["ETag"], etag)
+
+    def test_list_not_modified(self):
+        for url in (reverse("events-list"), reverse("calendars-list")):
+            self.assertNotModified(url, self.get_etag(url))
+
+    def test_detail_not_modified(self):
+        for url in (reverse("events-detail", kwargs={"pk": self.event.id}),
+                    reverse("calendars-detail", kwargs={"pk": self.calendar.id})):
+            self.assertNotModified(url, self.get_etag(url))
+
+    def test_etag_depends_on_query(self):
+        url = reverse("events-list")
+        etag = self.get_etag(url)
+        response = self.client1.get(url, {"page_size": 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+    def test_event_write_changes_etag(self):
+        url = reverse("events-list")
+        etag = self.get_etag(url)
+        self.client1.patch(reverse("events-detail", kwargs={"pk": self.event.id}), {"name": "renamed"},
+                           format="json")
+        response = self.client1.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.data["results"][0]["name"], "renamed")
+
+    def test_event_delete_changes_etag(self):
+        url = reverse("events-list")
+        etag = self.get_etag(url)
+        self.event.delete()
+        self.assertNotEqual(self.get_etag(url), etag)
+
+    def test_event_move_changes_both_calendars(self):
+        other = create_calendar("other", self.user1, [self.user1])
+        old_version = Calendar.objects.get(id=self.calendar.id).version
+        other_version = Calendar.objects.get(id=other.id).version
+        self.client1.patch(reverse("events-detail", kwargs={"pk": self.event.id}), {"calendar": other.id},
+                           format="json")
+        self.assertEquals(Calendar.objects.get(id=self.calendar.id).version, old_version + 1)
+        self.assertEquals(Calendar.objects.get(id=other.id).version, other_version + 1)
+
+    def test_membership_change_changes_etag(self):
+        url = reverse("calendars-detail", kwargs={"pk": self.calendar.id})
+        etag = self.get_etag(url)
+        self.client1.post(reverse("add-users", kwargs={"pk": self.calendar.id}), {"users": ["test2"]},
+                          format="json")
+        response = self.client1.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        self.client1.post(reverse("remove-users", kwargs={"pk": self.calendar.id}), {"users": ["test2"]},
+                          format="json")
+        self.assertNotEqual(self.get_etag(url), etag)
+
+    def test_member_delete_changes_etag(self):
+        user3 = create_user("test3", "test")
+        user3_id = user3.id
+        self.calendar.users.add(user3)
+        url = reverse("calendars-list")
+        etag = self.get_etag(url)
+        updated_at = Calendar.objects.get(pk=self.calendar.id).updated_at
+        with mock.patch("core.pubsub.publish") as publish:
+            user3.delete()
+        response = self.client1.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.data[0]["users"], ["test1"])
+        self.assertGreater(Calendar.objects.get(pk=self.calendar.id).updated_at, updated_at)
+        publish.assert_any_call(f"calendar:{self.calendar.id}", {"type": "membership.removed",
+                                                                 "calendar": self.calendar.id, "users": [user3_id]})
+
+    def test_calendar_patch_changes_etag(self):
+        url = reverse("calendars-list")
+        etag = self.get_etag(url)
+        self.client1.patch(reverse("calendars-detail", kwargs={"pk": self.calendar.id}), {"name": "renamed"},
+                           format="json")
+        self.assertNotEqual(self.get_etag(url), etag)
+
+    def test_bulk_and_import_bump_version_once(self):
+        version = Calendar.objects.get(id=self.calendar.id).version
+        payload = {"create": [{"calendar": self.calendar.id, "name": f"event{i}",
+                               "timestamp": "2025-01-01T00:00:00Z"} for i in range(5)],
+                   "update": [{"id": self.event.id, "name": "renamed"}]}
+        self.client1.post(reverse("events-bulk"), payload, format="json")
+        self.assertEquals(Calendar.objects.get(id=self.calendar.id).version, version + 1)
+        self.client1.post(reverse("calendar-import", kwargs={"pk": self.calendar.id}),
+                          {"file": SimpleUploadedFile("calendar.ics", ICS_FILE.encode())}, format="multipart")
+        self.assertEquals(Calendar.objects.get(id=self.calendar.id).version, version + 2)
+
+    def test_regular_save_does_not_overwrite_version(self):
+        stale = Calendar.objects.get(id=self.calendar.id)
+        create_event("another", self.calendar)
+        stale.name = "renamed"
+        stale.save()
+        self.assertEquals(Calendar.objects.get(id=self.calendar.id).version, stale.version + 2)
+
+    def test_no_access_is_not_revealed(self):
+        url = reverse("events-detail", kwargs={"pk": self.event.id})
+        etag = self.get_etag(url)
+        response = self.client2.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEquals(Event.objects.count(), 1)
@@ -0,0 +1,83 @@
+from datetime import datetime, timezone
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership, recurrence
+from core.freebusy import _busy_events_query, get_busy_intervals, merge_intervals
+from core.models import Event
+from core.tests.test_api import create_calendar, create_event
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+
+class MergeIntervalsTestCase(SimpleTestCase):
+    def test_merge(self):
+        intervals = [(5, 6), (1, 3), (2, 4), (4, 4), (8, 9), (6, 7)]
+        self.assertEquals(merge_intervals(intervals), [(1, 4), (5, 7), (8, 9)])
+
+
+class FreeBusyTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        recurrence.clear_cache()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        self.client = APIClient()
+        authenticate_client(self.client, get_user_token(self.user1))
+        self.calendar1 = create_calendar("calendar1", self.user1, [self.user1])
+        self.calendar2 = create_calendar("calendar2", self.user2, [self.user2])
+        self.url = reverse("freebusy")
+        self.window = {"users": "test1,test2", "start": "2025-01-01T00:00:00Z", "end": "2025-01-02T00:00:00Z"}
+
+    def test_freebusy(self):
+        create_event("morning", self.calendar1, timestamp="2025-01-01T09:00:00Z", end="2025-01-01T10:00:00Z")
+        create_event("overlap", self.calendar2, timestamp="2025-01-01T09:30:00Z", end="2025-01-01T11:00:00Z")
+        create_event("from yesterday", self.calendar2, timestamp="2024-12-31T23:00:00Z", end="2025-01-01T01:00:00Z")
+        create_event("no end", self.calendar1, timestamp="2025-01-01T12:00:00Z")
+        create_event("standup", self.calendar1, timestamp="2024-12-01T15:00:00Z", end="2024-12-01T15:15:00Z",
+                     recurrence_frequency=Event.Frequency.DAILY)
+        response = self.client.get(self.url, self.window)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(response.data["users"]["test1"], [
+            {"start": "2025-01-01T09:00:00Z", "end": "2025-01-01T10:00:00Z"},
+            {"start": "2025-01-01T15:00:00Z", "end": "2025-01-01T15:15:00Z"},
+        ])
+        self.assertEquals(response.data["users"]["test2"], [
+            {"start": "2025-01-01T00:00:00Z", "end": "2025-01-01T01:00:00Z"},
+            {"start": "2025-01-01T09:30:00Z", "end": "2025-01-01T11:00:00Z"},
+        ])
+        self.assertEquals(response.data["busy"], [
+            {"start": "2025-01-01T00:00:00Z", "end": "2025-01-01T01:00:00Z"},
+            {"start": "2025-01-01T09:00:00Z", "end": "2025-01-01T11:00:00Z"},
+            {"start": "2025-01-01T15:00:00Z", "end": "2025-01-01T15:15:00Z"},
+        ])
+
+    def test_past_events_are_not_read(self):
+        create_event("last year", self.calendar1, timestamp="2024-01-01T09:00:00Z", end="2024-01-01T10:00:00Z")
+        create_event("ended series", self.calendar1, timestamp="2024-01-01T09:00:00Z", end="2024-01-01T10:00:00Z",
+                     recurrence_frequency=Event.Frequency.DAILY, recurrence_until="2024-06-01T09:00:00Z")
+        create_event("last night", self.calendar1, timestamp="2024-12-31T22:00:00Z", end="2025-01-01T02:00:00Z",
+                     recurrence_frequency=Event.Frequency.DAILY, recurrence_until="2024-12-31T22:00:00Z")
+        create_event("long", self.calendar1, timestamp="2023-01-01T00:00:00Z", end="2026-01-01T00:00:00Z")
+        start, end = datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 1, 2, tzinfo=timezone.utc)
+        self.assertEquals(sorted(event.name for event in _busy_events_query([self.user1.pk], start, end)),
+                          ["last night", "long"])
+        self.assertEquals(get_busy_intervals([self.user1.pk], start, end)[self.user1.pk],
+                          [(start, end)])
+
+    def test_freebusy_query_count_does_not_grow_with_users(self):
+        usernames = []
+        for i in range(20):
+            user = create_user(f"user{i}", "test")
+            calendar = create_calendar(f"calendar{i}", user, [user])
+            create_event("event", calendar, timestamp="2025-01-01T09:00:00Z", end="2025-01-01T10:00:00Z")
+            usernames.append(user.username)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {**self.window, "users": ",".join(usernames)})
+        self.assertEquals(len(response.data["users"]), 20)
+
+    def test_freebusy_unknown_user(self):
+        response = self.client.get(self.url, {**self.window, "users": "test1,nobody"})
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,61 @@
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership
+from core.tests.test_api import create_calendar, create_event
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+
+class MembershipTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        self.client1 = APIClient()
+        self.client2 = APIClient()
+        authenticate_client(self.client1, get_user_token(self.user1))
+        authenticate_client(self.client2, get_user_token(self.user2))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1])
+
+    def test_has_calendar_access(self):
+        self.assertTrue(membership.has_calendar_access(self.user1, self.calendar.id))
+        self.assertFalse(membership.has_calendar_access(self.user2, self.calendar.id))
+
+    def test_access_check_is_cached(self):
+        membership.has_calendar_access(self.user1, self.calendar.id)
+        with self.assertNumQueries(0):
+            self.assertTrue(membership.has_calendar_access(self.user1, self.calendar.id))
+
+    def test_add_and_remove_user_invalidate_cache(self):
+        self.assertFalse(membership.has_calendar_access(self.user2, self.calendar.id))
+        self.calendar.users.add(self.user2)
+        self.assertTrue(membership.has_calendar_access(self.user2, self.calendar.id))
+        self.user2.calendar_set.remove(self.calendar)
+        self.assertFalse(membership.has_calendar_access(self.user2, self.calendar.id))
+        self.calendar.users.add(self.user2)
+        self.assertTrue(membership.has_calendar_access(self.user2, self.calendar.id))
+        self.calendar.users.clear()
+        self.assertFalse(membership.has_calendar_access(self.user2, self.calendar.id))
+
+    def test_membership_change_invalidates_cache_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.calendar.users.add(self.user2)
+            # A request that read the through table before the commit caches the old memberships.
+            membership._calendar_ids.set(self.user2.pk, frozenset())
+        self.assertTrue(membership.has_calendar_access(self.user2, self.calendar.id))
+
+    def test_calendar_delete_invalidates_cache(self):
+        calendar_id = self.calendar.id
+        self.assertTrue(membership.has_calendar_access(self.user1, calendar_id))
+        self.calendar.delete()
+        self.assertFalse(membership.has_calendar_access(self.user1, calendar_id))
+
+    def test_event_access_follows_membership(self):
+        event = create_event("event", self.calendar)
+        response = self.client2.get(reverse("events-detail", kwargs={"pk": event.id}))
+        self.assertEquals(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.client1.post(reverse("add-users", kwargs={"pk": self.calendar.id}),
+                          {"users": [self.user2.username]}, format='json')
+        response = self.client2.get(reverse("events-detail", kwargs={"pk": event.id}))
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
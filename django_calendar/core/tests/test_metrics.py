@@ -0,0 +1,62 @@
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership, metrics
+from core.metrics import Histogram, MetricsRegistry
+from core.tests.test_api import create_calendar
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+
+class HistogramTestCase(SimpleTestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram((1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEquals(list(histogram.cumulative_counts()), [2, 3, 4])
+        self.assertEquals(histogram.sum, 14.5)
+
+    def test_render(self):
+        registry = MetricsRegistry()
+        registry.observe("events-list", 0.02, 0.004, 3)
+        text = registry.render()
+        self.assertIn('# TYPE calendar_request_duration_seconds histogram', text)
+        self.assertIn('calendar_request_duration_seconds_bucket{view="events-list",le="0.025"} 1', text)
+        self.assertIn('calendar_request_duration_seconds_bucket{view="events-list",le="0.01"} 0', text)
+        self.assertIn('calendar_request_db_queries_bucket{view="events-list",le="+Inf"} 1', text)
+        self.assertIn('calendar_request_db_queries_sum{view="events-list"} 3.0', text)
+        self.assertIn('calendar_request_db_queries_count{view="events-list"} 1', text)
+
+
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        metrics.registry.clear()
+        self.user = create_user("test1", "test")
+        self.staff = create_user("admin", "test", is_staff=True)
+        self.client = APIClient()
+        authenticate_client(self.client, get_user_token(self.user))
+        self.staff_client = APIClient()
+        authenticate_client(self.staff_client, get_user_token(self.staff))
+        self.calendar = create_calendar("calendar", self.user, [self.user])
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("calendars-detail", kwargs={"pk": self.calendar.id}))
+        self.assertRegex(response["Server-Timing"], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+    def test_metrics_by_view_name(self):
+        self.client.get(reverse("calendars-list"))
+        self.client.get(reverse("events-list"))
+        self.client.post(reverse("add-users", kwargs={"pk": self.calendar.id}), {"users": ["admin"]}, format="json")
+        response = self.staff_client.get(reverse("metrics"))
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        text = response.content.decode()
+        for view in ("calendars-list", "events-list", "add-users"):
+            self.assertIn(f'calendar_request_duration_seconds_count{{view="{view}"}} 1', text)
+        self.assertNotIn('calendar_request_db_queries_sum{view="events-list"} 0.0', text)
+
+    def test_metrics_are_staff_only(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEquals(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,117 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership, recurrence
+from core.models import Calendar, Event
+from user.models import CustomUser
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+SEED_SIZES = (2, 8, 32)
+
+
+class QueryBudgetTestCase(APITestCase):
+    """
+    Seeds data of growing size and fails if the number of queries an endpoint runs grows with it.
+    """
+
+    def setUp(self):
+        membership.clear_cache()
+        recurrence.clear_cache()
+        self.user = create_user("owner", "test")
+        self.client = APIClient()
+        authenticate_client(self.client, get_user_token(self.user))
+        self.calendar = Calendar.objects.create(name="calendar", owner=self.user)
+        self.calendar.users.add(self.user)
+        self.event = Event.objects.create(calendar=self.calendar, name="event", timestamp="2025-01-01T09:00:00Z",
+                                          end="2025-01-01T10:00:00Z")
+        self.guest = create_user("guest", "test")
+        self.seeded = 0
+
+    def seed(self, size):
+        users = CustomUser.objects.bulk_create(
+            [CustomUser(username=f"user{i}") for i in range(self.seeded, size)])
+        calendars = Calendar.objects.bulk_create(
+            [Calendar(name=f"calendar{i}", owner=self.user) for i in range(self.seeded, size)])
+        for calendar in calendars:
+            calendar.users.add(self.user, *users)
+        self.calendar.users.add(*users)
+        Event.objects.bulk_create([
+            Event(calendar=calendar, name=f"event{i}", timestamp="2025-01-01T09:00:00Z", end="2025-01-01T10:00:00Z")
+            for calendar in [self.calendar, *calendars] for i in range(size)
+        ])
+        Event.objects.create(calendar=self.calendar, name=f"series{size}", timestamp="2024-12-01T09:00:00Z",
+                             recurrence_frequency=Event.Frequency.DAILY)
+        self.seeded = size
+
+    def assertQueryBudget(self, request):
+        """
+        Measures the queries ``request`` runs on the smallest seed and asserts the same count on larger ones.
+        """
+        # Warm up the per-process caches (authentication token) so only the endpoint itself is measured.
+        request()
+        budget = None
+        for size in SEED_SIZES:
+            self.seed(size)
+            membership.clear_cache()
+            if budget is None:
+                with CaptureQueriesContext(connection) as context:
+                    response = request()
+                budget = len(context.captured_queries)
+            else:
+                with self.assertNumQueries(budget):
+                    response = request()
+            self.assertLess(response.status_code, 400)
+
+    def test_calendar_list(self):
+        self.assertQueryBudget(lambda: self.client.get(reverse("calendars-list")))
+
+    def test_calendar_detail(self):
+        self.assertQueryBudget(lambda: self.client.get(reverse("calendars-detail", kwargs={"pk": self.calendar.id})))
+
+    def test_calendar_update(self):
+        self.assertQueryBudget(lambda: self.client.patch(reverse("calendars-detail", kwargs={"pk": self.calendar.id}),
+                                                         {"name": "renamed"}, format="json"))
+
+    def test_calendar_add_and_remove_users(self):
+        def add_and_remove():
+            url_kwargs = {"pk": self.calendar.id}
+            self.client.post(reverse("add-users", kwargs=url_kwargs), {"users": ["guest"]}, format="json")
+            return self.client.post(reverse("remove-users", kwargs=url_kwargs), {"users": ["guest"]}, format="json")
+
+        self.assertQueryBudget(add_and_remove)
+
+    def test_calendar_export(self):
+        def export():
+            response = self.client.get(reverse("calendar-export", kwargs={"pk": self.calendar.id}))
+            b"".join(response.streaming_content)
+            return response
+
+        self.assertQueryBudget(export)
+
+    def test_event_list(self):
+        self.assertQueryBudget(lambda: self.client.get(reverse("events-list"), {"page_size": 10}))
+
+    def test_event_detail(self):
+        self.assertQueryBudget(lambda: self.client.get(reverse("events-detail", kwargs={"pk": self.event.id})))
+
+    def test_agenda(self):
+        self.assertQueryBudget(lambda: self.client.get(reverse("agenda"), {"page_size": 10}))
+
+    def test_sync(self):
+        self.assertQueryBudget(lambda: self.client.get(reverse("sync")))
+
+    def test_event_occurrences(self):
+        self.assertQueryBudget(lambda: self.client.get(reverse("events-occurrences"), {
+            "calendar": self.calendar.id, "start": "2025-01-01T00:00:00Z", "end": "2025-01-02T00:00:00Z"}))
+
+    def test_freebusy(self):
+        self.assertQueryBudget(lambda: self.client.get(reverse("freebusy"), {
+            "users": "owner,guest", "start": "2025-01-01T00:00:00Z", "end": "2025-01-02T00:00:00Z"}))
+
+    def test_user_list(self):
+        self.assertQueryBudget(lambda: self.client.get(reverse("users-list")))
+
+    def test_user_detail(self):
+        self.assertQueryBudget(lambda: self.client.get(reverse("users-detail", kwargs={"pk": self.user.id})))
@@ -0,0 +1,158 @@
+from datetime import datetime, timezone
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership, recurrence
+from core.models import Event
+from core.tests.test_api import create_calendar
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def series(timestamp, frequency, **kwargs):
+    return Event(id=1, name="series", timestamp=timestamp, recurrence_frequency=frequency, **kwargs)
+
+
+class OccurrenceExpansionTestCase(TestCase):
+    def setUp(self):
+        recurrence.clear_cache()
+
+    def test_daily_window(self):
+        event = series(utc(2025, 1, 1, 9), Event.Frequency.DAILY)
+        occurrences = list(recurrence.iter_occurrences(event, utc(2030, 1, 1), utc(2030, 1, 4)))
+        self.assertEquals(occurrences, [utc(2030, 1, 1, 9), utc(2030, 1, 2, 9), utc(2030, 1, 3, 9)])
+
+    def test_weekly_interval_and_count(self):
+        event = series(utc(2025, 1, 1, 9), Event.Frequency.WEEKLY, recurrence_interval=2, recurrence_count=3)
+        occurrences = list(recurrence.iter_occurrences(event, utc(2025, 1, 1), utc(2026, 1, 1)))
+        self.assertEquals(occurrences, [utc(2025, 1, 1, 9), utc(2025, 1, 15, 9), utc(2025, 1, 29, 9)])
+
+    def test_until_and_exceptions(self):
+        event = series(utc(2025, 1, 1, 9), Event.Frequency.DAILY, recurrence_until=utc(2025, 1, 4, 9),
+                       recurrence_exceptions=[recurrence.format_exception(utc(2025, 1, 2, 9))])
+        occurrences = list(recurrence.iter_occurrences(event, utc(2024, 1, 1), utc(2026, 1, 1)))
+        self.assertEquals(occurrences, [utc(2025, 1, 1, 9), utc(2025, 1, 3, 9), utc(2025, 1, 4, 9)])
+
+    def test_monthly_skips_missing_days(self):
+        event = series(utc(2025, 1, 31, 9), Event.Frequency.MONTHLY, recurrence_count=3)
+        occurrences = list(recurrence.iter_occurrences(event, utc(2025, 3, 1), utc(2026, 1, 1)))
+        self.assertEquals(occurrences, [utc(2025, 3, 31, 9), utc(2025, 5, 31, 9)])
+
+    def test_yearly(self):
+        event = series(utc(2024, 2, 29, 9), Event.Frequency.YEARLY)
+        occurrences = list(recurrence.iter_occurrences(event, utc(2025, 1, 1), utc(2033, 1, 1)))
+        self.assertEquals(occurrences, [utc(2028, 2, 29, 9), utc(2032, 2, 29, 9)])
+
+    def test_time_zone_keeps_local_time_across_dst(self):
+        # 09:00 in Paris is 08:00 UTC in winter and 07:00 UTC in summer.
+        event = series(utc(2025, 3, 29, 8), Event.Frequency.DAILY, time_zone="Europe/Paris")
+        occurrences = list(recurrence.iter_occurrences(event, utc(2025, 3, 29), utc(2025, 4, 1)))
+        self.assertEquals(occurrences, [utc(2025, 3, 29, 8), utc(2025, 3, 30, 7), utc(2025, 3, 31, 7)])
+        occurrences = list(recurrence.iter_occurrences(event, utc(2025, 10, 25, 7), utc(2025, 10, 27)))
+        self.assertEquals(occurrences, [utc(2025, 10, 25, 7), utc(2025, 10, 26, 8)])
+
+    def test_time_zone_monthly_and_skipped_local_time(self):
+        event = series(utc(2025, 1, 15, 14), Event.Frequency.MONTHLY, time_zone="America/New_York")
+        occurrences = list(recurrence.iter_occurrences(event, utc(2025, 3, 1), utc(2025, 5, 1)))
+        self.assertEquals(occurrences, [utc(2025, 3, 15, 13), utc(2025, 4, 15, 13)])
+        # 02:30 doesn't exist on 2025-03-09 in New York: that occurrence moves on to 03:30.
+        event = series(utc(2025, 3, 8, 7, 30), Event.Frequency.DAILY, time_zone="America/New_York")
+        occurrences = list(recurrence.iter_occurrences(event, utc(2025, 3, 8), utc(2025, 3, 11)))
+        self.assertEquals(occurrences, [utc(2025, 3, 8, 7, 30), utc(2025, 3, 9, 7, 30), utc(2025, 3, 10, 6, 30)])
+
+    def test_cache_keyed_by_series(self):
+        event = series(utc(2025, 1, 1, 9), Event.Frequency.DAILY)
+        window = (utc(2025, 1, 1), utc(2025, 1, 3))
+        self.assertEquals(len(recurrence.get_occurrences(event, *window)), 2)
+        event.recurrence_exceptions = [recurrence.format_exception(utc(2025, 1, 2, 9))]
+        self.assertEquals(len(recurrence.get_occurrences(event, *window)), 1)
+
+
+class OccurrenceApiTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        recurrence.clear_cache()
+        self.user = create_user("test1", "test")
+        self.client = APIClient()
+        authenticate_client(self.client, get_user_token(self.user))
+        self.calendar = create_calendar("calendar", self.user, [self.user])
+
+    def test_create_series_and_list_occurrences(self):
+        new_event = {
+            "name": "standup",
+            "calendar": self.calendar.id,
+            "timestamp": "2025-01-01T09:00:00Z",
+            "recurrence_frequency": "DAILY",
+            "recurrence_exceptions": ["2025-01-02T09:00:00Z"]
+        }
+        response = self.client.post(reverse("events-list"), data=new_event, format="json")
+        self.assertEquals(response.status_code, status.HTTP_201_CREATED)
+        Event.objects.create(name="single", calendar=self.calendar, timestamp="2025-01-03T08:00:00Z")
+        response = self.client.get(reverse("events-occurrences"), {"start": "2025-01-01T00:00:00Z",
+                                                                    "end": "2025-01-04T00:00:00Z"})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals([(item["name"], item["timestamp"]) for item in response.data], [
+            ("standup", "2025-01-01T09:00:00Z"),
+            ("single", "2025-01-03T08:00:00Z"),
+            ("standup", "2025-01-03T09:00:00Z"),
+        ])
+
+    def test_edit_series_invalidates_occurrences(self):
+        event = Event.objects.create(name="standup", calendar=self.calendar, timestamp="2025-01-01T09:00:00Z",
+                                     recurrence_frequency=Event.Frequency.DAILY)
+        window = {"start": "2025-01-01T00:00:00Z", "end": "2025-01-08T00:00:00Z"}
+        self.assertEquals(len(self.client.get(reverse("events-occurrences"), window).data), 7)
+        response = self.client.patch(reverse("events-detail", kwargs={"pk": event.id}),
+                                     {"recurrence_count": 2}, format="json")
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        self.assertEquals(len(self.client.get(reverse("events-occurrences"), window).data), 2)
+
+    def test_occurrences_require_window(self):
+        response = self.client.get(reverse("events-occurrences"), {"start": "2025-01-01T00:00:00Z"})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_imported_time_zone(self):
+        ics = ("BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nUID:standup@example.com\r\nSUMMARY:Standup\r\n"
+               "DTSTART;TZID=Europe/Paris:20250329T090000\r\nRRULE:FREQ=DAILY;COUNT=2\r\n"
+               "END:VEVENT\r\nEND:VCALENDAR\r\n")
+        self.client.post(reverse("calendar-import", kwargs={"pk": self.calendar.id}),
+                         {"file": SimpleUploadedFile("calendar.ics", ics.encode())}, format="multipart")
+        event = Event.objects.get(uid="standup@example.com")
+        self.assertEquals(event.time_zone, "Europe/Paris")
+        response = self.client.get(reverse("events-occurrences"), {"start": "2025-03-29T00:00:00Z",
+                                                                    "end": "2025-04-01T00:00:00Z"})
+        self.assertEquals([item["timestamp"] for item in response.data],
+                          ["2025-03-29T08:00:00Z", "2025-03-30T07:00:00Z"])
+        export = self.client.get(reverse("calendar-export", kwargs={"pk": self.calendar.id}))
+        self.assertIn(b"DTSTART;TZID=Europe/Paris:20250329T090000\r\n", b"".join(export.streaming_content))
+
+    def test_unknown_time_zone(self):
+        new_event = {
+            "name": "standup",
+            "calendar": self.calendar.id,
+            "timestamp": "2025-01-01T09:00:00Z",
+            "recurrence_frequency": "DAILY",
+            "time_zone": "Mars/Olympus_Mons"
+        }
+        response = self.client.post(reverse("events-list"), data=new_event, format="json")
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("time_zone", response.data)
+
+    def test_count_and_until_are_exclusive(self):
+        new_event = {
+            "name": "standup",
+            "calendar": self.calendar.id,
+            "timestamp": "2025-01-01T09:00:00Z",
+            "recurrence_frequency": "DAILY",
+            "recurrence_count": 3,
+            "recurrence_until": "2025-02-01T00:00:00Z"
+        }
+        response = self.client.post(reverse("events-list"), data=new_event, format="json")
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
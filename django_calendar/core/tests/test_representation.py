@@ -0,0 +1,154 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from core import membership
+from core.models import Event
+from core.representation import FastRepresentation, get_fast_representation
+from core.serializers import CalendarSerializer, EventSerializer
+from core.tests.test_api import create_calendar, create_event
+from core.views import CalendarViewSet
+from user.models import CustomUser
+from user.serializers import CustomUserSerializer, CustomUserShortSerializer
+from user.tests.test_api import authenticate_client, create_user, get_user_token
+
+
+# The user directory cache would answer the user list without reaching the fast path.
+@override_settings(USER_DIRECTORY_CACHE={"ENABLED": False})
+class FastRepresentationTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        self.user3 = create_user("test3", "test")
+        authenticate_client(self.client, get_user_token(self.user1))
+        self.calendar = create_calendar("calendar", self.user1, [self.user3, self.user1, self.user2])
+        self.other = create_calendar("other", self.user2, [self.user2, self.user1])
+        self.empty = create_calendar("empty", self.user2, [])
+        create_event("plain", self.calendar, description="")
+        create_event("ends", self.calendar, timestamp="2025-01-02T09:30:00.123456Z", end="2025-01-02T10:00:00Z")
+        create_event("weekly", self.other, timestamp="2025-01-03T09:00:00Z", recurrence_frequency="WEEKLY",
+                     recurrence_interval=2, recurrence_until="2025-03-01T00:00:00Z",
+                     recurrence_exceptions=["2025-01-17T09:00:00Z"])
+        create_event("daily", self.other, timestamp="2025-01-03T09:00:00Z", recurrence_frequency="DAILY",
+                     recurrence_count=3)
+
+    def assertSameBytes(self, serializer_class, queryset):
+        representation = FastRepresentation(serializer_class)
+        fast = representation.represent(representation.prepare(queryset))
+        expected = serializer_class(queryset, many=True).data
+        self.assertEquals(JSONRenderer().render(fast), JSONRenderer().render(expected))
+
+    def assertSameResponse(self, url, data=None):
+        response = self.client.get(url, data)
+        # The async views imported the name: both have to be patched for every view to fall back to the serializer.
+        with mock.patch("core.representation.get_fast_representation", return_value=None) as drf_views, \
+                mock.patch("core.async_views.get_fast_representation", return_value=None) as async_views:
+            expected = self.client.get(url, data)
+        self.assertTrue(drf_views.called or async_views.called)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response.content, expected.content)
+        return response
+
+    def test_events(self):
+        self.assertSameBytes(EventSerializer, Event.objects.order_by("timestamp", "id"))
+
+    def test_events_in_other_timezone(self):
+        with timezone.override("Europe/Paris"):
+            self.assertSameBytes(EventSerializer, Event.objects.order_by("id"))
+
+    def test_calendars(self):
+        queryset = CalendarViewSet.queryset.all()
+        self.assertSameBytes(CalendarSerializer, queryset)
+        representation = FastRepresentation(CalendarSerializer)
+        data = representation.represent(representation.prepare(queryset))
+        self.assertEquals([calendar["users"] for calendar in data],
+                          [["test1", "test2", "test3"], ["test1", "test2"], []])
+
+    def test_users(self):
+        self.assertSameBytes(CustomUserShortSerializer, CustomUser.objects.order_by("id"))
+
+    def test_unsupported_serializer(self):
+        self.assertIsNone(get_fast_representation(CustomUserSerializer))
+        self.assertIsNotNone(get_fast_representation(EventSerializer))
+
+    def test_list_responses(self):
+        self.assertSameResponse(reverse("calendars-list"))
+        self.assertSameResponse(reverse("users-list"))
+        self.assertSameResponse(reverse("events-list"), {"calendar": self.other.pk})
+        response = self.assertSameResponse(reverse("events-list"), {"page_size": 2})
+        self.assertEquals([event["name"] for event in response.data["results"]], ["plain", "ends"])
+        self.assertSameResponse(response.data["next"])
+
+    def test_queries(self):
+        self.client.get(reverse("users-list"))
+        with self.assertNumQueries(1):
+            self.client.get(reverse("users-list"))
+        # Calendar versions (ETag), calendars with their owners, then their users.
+        with self.assertNumQueries(3):
+            self.client.get(reverse("calendars-list"))
+
+
+class ColumnarFormatTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        authenticate_client(self.client, get_user_token(self.user1))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1, self.user2])
+        self.other = create_calendar("other", self.user2, [self.user2, self.user1])
+        create_event("first", self.calendar, timestamp="2025-01-01T09:00:00Z", end="2025-01-01T10:00:00Z")
+        create_event("second", self.other, timestamp="2025-01-02T09:00:00Z",
+                     recurrence_frequency="DAILY", recurrence_count=3)
+        create_event("third", self.calendar, timestamp="2025-01-03T09:00:00Z")
+
+    @staticmethod
+    def rows(data):
+        columns = data["columns"]
+        return [{field: columns[field][index] for field in data["fields"]} for index in range(data["count"])]
+
+    def test_events(self):
+        response = self.client.get(reverse("events-list"), {"format": "columnar"})
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(response["Content-Type"], "application/vnd.calendar.columnar+json")
+        data = response.json()["results"]
+        self.assertEquals(data["count"], 3)
+        self.assertEquals(data["time_unit"], "s")
+        self.assertEquals(data["epoch"], 1735722000)
+        self.assertEquals(data["columns"]["timestamp"], [0, 86400, 172800])
+        self.assertEquals(data["columns"]["end"], [3600, None, None])
+        self.assertEquals(data["columns"]["calendar"], [0, 1, 0])
+        self.assertEquals(data["dictionaries"], {"calendar": [self.calendar.pk, self.other.pk]})
+        expected = self.client.get(reverse("events-list")).json()["results"]
+        rows = self.rows(data)
+        self.assertEquals([row["name"] for row in rows], [event["name"] for event in expected])
+        self.assertEquals([row["recurrence_count"] for row in rows], [event["recurrence_count"] for event in expected])
+
+    def test_fractional_seconds(self):
+        create_event("fourth", self.calendar, timestamp="2025-01-01T09:00:00.5Z")
+        data = self.client.get(reverse("events-list"), HTTP_ACCEPT="application/vnd.calendar.columnar+json")
+        data = data.json()["results"]
+        self.assertEquals(data["time_unit"], "us")
+        self.assertEquals(data["columns"]["timestamp"], [0, 500000, 86400000000, 172800000000])
+
+    def test_calendars(self):
+        data = self.client.get(reverse("calendars-list"), {"format": "columnar"}).json()
+        self.assertEquals(data["columns"]["name"], ["calendar", "other"])
+        self.assertEquals(data["columns"]["owner"], [0, 1])
+        self.assertEquals(data["dictionaries"]["owner"], ["test1", "test2"])
+        self.assertEquals(data["columns"]["users"], [[0, 1], [0, 1]])
+        self.assertEquals(data["dictionaries"]["users"], ["test1", "test2"])
+
+    def test_empty_list(self):
+        data = self.client.get(reverse("events-list"), {"format": "columnar", "calendar": 0}).json()["results"]
+        self.assertEquals(data["count"], 0)
+        self.assertEquals(data["columns"]["name"], [])
+
+    def test_details_stay_json(self):
+        event = Event.objects.get(name="first")
+        response = self.client.get(reverse("events-detail", kwargs={"pk": event.pk}), {"format": "columnar"})
+        self.assertEquals(response.json()["name"], "first")
@@ -0,0 +1,163 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership, routing
+from core.models import Calendar, Event
+from core.routing import ReplicaRouter
+from core.tests.test_api import create_calendar
+from user.models import CustomUser
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+ROUTING = {'READ_REPLICAS': ['replica'], 'STICKY_SECONDS': 5, 'CACHE_ALIAS': 'default'}
+
+
+class ReplicaRouterTestCase(SimpleTestCase):
+    def test_routes_reads_to_the_request_replica(self):
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Event))
+        token = routing._read_alias.set('replica')
+        try:
+            self.assertEquals(router.db_for_read(Event), 'replica')
+            self.assertEquals(router.db_for_read(Token), DEFAULT_DB_ALIAS)
+            self.assertEquals(router.db_for_read(Calendar.users.through), DEFAULT_DB_ALIAS)
+            self.assertEquals(router.db_for_write(Event), DEFAULT_DB_ALIAS)
+        finally:
+            routing._read_alias.reset(token)
+
+
+@override_settings(CALENDAR_DATABASE_ROUTING=ROUTING)
+class ReplicaRoutingTestCase(APITestCase):
+    """
+    Records where the router would send each read and then runs it on the primary; ReplicaDatabaseTestCase
+    reads from the replica for real.
+    """
+
+    def setUp(self):
+        membership.clear_cache()
+        caches['default'].clear()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        self.client1 = APIClient()
+        authenticate_client(self.client1, get_user_token(self.user1))
+        self.client2 = APIClient()
+        authenticate_client(self.client2, get_user_token(self.user2))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1, self.user2])
+        self.reads = []
+        original = ReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            self.reads.append((model, original(router, model, **hints)))
+            return None
+
+        patcher = mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_aliases(self, model):
+        aliases = {alias for read_model, alias in self.reads if read_model is model}
+        self.reads.clear()
+        return aliases
+
+    def test_safe_requests_read_from_replica(self):
+        self.client1.get(reverse("calendars-list"))
+        self.assertEquals(self.read_aliases(Calendar), {'replica'})
+        self.client1.get(reverse("calendars-detail", kwargs={"pk": self.calendar.id}))
+        self.assertEquals(self.read_aliases(Calendar), {'replica'})
+        self.client1.get(reverse("users-list"))
+        self.assertEquals(self.read_aliases(CustomUser), {'replica'})
+        self.client1.get(reverse("events-list"))
+        self.assertEquals(self.read_aliases(Event), {'replica'})
+
+    def test_memberships_use_primary(self):
+        membership.clear_cache()
+        self.client1.get(reverse("events-search"), {"q": "event"})
+        self.assertEquals(self.read_aliases(Calendar.users.through), {DEFAULT_DB_ALIAS})
+
+    def test_tokens_and_other_views_use_primary(self):
+        self.client1.get(reverse("freebusy"), {"users": "test1", "start": "2025-01-01T00:00:00Z",
+                                               "end": "2025-01-02T00:00:00Z"})
+        self.assertEquals(self.read_aliases(Event), {None})
+        self.assertEquals(self.read_aliases(Token), set())
+        caches['default'].clear()
+        with mock.patch('user.authentication.token_cache.get', return_value=None):
+            APIClient().get(reverse("users-list"), HTTP_AUTHORIZATION='Token ' + get_user_token(self.user1))
+        self.assertEquals(self.read_aliases(Token), {DEFAULT_DB_ALIAS})
+
+    def test_writer_sticks_to_primary(self):
+        self.client1.patch(reverse("calendars-detail", kwargs={"pk": self.calendar.id}), {"name": "renamed"},
+                           format="json")
+        self.assertEquals(self.read_aliases(Calendar), {None})
+        self.client1.get(reverse("calendars-list"))
+        self.assertEquals(self.read_aliases(Calendar), {None})
+        self.client2.get(reverse("calendars-list"))
+        self.assertEquals(self.read_aliases(Calendar), {'replica'})
+
+    def test_failed_write_does_not_pin(self):
+        self.client1.post(reverse("events-list"), {"calendar": self.calendar.id}, format="json")
+        self.client1.get(reverse("events-list"))
+        self.assertEquals(self.read_aliases(Event), {'replica'})
+
+
+@override_settings(CALENDAR_DATABASE_ROUTING=ROUTING)
+class ReplicaDatabaseTestCase(APITestCase):
+    """
+    Runs against a replica that is a database of its own, holding a copy of the rows that differs from the
+    primary's, so every assertion shows which of the two a read came from.
+    """
+
+    databases = {DEFAULT_DB_ALIAS, 'replica'}
+
+    def setUp(self):
+        membership.clear_cache()
+        caches['default'].clear()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        self.client1 = APIClient()
+        authenticate_client(self.client1, get_user_token(self.user1))
+        self.client2 = APIClient()
+        authenticate_client(self.client2, get_user_token(self.user2))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1, self.user2])
+        # Written with bulk_create: no signal handler touches the primary. Tokens aren't copied.
+        CustomUser.objects.using('replica').bulk_create([
+            CustomUser(pk=user.pk, username=user.username, password=user.password) for user in (self.user1, self.user2)
+        ])
+        Calendar.objects.using('replica').bulk_create([
+            Calendar(pk=self.calendar.pk, name="calendar on replica", owner_id=self.user1.pk)
+        ])
+        Calendar.users.through.objects.using('replica').bulk_create([
+            Calendar.users.through(calendar_id=self.calendar.pk, customuser_id=self.user1.pk)
+        ])
+
+    def calendar_names(self, client):
+        response = client.get(reverse("calendars-list"))
+        self.assertEquals(response.status_code, 200)
+        return [calendar["name"] for calendar in response.data]
+
+    def test_reads_come_from_replica(self):
+        self.assertEquals(self.calendar_names(self.client1), ["calendar on replica"])
+
+    def test_writes_and_writer_reads_use_primary(self):
+        response = self.client1.patch(reverse("calendars-detail", kwargs={"pk": self.calendar.id}),
+                                      {"name": "renamed"}, format="json")
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(Calendar.objects.using(DEFAULT_DB_ALIAS).get(pk=self.calendar.pk).name, "renamed")
+        self.assertEquals(Calendar.objects.using('replica').get(pk=self.calendar.pk).name, "calendar on replica")
+        self.assertEquals(self.calendar_names(self.client1), ["renamed"])
+        # Only the writer is pinned; user2 isn't a member on the replica.
+        self.assertEquals(self.calendar_names(self.client2), [])
+
+    def test_primary_only_models_bypass_replica(self):
+        token = routing._read_alias.set('replica')
+        try:
+            self.assertEquals(membership.get_calendar_ids(self.user2.pk), {self.calendar.pk})
+            self.assertTrue(Token.objects.filter(user=self.user2).exists())
+            self.assertEquals(Calendar.objects.get(pk=self.calendar.pk).name, "calendar on replica")
+        finally:
+            routing._read_alias.reset(token)
+        self.assertFalse(Token.objects.using('replica').exists())
@@ -0,0 +1,102 @@
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership, search
+from core.models import Event
+from core.tests.test_api import create_calendar, create_event, ICS_FILE
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+
+def indexed_ids():
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT rowid FROM {search.SEARCH_TABLE} ORDER BY rowid')
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SearchTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.client1 = APIClient()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        authenticate_client(self.client1, get_user_token(self.user1))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1])
+        self.other = create_calendar("other", self.user2, [self.user2])
+        self.standup = create_event("Daily standup", self.calendar, description="Team sync")
+        self.review = create_event("Review", self.calendar, description="Quarterly standup review")
+        self.foreign = create_event("Standup", self.other)
+
+    def search(self, **params):
+        response = self.client1.get(reverse("events-search"), params)
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        return [event["id"] for event in response.json()]
+
+    def test_search_ranks_name_matches_first_and_skips_other_calendars(self):
+        self.assertEquals(self.search(q="standup"), [self.standup.id, self.review.id])
+
+    def test_search_needs_every_word_and_matches_prefixes(self):
+        self.assertEquals(self.search(q="team sync"), [self.standup.id])
+        self.assertEquals(self.search(q="quart"), [self.review.id])
+        self.assertEquals(self.search(q="team review"), [])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEquals(self.search(q='"standup" OR NOT (review'), [])
+        self.assertEquals(self.search(q="standup*"), [self.standup.id, self.review.id])
+
+    def test_search_parameters(self):
+        self.assertEquals(self.search(q="standup", limit=1), [self.standup.id])
+        self.assertEquals(self.search(q="standup", calendar=self.other.id), [])
+        self.assertEquals(self.client1.get(reverse("events-search")).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client1.get(reverse("events-search"), {"q": "standup", "limit": "many"})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.client1.patch(reverse("events-detail", kwargs={"pk": self.standup.id}), {"name": "Planning"})
+        self.assertEquals(self.search(q="planning"), [self.standup.id])
+        self.client1.delete(reverse("events-detail", kwargs={"pk": self.review.id}))
+        self.assertEquals(self.search(q="standup"), [])
+        self.other.delete()
+        self.assertEquals(indexed_ids(), [self.standup.id])
+
+    def test_index_follows_bulk_and_import(self):
+        payload = {"create": [{"calendar": self.calendar.id, "name": "Retro", "timestamp": "2025-01-01T00:00:00Z"}],
+                   "delete": [self.review.id]}
+        self.client1.post(reverse("events-bulk"), payload, format="json")
+        self.assertEquals(len(self.search(q="retro")), 1)
+        self.assertEquals(self.search(q="quarterly"), [])
+        self.client1.post(reverse("calendar-import", kwargs={"pk": self.calendar.id}),
+                          {"file": SimpleUploadedFile("calendar.ics", ICS_FILE.encode())}, format="multipart")
+        self.assertEquals(len(self.search(q="line continued")), 1)
+
+    def test_search_follows_membership(self):
+        self.other.users.add(self.user1)
+        self.assertEquals(len(self.search(q="standup")), 3)
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.SEARCH_TABLE}')
+        Event.objects.bulk_create([Event(name="Bulk", calendar=self.calendar, timestamp="2025-01-01T00:00:00Z")])
+        out = StringIO()
+        call_command("rebuild_search_index", batch_size=2, stdout=out)
+        self.assertIn("Indexed 4 events.", out.getvalue())
+        self.assertEquals(indexed_ids(), sorted(Event.objects.values_list("id", flat=True)))
+        self.assertEquals(len(self.search(q="bulk")), 1)
+
+    def test_rebuild_keeps_index_searchable(self):
+        stale_id = self.foreign.id + 100
+        search._write_rows([search._row(stale_id, self.calendar.id, "Stale", "")], connection.alias)
+        seen = []
+
+        def progress(total):
+            # Events before and after the batches written so far are found all along.
+            seen.append(self.search(q="quarterly"))
+
+        self.assertEquals(search.rebuild(batch_size=1, progress=progress), 3)
+        self.assertEquals(seen, [[self.review.id]] * 3)
+        self.assertEquals(indexed_ids(), sorted(Event.objects.values_list("id", flat=True)))
@@ -0,0 +1,246 @@
+import asyncio
+import contextlib
+import json
+import sys
+from types import ModuleType
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership, pubsub
+from core.streams import STREAM_PATH, ChangeStream
+from core.tests.test_api import create_calendar, create_event
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+
+# How long a stream may take to send what a test waits for before the test fails.
+STREAM_TIMEOUT = 5
+
+
+def sent_body(sent):
+    return b''.join(message.get('body', b'') for message in sent if message['type'] == 'http.response.body')
+
+
+def parse_events(sent):
+    events = []
+    for block in sent_body(sent).decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n') if line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class ChangeStreamTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        self.token = get_user_token(self.user1)
+        self.client2 = APIClient()
+        authenticate_client(self.client2, get_user_token(self.user2))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1, self.user2])
+        self.other = create_calendar("other", self.user2, [self.user2])
+        self.event = create_event("event", self.calendar)
+
+    def commit(self, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+
+    def run_stream(self, *steps, stream=None, method="GET", token=None):
+        """
+        Connects to the stream and, once it is listening, goes through ``steps``: each ``(action, frames)``
+        runs the action (in this thread, so it sees the test's data) and waits for the stream to send
+        ``frames`` more frames (events or keepalives), so it has handled the action before the next one.
+        Then disconnects and returns what was sent; fails if that takes over STREAM_TIMEOUT seconds.
+        """
+        stream = stream or ChangeStream()
+        scope = {"type": "http", "method": method, "path": STREAM_PATH, "query_string": b"", "root_path": "",
+                 "headers": [(b"authorization", f"Token {token or self.token}".encode())]}
+
+        async def scenario():
+            sent, gone, progress = [], asyncio.Event(), asyncio.Event()
+
+            async def receive():
+                await gone.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+                progress.set()
+
+            async def frames_sent(count):
+                # Not counting the ': connected' comment; a stream that ended sends nothing more.
+                while sent_body(sent).count(b"\n\n") - 1 < count and not task.done():
+                    progress.clear()
+                    await progress.wait()
+
+            task = asyncio.ensure_future(stream(scope, receive, send))
+            task.add_done_callback(lambda _: progress.set())
+            try:
+                await frames_sent(0)
+                expected = 0
+                for action, frames in steps:
+                    await sync_to_async(self.commit)(action)
+                    expected += frames
+                    await frames_sent(expected)
+            finally:
+                gone.set()
+            await task
+            return sent
+
+        async def run():
+            return await asyncio.wait_for(scenario(), STREAM_TIMEOUT)
+        return async_to_sync(run)()
+
+    def test_rejects_missing_token_and_other_methods(self):
+        sent = self.run_stream(token="invalid")
+        self.assertEquals(sent[0]["status"], 401)
+        sent = self.run_stream(method="POST")
+        self.assertEquals(sent[0]["status"], 405)
+
+    def test_pushes_event_changes_of_member_calendars(self):
+        def change():
+            self.client2.patch(reverse("events-detail", kwargs={"pk": self.event.id}), {"name": "renamed"})
+            create_event("foreign", self.other)
+            self.client2.delete(reverse("events-detail", kwargs={"pk": self.event.id}))
+
+        event_id = self.event.id
+        sent = self.run_stream((change, 2))
+        self.assertEquals(sent[0]["status"], 200)
+        self.assertEquals(dict(sent[0]["headers"])[b"content-type"], b"text/event-stream")
+        self.assertEquals(parse_events(sent), [
+            ("event.changed", {"type": "event.changed", "calendar": self.calendar.id, "events": [event_id]}),
+            ("event.deleted", {"type": "event.deleted", "calendar": self.calendar.id, "events": [event_id]}),
+        ])
+        self.assertEquals(pubsub.hub.subscriber_count(), 0)
+
+    def test_follows_membership(self):
+        def join():
+            self.client2.post(reverse("add-users", kwargs={"pk": self.other.id}), {"users": ["test1"]}, format="json")
+
+        def leave():
+            self.client2.post(reverse("remove-users", kwargs={"pk": self.other.id}), {"users": ["test1"]},
+                              format="json")
+
+        events = parse_events(self.run_stream((join, 1), (lambda: create_event("foreign", self.other), 1), (leave, 1),
+                                              (lambda: create_event("hidden", self.other), 0)))
+        self.assertEquals([(name, data["calendar"]) for name, data in events], [
+            ("membership.added", self.other.id), ("event.changed", self.other.id),
+            ("membership.removed", self.other.id)])
+        self.assertEquals(events[0][1]["users"], [self.user1.id])
+
+    def test_bulk_changes_are_coalesced(self):
+        events = [create_event(f"event{i}", self.calendar) for i in range(3)]
+
+        def bulk_delete():
+            self.client2.post(reverse("events-bulk"), {"delete": [event.id for event in events]}, format="json")
+
+        pushed = parse_events(self.run_stream((bulk_delete, 1)))
+        self.assertEquals([(name, data["calendar"]) for name, data in pushed], [("event.deleted", self.calendar.id)])
+        self.assertEquals(sorted(pushed[0][1]["events"]), [event.id for event in events])
+
+    def test_heartbeat_and_overflow(self):
+        sent = self.run_stream((lambda: None, 1), stream=ChangeStream(heartbeat=0.01))
+        self.assertIn(b": keepalive\n\n", sent_body(sent))
+
+        async def overflow():
+            subscription = pubsub.Subscription(pubsub.hub, 1)
+            for i in range(3):
+                subscription.deliver({"type": "calendar.changed", "calendar": i})
+            return await subscription.get(1), await subscription.get(0.01)
+        self.assertEquals(async_to_sync(overflow)(), (pubsub.Subscription.OVERFLOW, None))
+
+    def test_asgi_application_mounts_stream(self):
+        from django_calendar.asgi import application, change_stream
+        self.assertIsInstance(change_stream, ChangeStream)
+        sent = []
+
+        async def call():
+            async def send(message):
+                sent.append(message)
+            await application({"type": "http", "method": "GET", "path": STREAM_PATH, "headers": [],
+                               "query_string": b"", "root_path": ""}, None, send)
+        async_to_sync(call)()
+        self.assertEquals(sent[0]["status"], 401)
+
+
+class FakeRedisError(Exception):
+    pass
+
+
+class FakePubSub:
+    """
+    One connection: ``psubscribe`` waits for ``ready`` and fails if ``items`` is an exception, then ``listen``
+    goes through ``items``: yields the messages, waits for the events and raises the exceptions.
+    """
+
+    def __init__(self, items, ready=None):
+        self.items, self.ready = items, ready
+
+    async def psubscribe(self, pattern):
+        if self.ready is not None:
+            await self.ready.wait()
+        if isinstance(self.items, Exception):
+            raise self.items
+
+    async def listen(self):
+        for item in self.items:
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, asyncio.Event):
+                await item.wait()
+            else:
+                yield item
+        await asyncio.Event().wait()
+
+    async def reset(self):
+        pass
+
+
+class RedisBackendTestCase(APITestCase):
+    def message(self, calendar_id):
+        return {"type": "pmessage", "channel": f"calendar-changes:calendar:{calendar_id}".encode(),
+                "data": json.dumps({"type": "calendar.changed", "calendar": calendar_id})}
+
+    def fake_redis(self, connections):
+        client = mock.Mock()
+        client.pubsub.side_effect = connections
+        redis = ModuleType("redis")
+        redis.Redis = mock.Mock()
+        redis.asyncio = ModuleType("redis.asyncio")
+        redis.asyncio.Redis = mock.Mock()
+        redis.asyncio.Redis.from_url.return_value = client
+        redis.exceptions = ModuleType("redis.exceptions")
+        redis.exceptions.RedisError = FakeRedisError
+        return mock.patch.dict(sys.modules, {"redis": redis, "redis.asyncio": redis.asyncio})
+
+    def test_reconnects_and_resyncs(self):
+        hub = pubsub.Hub()
+
+        async def scenario():
+            dropped, back = asyncio.Event(), asyncio.Event()
+            connections = [FakePubSub([self.message(1), dropped, FakeRedisError()]), FakePubSub(OSError()),
+                           FakePubSub([self.message(2)], ready=back)]
+            with self.fake_redis(connections):
+                backend = pubsub.RedisBackend(hub, reconnect_delay=0.01)
+            early = pubsub.Subscription(hub, 10)
+            early.subscribe(["calendar:1", "calendar:2"])
+            await backend.start()
+            received = [await early.get(1)]
+            dropped.set()
+            received.append(await early.get(1))
+            # Joined while the connection was down: told to resync once it is back.
+            late = pubsub.Subscription(hub, 10)
+            late.subscribe(["calendar:2"])
+            back.set()
+            received.append(await late.get(1))
+            backend._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await backend._listener
+            return received
+
+        self.assertEquals(async_to_sync(scenario)(), [
+            {"type": "calendar.changed", "calendar": 1}, pubsub.Subscription.OVERFLOW, pubsub.Subscription.OVERFLOW,
+        ])
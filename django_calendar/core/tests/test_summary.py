@@ -0,0 +1,81 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core import membership, recurrence, summary
+from core.models import Event
+from core.tests.test_api import create_calendar, create_event
+from user.tests.test_api import authenticate_client, create_user, get_user_token
+
+
+class EventSummaryTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        recurrence.clear_cache()
+        summary.clear_cache()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        authenticate_client(self.client, get_user_token(self.user1))
+        self.calendar1 = create_calendar("calendar1", self.user1, [self.user1])
+        self.calendar2 = create_calendar("calendar2", self.user2, [self.user2, self.user1])
+        self.other = create_calendar("other", self.user2, [self.user2])
+        self.url = reverse("events-summary")
+        self.window = {"start": "2025-01-01T00:00:00Z", "end": "2025-01-08T00:00:00Z"}
+        create_event("first", self.calendar1, timestamp="2025-01-01T09:00:00Z")
+        create_event("second", self.calendar1, timestamp="2025-01-01T23:30:00Z")
+        create_event("third", self.calendar2, timestamp="2025-01-06T10:15:00Z")
+        create_event("before", self.calendar1, timestamp="2024-12-31T23:59:00Z")
+        create_event("not mine", self.other, timestamp="2025-01-01T09:00:00Z")
+        create_event("daily", self.calendar2, timestamp="2024-12-30T10:00:00Z",
+                     recurrence_frequency=Event.Frequency.DAILY, recurrence_count=5)
+
+    def get_counts(self, **params):
+        response = self.client.get(self.url, {**self.window, **params})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        return {calendar["calendar"]: calendar["counts"] for calendar in response.data["calendars"]}
+
+    def test_days(self):
+        self.assertEquals(self.get_counts(), {
+            self.calendar1.pk: {"2025-01-01T00:00:00Z": 2},
+            self.calendar2.pk: {"2025-01-01T00:00:00Z": 1, "2025-01-02T00:00:00Z": 1, "2025-01-03T00:00:00Z": 1,
+                                "2025-01-06T00:00:00Z": 1},
+        })
+
+    def test_time_zone(self):
+        response = self.client.get(self.url, {**self.window, "tz": "Europe/Paris"})
+        self.assertEquals(response.data["tz"], "Europe/Paris")
+        self.assertEquals(response.data["bucket"], "day")
+        counts = {calendar["calendar"]: calendar["counts"] for calendar in response.data["calendars"]}
+        self.assertEquals(counts[self.calendar1.pk], {"2025-01-01T00:00:00+01:00": 1, "2025-01-02T00:00:00+01:00": 1})
+
+    def test_weeks_and_hours(self):
+        self.assertEquals(self.get_counts(bucket="week"), {
+            self.calendar1.pk: {"2024-12-30T00:00:00Z": 2},
+            self.calendar2.pk: {"2024-12-30T00:00:00Z": 3, "2025-01-06T00:00:00Z": 1},
+        })
+        # A single event and an occurrence of a series in the same bucket count together.
+        create_event("meeting", self.calendar2, timestamp="2025-01-02T10:45:00Z")
+        counts = self.get_counts(bucket="hour", calendar=self.calendar2.pk)
+        self.assertEquals(counts[self.calendar2.pk]["2025-01-02T10:00:00Z"], 2)
+        self.assertEquals(list(counts), [self.calendar2.pk])
+
+    def test_invalid_parameters(self):
+        for params in ({"bucket": "month"}, {"tz": "Mars/Olympus"}, {"start": ""}):
+            response = self.client.get(self.url, {**self.window, **params})
+            self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cache(self):
+        self.get_counts()
+        # Calendar versions only.
+        with self.assertNumQueries(1):
+            self.get_counts()
+        create_event("new", self.calendar1, timestamp="2025-01-07T12:00:00Z")
+        self.assertEquals(self.get_counts()[self.calendar1.pk]["2025-01-07T00:00:00Z"], 1)
+
+    @override_settings(CALENDAR_SUMMARY={"ENABLED": False})
+    def test_without_cache(self):
+        self.get_counts()
+        # Single events, then series.
+        with self.assertNumQueries(2):
+            self.assertEquals(len(self.get_counts()[self.calendar2.pk]), 4)
@@ -0,0 +1,121 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from core import membership, sync
+from core.models import Event, EventTombstone
+from core.tests.test_api import create_calendar, create_event, ICS_FILE
+from user.tests.test_api import create_user, authenticate_client, get_user_token
+
+
+@override_settings(CALENDAR_SYNC={'TOMBSTONE_RETENTION_DAYS': 30, 'SETTLE_SECONDS': 0})
+class SyncTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        self.client1 = APIClient()
+        self.client2 = APIClient()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        authenticate_client(self.client1, get_user_token(self.user1))
+        authenticate_client(self.client2, get_user_token(self.user2))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1, self.user2])
+        self.other = create_calendar("other", self.user2, [self.user2])
+        self.event = create_event("event", self.calendar)
+        self.foreign = create_event("foreign", self.other)
+
+    def sync(self, token=None, client=None):
+        response = (client or self.client1).get(reverse("sync"), {"token": token} if token else {})
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def assertChanges(self, changes, calendars=(), events=(), deleted_calendars=(), deleted_events=()):
+        self.assertEquals([calendar["name"] for calendar in changes["calendars"]], list(calendars))
+        self.assertEquals([event["name"] for event in changes["events"]], list(events))
+        self.assertEquals(changes["deleted"], {"calendars": list(deleted_calendars), "events": list(deleted_events)})
+
+    def test_initial_sync_returns_everything(self):
+        changes = self.sync()
+        self.assertChanges(changes, ["calendar"], ["event"])
+        self.assertEquals(changes["events"][0], self.client1.get(reverse("events-detail",
+                                                                         kwargs={"pk": self.event.id})).json())
+        self.assertChanges(self.sync(changes["token"]))
+
+    def test_sync_returns_event_changes(self):
+        token = self.sync()["token"]
+        self.client1.patch(reverse("events-detail", kwargs={"pk": self.event.id}), {"name": "renamed"})
+        self.client1.post(reverse("events-list"), {"calendar": self.calendar.id, "name": "new",
+                                                   "timestamp": "2025-01-01T00:00:00Z"})
+        changes = self.sync(token)
+        self.assertChanges(changes, events=["renamed", "new"])
+        self.client1.delete(reverse("events-detail", kwargs={"pk": self.event.id}))
+        self.assertChanges(self.sync(changes["token"]), deleted_events=[self.event.id])
+
+    def test_moved_event(self):
+        token1, token2 = self.sync()["token"], self.sync(client=self.client2)["token"]
+        self.client2.patch(reverse("events-detail", kwargs={"pk": self.event.id}), {"calendar": self.other.id})
+        self.assertChanges(self.sync(token1), deleted_events=[self.event.id])
+        self.assertChanges(self.sync(token2, self.client2), events=["event"])
+
+    def test_sync_follows_membership(self):
+        token = self.sync()["token"]
+        self.client2.post(reverse("add-users", kwargs={"pk": self.other.id}), {"users": ["test1"]}, format="json")
+        changes = self.sync(token)
+        self.assertChanges(changes, ["other"], ["foreign"])
+        self.client2.post(reverse("remove-users", kwargs={"pk": self.other.id}), {"users": ["test1"]}, format="json")
+        self.client1.patch(reverse("calendars-detail", kwargs={"pk": self.calendar.id}), {"name": "renamed"})
+        changes = self.sync(changes["token"])
+        self.assertChanges(changes, ["renamed"], deleted_calendars=[self.other.id])
+        calendar_id = self.calendar.id
+        self.calendar.delete()
+        self.assertChanges(self.sync(changes["token"]), deleted_calendars=[calendar_id])
+        self.assertFalse(EventTombstone.objects.exists())
+
+    def test_sync_follows_bulk_and_import(self):
+        token = self.sync()["token"]
+        payload = {"create": [{"calendar": self.calendar.id, "name": "bulk", "timestamp": "2025-01-01T00:00:00Z"}],
+                   "update": [{"id": self.event.id, "name": "renamed"}]}
+        self.client1.post(reverse("events-bulk"), payload, format="json")
+        changes = self.sync(token)
+        self.assertEquals(sorted(event["name"] for event in changes["events"]), ["bulk", "renamed"])
+        self.client1.post(reverse("calendar-import", kwargs={"pk": self.calendar.id}),
+                          {"file": SimpleUploadedFile("calendar.ics", ICS_FILE.encode())}, format="multipart")
+        changes = self.sync(changes["token"])
+        self.assertEquals(len(changes["events"]), Event.objects.filter(calendar=self.calendar).count() - 2)
+        ids = list(Event.objects.filter(calendar=self.calendar).values_list("id", flat=True))
+        with CaptureQueriesContext(connection) as context:
+            self.client1.post(reverse("events-bulk"), {"delete": ids}, format="json")
+        inserts = [query for query in context.captured_queries if "INSERT INTO \"core_eventtombstone\"" in query["sql"]]
+        self.assertEquals(len(inserts), 1)
+        self.assertEquals(self.sync(changes["token"])["deleted"]["events"], sorted(ids))
+
+    def test_invalid_and_expired_tokens(self):
+        response = self.client1.get(reverse("sync"), {"token": "forged"})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEquals(response.data, {"message": "This sync token is not valid."})
+        token = sync.dump_token(self.user1.pk, timezone.now() - timedelta(days=31), [self.calendar.id])
+        response = self.client1.get(reverse("sync"), {"token": token})
+        self.assertEquals(response.status_code, status.HTTP_410_GONE)
+
+    def test_token_of_another_user(self):
+        token = self.sync()["token"]
+        response = self.client2.get(reverse("sync"), {"token": token})
+        self.assertEquals(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune_tombstones_command(self):
+        event_id, foreign_id = self.event.id, self.foreign.id
+        self.event.delete()
+        self.foreign.delete()
+        EventTombstone.objects.filter(event_id=event_id).update(deleted_at=timezone.now() - timedelta(days=31))
+        out = StringIO()
+        call_command("prune_tombstones", stdout=out)
+        self.assertIn("Deleted 1 tombstones.", out.getvalue())
+        self.assertEquals(list(EventTombstone.objects.values_list("event_id", flat=True)), [foreign_id])
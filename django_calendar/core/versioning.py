@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import F
+
+from .models import Calendar
+
+_deferred = ContextVar('deferred_calendar_versions', default=None)
+
+
+def bump_calendar_versions(calendar_ids):
+    """
+    Increments the version of every calendar in ``calendar_ids`` with a single UPDATE,
+    or collects them if called inside ``deferred_version_bumps()``.
+    """
+    calendar_ids = {calendar_id for calendar_id in calendar_ids if calendar_id is not None}
+    if not calendar_ids:
+        return
+    deferred = _deferred.get()
+    if deferred is not None:
+        deferred.update(calendar_ids)
+        return
+    Calendar.objects.filter(pk__in=calendar_ids).update(version=F('version') + 1)
+
+
+@contextmanager
+def deferred_version_bumps():
+    """
+    Collects the version bumps requested inside the block and applies them with one UPDATE at the end.
+    """
+    if _deferred.get() is not None:
+        yield
+        return
+    token = _deferred.set(set())
+    try:
+        yield
+        calendar_ids = _deferred.get()
+    finally:
+        _deferred.reset(token)
+    bump_calendar_versions(calendar_ids)
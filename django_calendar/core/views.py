@@ -1,28 +1,68 @@
+from copy import copy
+from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core import signing
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Prefetch, Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.urls import resolve, reverse
-from drf_spectacular.utils import extend_schema, OpenApiResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse
 from rest_framework import status
-from rest_framework.generics import GenericAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import GenericAPIView, ListAPIView
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
+from user import directory
 from user.models import CustomUser
-from .models import Calendar, Event
-from .serializers import CalendarSerializer, EventSerializer, CalendarEmptySerializer
+from . import admission, agenda, metrics, sync
+from .bulk import EventBulkOperation
+from .conflicts import OverlapConflict, find_conflicts, find_overlapping_events, rejects_overlaps
+from .etags import CalendarVersionETagMixin
+from .filters import EventWindowFilter, parse_int_param, parse_window_params
+from .freebusy import get_busy_intervals, merge_intervals
+from .ical import EXPORT_CHUNK_SIZE, aiter_chunks, format_datetime, iter_calendar
+from .importer import ICalendarImporter
+from .membership import get_calendar_ids, has_calendar_access
+from .models import AgendaEntry, Calendar, Event
+from .pagination import AgendaCursorPagination, EventCursorPagination
+from .recurrence import get_occurrences
+from .search import search_event_ids
+from .summary import BUCKETS, DAY, get_summary
+from .renderers import ColumnarRenderer, ICalendarRenderer, PrometheusRenderer
+from .representation import FastListMixin
+from .routing import ReplicaReadMixin
+from .serializers import (CalendarSerializer, EventSerializer, CalendarEmptySerializer, EventBulkSerializer,
+                          OccurrenceSerializer, ConflictSerializer, EventSummarySerializer, FreeBusySerializer,
+                          CalendarImportSerializer, SyncSerializer)
 from .permissions import HasCalendarAccess, HasEventAccess
 
 
-class CalendarViewSet(ModelViewSet):
+class CalendarViewSet(ReplicaReadMixin, CalendarVersionETagMixin, FastListMixin, ModelViewSet):
     serializer_class = CalendarSerializer
-    queryset = Calendar.objects.all()
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarRenderer)
+    # Calendars and their users are listed by id, whichever path (serializer, fast or async) reads them.
+    queryset = (Calendar.objects.select_related('owner').order_by('id')
+                .prefetch_related(Prefetch('users', queryset=CustomUser.objects.order_by('id'))))
     permission_classes = (IsAuthenticated & HasCalendarAccess,)
 
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return self.queryset
+            return self.queryset.all()
         return self.queryset.filter(users=user)
 
+    def get_detail_versions(self):
+        return self.get_versioned_calendars().filter(pk=self.kwargs['pk']).values_list('id', 'version')
+
     def create(self, request, *args, **kwargs):
         request.data['owner'] = request.user
         if 'users' not in request.data:
@@ -40,30 +80,78 @@ class CalendarViewSet(ModelViewSet):
                             status=status.HTTP_400_BAD_REQUEST)
         if 'owner' in request.data:
             pk = self.kwargs['pk']
-            calendar = Calendar.objects.get(pk=pk)
-            is_present = False
-            new_owner_name = request.data['owner']
-            for user in calendar.users.all():
-                if user.username == new_owner_name:
-                    is_present = True
-                    break
+            is_present = Calendar.users.through.objects.filter(calendar_id=pk,
+                                                               customuser__username=request.data['owner']).exists()
             if not is_present:
                 return Response({"message": f"User '{request.data['owner']}' does not have access to this calendar"},
                                 status=status.HTTP_400_BAD_REQUEST)
         return super(ModelViewSet, self).update(request, *args, **kwargs)
 
 
-class EventViewSet(ModelViewSet):
+class CalendarFileView(GenericAPIView):
+    queryset = Calendar.objects.all()
+    permission_classes = (IsAuthenticated & HasCalendarAccess,)
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_staff:
+            return self.queryset.all()
+        return self.queryset.filter(users=user)
+
+
+class CalendarExportView(CalendarFileView):
+    serializer_class = CalendarEmptySerializer
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, ICalendarRenderer)
+
+    @extend_schema(responses={
+        (200, 'text/calendar'): OpenApiResponse(response=OpenApiTypes.STR, description="iCalendar document"),
+    })
+    def get(self, request, pk):
+        calendar = self.get_object()
+        events = calendar.event_set.order_by('timestamp', 'id').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        content = iter_calendar(calendar, events, format_datetime(timezone.now()))
+        if isinstance(request._request, ASGIRequest):
+            content = aiter_chunks(content)
+        response = StreamingHttpResponse(content, content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="calendar-{calendar.pk}.ics"'
+        return response
+
+
+class CalendarImportView(CalendarFileView):
+    serializer_class = CalendarImportSerializer
+    parser_classes = (MultiPartParser,)
+
+    @extend_schema(responses={
+        "200": OpenApiResponse(description="Import counters and the first errors encountered"),
+    })
+    def post(self, request, pk):
+        calendar = self.get_object()
+        serializer = CalendarImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        stats = ICalendarImporter(calendar).run(serializer.validated_data['file'])
+        return Response(data=stats, status=status.HTTP_200_OK)
+
+
+class EventViewSet(ReplicaReadMixin, CalendarVersionETagMixin, FastListMixin, ModelViewSet):
     serializer_class = EventSerializer
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarRenderer)
     queryset = Event.objects.all()
     permission_classes = (IsAuthenticated & HasEventAccess,)
+    filter_backends = (EventWindowFilter,)
+    pagination_class = EventCursorPagination
+    bulk_max_items = 10000
+    max_window = timedelta(days=366)
+    search_limit = 20
+    search_max_limit = 100
 
     def get_queryset(self):
         user = self.request.user
         if user.is_staff:
-            return self.queryset
-        user_calendars = Calendar.objects.filter(users=user)
-        return self.queryset.filter(calendar__in=user_calendars)
+            return self.queryset.all()
+        return self.queryset.filter(calendar__users=user)
+
+    def get_detail_versions(self):
+        return self.get_queryset().filter(pk=self.kwargs['pk']).values_list('calendar_id', 'calendar__version')
 
     def create(self, request, *args, **kwargs):
         calendar_status = self._check_if_calendar_is_valid(request)
@@ -79,14 +167,133 @@ class EventViewSet(ModelViewSet):
         else:
             return Response(status=calendar_status)
 
+    def perform_create(self, serializer):
+        if not rejects_overlaps():
+            return super().perform_create(serializer)
+        self._save_without_overlaps(serializer, Event(**serializer.validated_data))
+
+    def perform_update(self, serializer):
+        if not rejects_overlaps():
+            return super().perform_update(serializer)
+        event = copy(serializer.instance)
+        for field, value in serializer.validated_data.items():
+            setattr(event, field, value)
+        self._save_without_overlaps(serializer, event)
+
+    @staticmethod
+    def _save_without_overlaps(serializer, event):
+        with transaction.atomic():
+            # Locks the calendar row (where the database can) so concurrent writes to it are checked in turn.
+            list(Calendar.objects.select_for_update().filter(pk=event.calendar_id).values_list('pk', flat=True))
+            overlapping = find_overlapping_events(event)
+            if overlapping:
+                raise OverlapConflict(overlapping)
+            serializer.save()
+
+    @extend_schema(request=EventBulkSerializer, responses={
+        "200": OpenApiResponse(description="Per-item results for 'create', 'update' and 'delete'"),
+        "400": OpenApiResponse(description="Malformed request")
+    })
+    @action(detail=False, methods=['post'], url_path='bulk', serializer_class=EventBulkSerializer,
+            pagination_class=None)
+    def bulk(self, request):
+        serializer = EventBulkSerializer(data=request.data, context={'max_items': self.bulk_max_items})
+        serializer.is_valid(raise_exception=True)
+        results = EventBulkOperation(request.user, **serializer.validated_data).execute()
+        return Response(data=results, status=status.HTTP_200_OK)
+
+    @extend_schema(responses=OccurrenceSerializer(many=True))
+    @action(detail=False, methods=['get'], serializer_class=OccurrenceSerializer, pagination_class=None,
+            filter_backends=())
+    def occurrences(self, request):
+        start, end = parse_window_params(request, self.max_window)
+        queryset = self.get_queryset()
+        calendar_id = parse_int_param(request, 'calendar')
+        if calendar_id is not None:
+            queryset = queryset.filter(calendar_id=calendar_id)
+        single = queryset.filter(recurrence_frequency='', timestamp__gte=start, timestamp__lt=end)
+        series = queryset.exclude(recurrence_frequency='').filter(
+            Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=start), timestamp__lt=end)
+        occurrences = [{'event': event, 'timestamp': timestamp,
+                        'end': None if event.end is None else timestamp + event.duration}
+                       for events in (single, series) for event in events
+                       for timestamp in get_occurrences(event, start, end)]
+        occurrences.sort(key=lambda occurrence: (occurrence['timestamp'], occurrence['event'].id))
+        return Response(OccurrenceSerializer(occurrences, many=True).data)
+
+    @extend_schema(parameters=[
+        OpenApiParameter('start', OpenApiTypes.DATETIME, required=True, description="Start of the window"),
+        OpenApiParameter('end', OpenApiTypes.DATETIME, required=True, description="End of the window"),
+        OpenApiParameter('calendar', OpenApiTypes.INT, description="Only look at this calendar"),
+    ], responses=ConflictSerializer(many=True))
+    @action(detail=False, methods=['get'], serializer_class=ConflictSerializer, pagination_class=None,
+            filter_backends=())
+    def conflicts(self, request):
+        start, end = parse_window_params(request, self.max_window)
+        calendar_ids = get_calendar_ids(request.user.pk)
+        calendar_id = parse_int_param(request, 'calendar')
+        if calendar_id is not None:
+            calendar_ids = calendar_ids & {calendar_id}
+        return Response(ConflictSerializer(find_conflicts(calendar_ids, start, end), many=True).data)
+
+    @extend_schema(parameters=[
+        OpenApiParameter('start', OpenApiTypes.DATETIME, required=True, description="Start of the window"),
+        OpenApiParameter('end', OpenApiTypes.DATETIME, required=True, description="End of the window"),
+        OpenApiParameter('bucket', OpenApiTypes.STR, enum=list(BUCKETS), description="Bucket size (default: day)"),
+        OpenApiParameter('tz', OpenApiTypes.STR, description="Time zone of the buckets (default: UTC)"),
+        OpenApiParameter('calendar', OpenApiTypes.INT, description="Only count this calendar"),
+    ], responses=EventSummarySerializer)
+    @action(detail=False, methods=['get'], serializer_class=EventSummarySerializer, pagination_class=None,
+            filter_backends=())
+    def summary(self, request):
+        start, end = parse_window_params(request, self.max_window)
+        bucket = request.query_params.get('bucket') or DAY
+        if bucket not in BUCKETS:
+            raise ValidationError({"bucket": f"'{bucket}' is not one of {', '.join(BUCKETS)}."})
+        tz = request.query_params.get('tz') or 'UTC'
+        try:
+            tzinfo = ZoneInfo(tz)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValidationError({"tz": f"'{tz}' is not a known time zone."})
+        calendar_ids = get_calendar_ids(request.user.pk)
+        calendar_id = parse_int_param(request, 'calendar')
+        if calendar_id is not None:
+            calendar_ids = calendar_ids & {calendar_id}
+        calendars = get_summary(calendar_ids, start, end, bucket, tzinfo)
+        return Response(EventSummarySerializer({'start': start, 'end': end, 'bucket': bucket, 'tz': tz,
+                                                'calendars': calendars}).data)
+
+    @extend_schema(parameters=[
+        OpenApiParameter('q', OpenApiTypes.STR, required=True, description="Words to find in names and descriptions"),
+        OpenApiParameter('calendar', OpenApiTypes.INT, description="Only search this calendar"),
+        OpenApiParameter('limit', OpenApiTypes.INT, description="Maximum number of results (at most 100)"),
+    ], responses=EventSerializer(many=True))
+    @action(detail=False, methods=['get'], pagination_class=None, filter_backends=())
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"q": "This query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = parse_int_param(request, 'limit')
+        limit = self.search_limit if limit is None else max(1, min(limit, self.search_max_limit))
+        calendar_ids = get_calendar_ids(request.user.pk)
+        calendar_id = parse_int_param(request, 'calendar')
+        if calendar_id is not None:
+            calendar_ids = calendar_ids & {calendar_id}
+        event_ids = search_event_ids(query, calendar_ids, limit)
+        events = Event.objects.in_bulk(event_ids)
+        return Response(EventSerializer([events[pk] for pk in event_ids if pk in events], many=True).data)
+
     def _check_if_calendar_is_valid(self, request):
         if 'calendar' in request.data:
-            calendar_id = request.data['calendar']
             try:
-                calendar = Calendar.objects.get(pk=calendar_id)
-            except Exception:
+                calendar_id = int(request.data['calendar'])
+            except (TypeError, ValueError):
                 return status.HTTP_400_BAD_REQUEST
-            if request.user not in calendar.users.all() and not request.user.is_staff:
+            if has_calendar_access(request.user, calendar_id):
+                return status.HTTP_200_OK
+            if not Calendar.objects.filter(pk=calendar_id).exists():
+                return status.HTTP_400_BAD_REQUEST
+            if not request.user.is_staff:
                 return status.HTTP_403_FORBIDDEN
         return status.HTTP_200_OK
 
@@ -101,30 +308,152 @@ class CalendarUserManager(GenericAPIView):
     })
     def post(self, request, pk):
         try:
-            calendar = Calendar.objects.get(id=pk)
+            calendar = Calendar.objects.select_related('owner').get(id=pk)
         except Exception:
             return Response({"message": f"Calendar with id '{pk}' does not exist."},
                             status=status.HTTP_404_NOT_FOUND)
-        if request.user not in calendar.users.all() and not request.user.is_staff:
+        if not has_calendar_access(request.user, calendar.id) and not request.user.is_staff:
             return Response(status=status.HTTP_403_FORBIDDEN)
-        users = []
-        for new_user in request.data['users']:
-            try:
-                users.append(CustomUser.objects.get(username=new_user))
-            except Exception:
-                return Response({"message": f"User with username '{new_user}' does not exist."},
+        usernames = request.data['users']
+        users = {user.username: user for user in CustomUser.objects.filter(username__in=usernames)}
+        for username in usernames:
+            if username not in users:
+                return Response({"message": f"User with username '{username}' does not exist."},
                                 status=status.HTTP_404_NOT_FOUND)
+        user_ids = {user.id for user in users.values()}
         view_name = resolve(request.path).view_name
-        if view_name == "add-users":
-            for user in users:
-                calendar.users.add(user)
-        if view_name == "remove-users":
-            for user in users:
-                if user.id == calendar.owner.id:
-                    return Response({"message": "Can't remove owner."}, status=status.HTTP_400_BAD_REQUEST)
-                if user not in calendar.users.all():
-                    return Response({"message": f"User '{user}' does not have access to this calendar."},
-                                    status=status.HTTP_400_BAD_REQUEST)
-            for user in users:
-                calendar.users.remove(user)
+        with transaction.atomic():
+            if view_name == "add-users":
+                calendar.users.add(*user_ids)
+            if view_name == "remove-users":
+                members = set(Calendar.users.through.objects.filter(calendar_id=calendar.id, customuser_id__in=user_ids)
+                              .values_list('customuser_id', flat=True))
+                for username in usernames:
+                    user = users[username]
+                    if user.id == calendar.owner_id:
+                        return Response({"message": "Can't remove owner."}, status=status.HTTP_400_BAD_REQUEST)
+                    if user.id not in members:
+                        return Response({"message": f"User '{user}' does not have access to this calendar."},
+                                        status=status.HTTP_400_BAD_REQUEST)
+                calendar.users.remove(*user_ids)
         return Response(data=CalendarSerializer(calendar).data, status=status.HTTP_200_OK)
+
+
+class FreeBusyView(GenericAPIView):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = FreeBusySerializer
+    max_users = 200
+    max_window = timedelta(days=93)
+
+    @extend_schema(parameters=[
+        OpenApiParameter('users', str, description="Comma separated usernames", required=True),
+        OpenApiParameter('start', OpenApiTypes.DATETIME, required=True),
+        OpenApiParameter('end', OpenApiTypes.DATETIME, required=True),
+    ])
+    def get(self, request):
+        start, end = parse_window_params(request, self.max_window)
+        usernames, error = self.get_usernames(request)
+        if error is not None:
+            return error
+        users = dict(CustomUser.objects.filter(username__in=usernames).values_list('id', 'username'))
+        error = self.check_users_exist(usernames, users)
+        if error is not None:
+            return error
+        return self.get_busy_response(start, end, users, get_busy_intervals(list(users), start, end))
+
+    def get_usernames(self, request):
+        usernames = [username for username in request.query_params.get('users', '').split(',') if username]
+        if not usernames:
+            return usernames, Response({"users": "This query parameter is required."},
+                                       status=status.HTTP_400_BAD_REQUEST)
+        if len(usernames) > self.max_users:
+            return usernames, Response({"users": f"At most {self.max_users} users can be queried at once."},
+                                       status=status.HTTP_400_BAD_REQUEST)
+        return usernames, None
+
+    @staticmethod
+    def check_users_exist(usernames, users):
+        missing = set(usernames) - set(users.values())
+        if missing:
+            return Response({"message": f"User with username '{sorted(missing)[0]}' does not exist."},
+                            status=status.HTTP_404_NOT_FOUND)
+        return None
+
+    def get_busy_response(self, start, end, users, busy):
+        combined = merge_intervals(interval for intervals in busy.values() for interval in intervals)
+        data = {
+            'start': start,
+            'end': end,
+            'busy': self._as_dicts(combined),
+            'users': {users[user_id]: self._as_dicts(intervals) for user_id, intervals in busy.items()},
+        }
+        return Response(FreeBusySerializer(data).data, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _as_dicts(intervals):
+        return [{'start': start, 'end': end} for start, end in intervals]
+
+
+class AgendaView(ReplicaReadMixin, ListAPIView):
+    """
+    The events of every calendar the user is a member of, in the same order, filters and pages as
+    /api/events/, read from the user's range of the agenda table.
+    """
+    serializer_class = EventSerializer
+    permission_classes = (IsAuthenticated,)
+    filter_backends = (EventWindowFilter,)
+    pagination_class = AgendaCursorPagination
+
+    def get_queryset(self):
+        if agenda.is_enabled():
+            return AgendaEntry.objects.filter(user=self.request.user).select_related('event')
+        return Event.objects.filter(calendar__users=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        events = [entry.event if isinstance(entry, AgendaEntry) else entry for entry in page]
+        return self.get_paginated_response(self.get_serializer(events, many=True).data)
+
+
+class SyncView(GenericAPIView):
+    """
+    Changes to the user's calendars and their events since ``?token=``, plus the token for the next call.
+    Without a token, everything is returned. Reads stay on the primary: a lagging replica could hide
+    changes from before the token it hands out.
+    """
+    permission_classes = (IsAuthenticated,)
+    serializer_class = SyncSerializer
+
+    @extend_schema(parameters=[
+        OpenApiParameter('token', OpenApiTypes.STR, description="Token returned by the previous sync"),
+    ], responses={
+        "200": SyncSerializer,
+        "400": OpenApiResponse(description="Invalid token"),
+        "410": OpenApiResponse(description="Token too old, start over without one"),
+    })
+    def get(self, request):
+        since, known_calendar_ids = None, frozenset()
+        token = request.query_params.get('token')
+        if token:
+            try:
+                since, known_calendar_ids = sync.load_token(token, request.user.pk)
+            except signing.BadSignature:
+                return Response({"message": "This sync token is not valid."}, status=status.HTTP_400_BAD_REQUEST)
+            except sync.ExpiredSyncToken:
+                return Response({"message": "This sync token has expired, sync again without it."},
+                                status=status.HTTP_410_GONE)
+        changes = sync.get_changes(request.user.pk, get_calendar_ids(request.user.pk), since, known_calendar_ids)
+        return Response(SyncSerializer(changes).data, status=status.HTTP_200_OK)
+
+
+class MetricsView(GenericAPIView):
+    permission_classes = (IsAdminUser,)
+    serializer_class = CalendarEmptySerializer
+    renderer_classes = (PrometheusRenderer, *api_settings.DEFAULT_RENDERER_CLASSES)
+
+    @extend_schema(responses={
+        (200, 'text/plain'): OpenApiResponse(response=OpenApiTypes.STR, description="Prometheus text format"),
+    })
+    def get(self, request):
+        return Response(metrics.registry.render() + directory.render_metrics() + admission.render_metrics(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_calendar.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up; the change stream is served here, next to Django, so it sees disconnects.
+from core.streams import STREAM_PATH, ChangeStream  # noqa: E402
+
+change_stream = ChangeStream()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        return await change_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
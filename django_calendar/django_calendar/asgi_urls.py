@@ -0,0 +1,32 @@
+"""
+The URLconf of requests served through ASGI (see ``core.middleware.AsyncRoutesMiddleware``): the async
+front-ends of the hot read endpoints in place of the DRF routes they fall back to. Under WSGI they would
+only add a thread hop per request, so ``ROOT_URLCONF`` serves the DRF views directly and describes the API
+in the schema.
+"""
+from django.urls import URLResolver, path
+
+from core.async_views import CalendarListAsyncView, EventDetailAsyncView, EventListAsyncView, FreeBusyAsyncView
+from .urls import urlpatterns as root_urlpatterns
+
+async_urlpatterns = [
+    path('api/events/', EventListAsyncView.as_view(), name='events-list'),
+    path('api/events/<int:pk>/', EventDetailAsyncView.as_view(), name='events-detail'),
+    path('api/calendars/', CalendarListAsyncView.as_view(), name='calendars-list'),
+    path('api/freebusy/', FreeBusyAsyncView.as_view(), name='freebusy'),
+]
+
+
+def _without(patterns, names):
+    """``patterns`` without the routes named ``names``, so that every name is registered once."""
+    kept = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            kept.append(URLResolver(pattern.pattern, _without(pattern.url_patterns, names), pattern.default_kwargs,
+                                    pattern.app_name, pattern.namespace))
+        elif pattern.name not in names:
+            kept.append(pattern)
+    return kept
+
+
+urlpatterns = async_urlpatterns + _without(root_urlpatterns, {pattern.name for pattern in async_urlpatterns})
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +47,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.AsyncRoutesMiddleware',
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.AdmissionControlMiddleware',
+    'core.middleware.DatabaseRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,6 +62,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'django_calendar.urls'
 
+# Requests served through ASGI also get the async read views (core.async_views).
+ASGI_URLCONF = 'django_calendar.asgi_urls'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -85,6 +94,18 @@ DATABASES = {
     }
 }
 
+# Set DJANGO_CALENDAR_REPLICA_DB to the path of a copy of db.sqlite3 to try read replicas locally. Tests always
+# get the alias, as a test database of its own: core.tests.test_routing checks which database each read comes from.
+REPLICA_DB = os.environ.get('DJANGO_CALENDAR_REPLICA_DB')
+TESTING = sys.argv[1:2] == ['test']
+if REPLICA_DB or TESTING:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPLICA_DB or BASE_DIR / 'replica.sqlite3',
+    }
+
+DATABASE_ROUTERS = ['core.routing.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -131,7 +152,7 @@ AUTH_USER_MODEL = 'user.CustomUser'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'user.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -143,3 +164,112 @@ SPECTACULAR_SETTINGS = {
     'SERVE_INCLUDE_SCHEMA': False,
 }
 
+# Per-process cache of the calendar ids each user is a member of
+CALENDAR_MEMBERSHIP_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 60,
+}
+
+# Per-process cache of expanded occurrences of recurring events, keyed by series and window
+CALENDAR_OCCURRENCE_CACHE = {
+    'MAXSIZE': 4096,
+    'TTL': None,
+}
+
+# Cache of token -> user used by user.authentication.CachedTokenAuthentication.
+# 'local' keeps a per-process cache, so logouts only take effect immediately in the worker
+# that handled them (others notice after TTL seconds); use 'shared' with CACHE_ALIAS pointing
+# at a cache all workers share when running more than one process (the user.W002 deploy check warns otherwise).
+TOKEN_AUTH_CACHE = {
+    'BACKEND': 'local',
+    'CACHE_ALIAS': 'default',
+    'MAXSIZE': 10000,
+    'TTL': 60,
+}
+
+# Per-view request metrics collected by core.middleware.PerformanceMiddleware and served at /api/metrics.
+# SERVER_TIMING adds the request's app and DB time to every response in a Server-Timing header.
+CALENDAR_METRICS = {
+    'SERVER_TIMING': True,
+}
+
+# Aliases in DATABASES that serve reads of safe requests to the calendar, event and user viewsets.
+# After a write, the writer reads from the primary for STICKY_SECONDS; pins are kept in the CACHE_ALIAS
+# cache, which must be shared between workers for pins to follow users across processes.
+CALENDAR_DATABASE_ROUTING = {
+    # Tests that read from the replica turn it on themselves.
+    'READ_REPLICAS': ['replica'] if REPLICA_DB and not TESTING else [],
+    'STICKY_SECONDS': 5,
+    'CACHE_ALIAS': 'default',
+}
+
+# Per-user agenda table behind /api/agenda/, kept up to date on every event and membership write.
+# Fill it for existing data with `manage.py backfill_agenda`; when disabled, /api/agenda/ joins events instead.
+CALENDAR_AGENDA = {
+    'ENABLED': True,
+}
+
+# Delta sync at /api/sync/. Tokens are accepted for TOMBSTONE_RETENTION_DAYS (prune older tombstones with
+# `manage.py prune_tombstones`); each token reaches SETTLE_SECONDS back to cover writes still committing.
+CALENDAR_SYNC = {
+    'TOMBSTONE_RETENTION_DAYS': 30,
+    'SETTLE_SECONDS': 5,
+}
+
+# Change notifications pushed as server-sent events at /api/stream/ (see core.streams, served by asgi.py).
+# LocalBackend only reaches clients connected to the same process; with several workers use
+# 'core.pubsub.RedisBackend' with OPTIONS {'url': ...} (needs the redis package; 'reconnect_delay' and
+# 'max_reconnect_delay' bound its backoff, in seconds, when the connection to Redis drops).
+CALENDAR_PUBSUB = {
+    'BACKEND': 'core.pubsub.LocalBackend',
+    'OPTIONS': {},
+    'HEARTBEAT_SECONDS': 15,
+    'QUEUE_SIZE': 100,
+}
+
+# Cache of the /api/users/ list and detail responses, invalidated by user, calendar and membership writes.
+# Entries live in the CACHE_ALIAS cache for at most TTL seconds. Invalidations only reach the cache they are
+# made in: with several workers, use a shared cache (`manage.py check --deploy` warns about a local-memory
+# one, whose other workers would serve stale entries for up to TTL). Hits and misses are counted at /api/metrics.
+USER_DIRECTORY_CACHE = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TTL': 30,
+}
+
+# Load shedding by core.middleware.AdmissionControlMiddleware, per process. Requests take one of CONCURRENCY
+# slots of their class (writes, reads of HEAVY_VIEWS, other reads) or wait up to QUEUE_TIMEOUT seconds in a
+# queue of QUEUE_SIZE; beyond that they get a 503 with Retry-After: RETRY_AFTER. Each token may send
+# TOKEN_BURST requests at once, refilled at TOKEN_RATE per second (429 beyond). Decisions are counted at
+# /api/metrics.
+CALENDAR_ADMISSION = {
+    'ENABLED': True,
+    'LIMITS': {
+        'read': {'CONCURRENCY': 32, 'QUEUE_SIZE': 64},
+        'heavy': {'CONCURRENCY': 4, 'QUEUE_SIZE': 8},
+        'write': {'CONCURRENCY': 8, 'QUEUE_SIZE': 16},
+    },
+    'HEAVY_VIEWS': ['events-list', 'events-occurrences', 'events-conflicts', 'events-summary', 'events-search',
+                    'calendars-list', 'users-list', 'calendar-export', 'agenda', 'sync', 'freebusy'],
+    'EXEMPT_VIEWS': ['metrics'],
+    'QUEUE_TIMEOUT': 1.0,
+    'RETRY_AFTER': 1,
+    'TOKEN_RATE': 20,
+    'TOKEN_BURST': 200,
+}
+
+# Overlapping events. /api/events/conflicts/ always lists them; with REJECT_OVERLAPS, creating or updating an
+# event that overlaps another event of its calendar fails with a 409 (a series is checked for its first
+# HORIZON_DAYS days). Events without an end take no time and never overlap.
+CALENDAR_CONFLICTS = {
+    'REJECT_OVERLAPS': False,
+    'HORIZON_DAYS': 365,
+}
+
+# Bucketed event counts at /api/events/summary/, cached in the CACHE_ALIAS cache for TTL seconds under the
+# versions of the calendars counted, so an event write is never hidden by the cache.
+CALENDAR_SUMMARY = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TTL': 3600,
+}
@@ -4,7 +4,8 @@ from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework.routers import SimpleRouter
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
-from core.views import CalendarViewSet, CalendarUserManager, EventViewSet
+from core.views import (AgendaView, CalendarViewSet, CalendarUserManager, CalendarExportView, CalendarImportView,
+                        EventViewSet, FreeBusyView, MetricsView, SyncView)
 from user.views import CustomUserViewSet, LogOutView
 
 router = SimpleRouter()
@@ -19,6 +20,12 @@ urlpatterns = [
     path('api/logout/', LogOutView.as_view(), name='api-logout'),
     path('api/calendars/<int:pk>/add_users/', CalendarUserManager.as_view(), name='add-users'),
     path('api/calendars/<int:pk>/remove_users/', CalendarUserManager.as_view(), name='remove-users'),
+    path('api/calendars/<int:pk>/export.ics', CalendarExportView.as_view(), name='calendar-export'),
+    path('api/calendars/<int:pk>/import.ics', CalendarImportView.as_view(), name='calendar-import'),
+    path('api/freebusy/', FreeBusyView.as_view(), name='freebusy'),
+    path('api/agenda/', AgendaView.as_view(), name='agenda'),
+    path('api/sync/', SyncView.as_view(), name='sync'),
+    path('api/metrics', MetricsView.as_view(), name='metrics'),
     path('api/schema', SpectacularAPIView.as_view(), name="api-schema"),
     path('api/schema/docs', SpectacularSwaggerView.as_view(url_name="api-schema")),
 ]
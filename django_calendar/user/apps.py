@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        from .authentication import check_shared_token_cache
+        from .directory import check_shared_cache
+        checks.register(check_shared_cache, deploy=True)
+        checks.register(check_shared_token_cache, deploy=True)
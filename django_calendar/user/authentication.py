@@ -0,0 +1,128 @@
+import pickle
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from core.cache import LRUCache
+
+_cache_settings = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+
+
+class LocalTokenCache:
+    def __init__(self, maxsize, ttl):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    async def aget(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+    async def aset(self, key, value):
+        self._cache.set(key, value)
+
+    def delete_many(self, keys):
+        self._cache.delete_many(keys)
+
+
+class SharedTokenCache:
+    """
+    Stores tokens in one of Django's configured caches so every worker sees the same invalidations.
+    """
+
+    key_prefix = 'token-auth:'
+
+    def __init__(self, alias, ttl):
+        self.alias = alias
+        self.ttl = ttl
+
+    def get(self, key):
+        return caches[self.alias].get(self.key_prefix + key)
+
+    async def aget(self, key):
+        return await caches[self.alias].aget(self.key_prefix + key)
+
+    def set(self, key, value):
+        caches[self.alias].set(self.key_prefix + key, value, self.ttl)
+
+    async def aset(self, key, value):
+        await caches[self.alias].aset(self.key_prefix + key, value, self.ttl)
+
+    def delete_many(self, keys):
+        caches[self.alias].delete_many([self.key_prefix + key for key in keys])
+
+
+def _create_token_cache():
+    if _cache_settings.get('BACKEND', 'local') == 'shared':
+        return SharedTokenCache(_cache_settings.get('CACHE_ALIAS', 'default'), _cache_settings.get('TTL', 60))
+    return LocalTokenCache(_cache_settings.get('MAXSIZE', 10000), _cache_settings.get('TTL', 60))
+
+
+token_cache = _create_token_cache()
+
+
+def invalidate_tokens(keys):
+    token_cache.delete_many(list(keys))
+
+
+def check_shared_token_cache(app_configs=None, **kwargs):
+    """
+    Deployment check: a logout only evicts the token from the cache of the process that handled it, so with a
+    per-process cache the other workers keep accepting the token for up to TTL seconds.
+    """
+    cache_settings = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+    if cache_settings.get('BACKEND', 'local') == 'shared':
+        if not isinstance(caches[cache_settings.get('CACHE_ALIAS', 'default')], LocMemCache):
+            return []
+        message = "TOKEN_AUTH_CACHE uses a local-memory cache, which isn't shared between worker processes."
+    else:
+        message = "TOKEN_AUTH_CACHE uses the 'local' backend, which keeps a cache per worker process."
+    return [checks.Warning(
+        message,
+        hint="Set BACKEND to 'shared' with CACHE_ALIAS pointing at a shared cache (Redis, Memcached, database) "
+             "when running several workers, so revoked tokens stop working everywhere at once.",
+        id='user.W002',
+    )]
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``TokenAuthentication`` that remembers which user a token belongs to, skipping the
+    token/user query for tokens seen recently. Entries are pickled so requests never share
+    the same user instance.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return pickle.loads(cached)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, pickle.dumps((user, token), protocol=pickle.HIGHEST_PROTOCOL))
+        return user, token
+
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of ``authenticate`` for views running on the event loop. Returns ``None`` both
+        without a token and for an invalid one, so the error response is left to the regular sync path.
+        """
+        auth = get_authorization_header(request).split()
+        if len(auth) != 2 or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            return None
+        cached = await token_cache.aget(key)
+        if cached is not None:
+            return pickle.loads(cached)
+        token = await self.get_model().objects.select_related('user').filter(key=key).afirst()
+        if token is None or not token.user.is_active:
+            return None
+        await token_cache.aset(key, pickle.dumps((token.user, token), protocol=pickle.HIGHEST_PROTOCOL))
+        return token.user, token
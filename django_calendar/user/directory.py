@@ -0,0 +1,130 @@
+import threading
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+LIST = 'list'
+RETRIEVE = 'retrieve'
+KEY_PREFIX = 'user-directory'
+
+
+class Counters:
+    def __init__(self):
+        self.hits = dict.fromkeys((LIST, RETRIEVE), 0)
+        self.misses = dict.fromkeys((LIST, RETRIEVE), 0)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, hit):
+        with self._lock:
+            (self.hits if hit else self.misses)[endpoint] += 1
+
+    def clear(self):
+        with self._lock:
+            self.hits = dict.fromkeys(self.hits, 0)
+            self.misses = dict.fromkeys(self.misses, 0)
+
+    def as_dict(self):
+        with self._lock:
+            return {'hits': dict(self.hits), 'misses': dict(self.misses)}
+
+
+def _settings():
+    return getattr(settings, 'USER_DIRECTORY_CACHE', {})
+
+
+counters = Counters()
+# Bumped by ``clear_cache`` so this process stops seeing the entries it wrote before.
+_generation = 0
+
+
+def is_enabled():
+    return _settings().get('ENABLED', True)
+
+
+def _cache():
+    return caches[_settings().get('CACHE_ALIAS', 'default')]
+
+
+def _list_key():
+    return f'{KEY_PREFIX}:{_generation}:list'
+
+
+def _user_key(user_id):
+    return f'{KEY_PREFIX}:{_generation}:user:{user_id}'
+
+
+def _cached_response(endpoint, key, respond):
+    if not is_enabled():
+        return respond()
+    data = _cache().get(key)
+    counters.record(endpoint, data is not None)
+    if data is not None:
+        return Response(data)
+    response = respond()
+    if response.status_code == status.HTTP_200_OK:
+        _cache().set(key, response.data, _settings().get('TTL', 30))
+    return response
+
+
+def cached_list(respond):
+    """Returns the cached /api/users/ response, or caches the one ``respond()`` builds."""
+    return _cached_response(LIST, _list_key(), respond)
+
+
+def cached_user(user_id, respond):
+    """Returns the cached /api/users/<id>/ response, or caches the one ``respond()`` builds."""
+    return _cached_response(RETRIEVE, _user_key(user_id), respond)
+
+
+def invalidate(user_ids=(), user_list=False):
+    """
+    Drops the cached details of ``user_ids`` (and the list if ``user_list``) now and again once the
+    current transaction commits, so a read racing the write can't put the old data back for long.
+    """
+    if not is_enabled():
+        return
+    keys = [_user_key(user_id) for user_id in user_ids]
+    if user_list:
+        keys.append(_list_key())
+    if not keys:
+        return
+    _cache().delete_many(keys)
+    transaction.on_commit(lambda: _cache().delete_many(keys), robust=True)
+
+
+def check_shared_cache(app_configs=None, **kwargs):
+    """
+    Deployment check: invalidations only reach the cache of the process that wrote, so with a per-process
+    cache the other workers serve stale users and memberships for up to TTL seconds.
+    """
+    if not is_enabled() or not isinstance(_cache(), LocMemCache):
+        return []
+    return [checks.Warning(
+        "USER_DIRECTORY_CACHE uses a local-memory cache, which isn't shared between worker processes.",
+        hint="Point CACHE_ALIAS at a shared cache (Redis, Memcached, database) when running several workers, "
+             "or disable the directory cache.",
+        id='user.W001',
+    )]
+
+
+def render_metrics():
+    """The hit and miss counters in the Prometheus text exposition format."""
+    lines = []
+    for kind, values in counters.as_dict().items():
+        name = f'calendar_user_directory_cache_{kind}_total'
+        lines.append(f'# HELP {name} Cache {kind} of /api/users/ responses, by endpoint.')
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(f'{name}{{endpoint="{endpoint}"}} {count}' for endpoint, count in values.items())
+    return '\n'.join(lines) + '\n'
+
+
+def clear_cache():
+    """Forgets every entry this process cached and resets the counters."""
+    global _generation
+    _generation += 1
+    counters.clear()
@@ -1,9 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from rest_framework.authtoken.models import Token
 
+from . import directory
+from .authentication import invalidate_tokens
+
 
 class CustomUser(AbstractUser):
     class Meta:
@@ -18,3 +21,27 @@ class CustomUser(AbstractUser):
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     if created:
         Token.objects.create(user=instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_tokens(sender, instance=None, created=False, **kwargs):
+    if not created:
+        invalidate_tokens(Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance=None, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_directory_on_user_save(sender, instance=None, update_fields=None, **kwargs):
+    # Logins only save last_login, which the directory doesn't show.
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    directory.invalidate([instance.pk], user_list=True)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_directory_on_user_delete(sender, instance=None, **kwargs):
+    directory.invalidate([instance.pk], user_list=True)
@@ -1,8 +1,11 @@
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase, APIClient
 
+from user import directory
+from user.authentication import check_shared_token_cache
 from user.models import CustomUser
 from user.serializers import CustomUserShortSerializer
 
@@ -22,6 +25,7 @@ def authenticate_client(client, token):
 
 class CalendarTestCase(APITestCase):
     def setUp(self):
+        directory.clear_cache()
         self.client = APIClient()
         self.test_user_data = {
             "username": "test_user",
@@ -63,3 +67,34 @@ class CalendarTestCase(APITestCase):
         users = CustomUserShortSerializer([self.test_user, user], many=True).data
         response = self.client.get(reverse('users-list'))
         self.assertEquals(response.data, users)
+
+    def test_token_is_cached(self):
+        authenticate_client(self.client, get_user_token(self.test_user))
+        self.client.get(reverse('users-list'))
+        directory.clear_cache()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('users-list'))
+        self.assertEquals(response.status_code, status.HTTP_200_OK)
+
+    def test_logout_invalidates_cached_token(self):
+        authenticate_client(self.client, get_user_token(self.test_user))
+        self.client.get(reverse('users-list'))
+        self.client.post(reverse('api-logout'), format='json')
+        response = self.client.get(reverse('users-list'))
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_invalidates_cached_token(self):
+        authenticate_client(self.client, get_user_token(self.test_user))
+        self.client.get(reverse('users-list'))
+        self.test_user.is_active = False
+        self.test_user.save()
+        response = self.client.get(reverse('users-list'))
+        self.assertEquals(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deploy_check_warns_about_per_process_token_cache(self):
+        self.assertEquals([warning.id for warning in check_shared_token_cache()], ['user.W002'])
+        with override_settings(TOKEN_AUTH_CACHE={'BACKEND': 'shared'}):
+            self.assertEquals([warning.id for warning in check_shared_token_cache()], ['user.W002'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+        with override_settings(TOKEN_AUTH_CACHE={'BACKEND': 'shared'}, CACHES=shared):
+            self.assertEquals(check_shared_token_cache(), [])
@@ -0,0 +1,111 @@
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core import membership
+from core.tests.test_api import create_calendar
+from user import directory
+from user.tests.test_api import authenticate_client, create_user, get_user_token
+
+
+class UserDirectoryCacheTestCase(APITestCase):
+    def setUp(self):
+        membership.clear_cache()
+        directory.clear_cache()
+        self.user1 = create_user("test1", "test")
+        self.user2 = create_user("test2", "test")
+        authenticate_client(self.client, get_user_token(self.user1))
+        self.calendar = create_calendar("calendar", self.user1, [self.user1, self.user2])
+        self.list_url = reverse("users-list")
+        self.detail_url = reverse("users-detail", kwargs={"pk": self.user2.pk})
+
+    def get_cached(self, url):
+        # Warms the cache (and the token cache), then expects the response without touching the database.
+        expected = self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEquals(response.data, expected.data)
+        return response
+
+    def test_list_and_retrieve_are_cached(self):
+        self.assertEquals(self.get_cached(self.list_url).data, [{"username": "test1"}, {"username": "test2"}])
+        self.assertEquals(self.get_cached(self.detail_url).data["calendar_set"][0]["name"], "calendar")
+        self.assertEquals(directory.counters.as_dict(),
+                          {"hits": {"list": 1, "retrieve": 1}, "misses": {"list": 1, "retrieve": 1}})
+
+    def test_missing_user_is_not_cached(self):
+        url = reverse("users-detail", kwargs={"pk": 999})
+        self.assertEquals(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        create_user("test3", "test")
+        self.assertEquals(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEquals(directory.counters.as_dict()["hits"]["retrieve"], 0)
+
+    def test_user_changes_invalidate(self):
+        self.get_cached(self.list_url)
+        self.get_cached(self.detail_url)
+        self.user2.username = "renamed"
+        self.user2.save()
+        self.assertEquals(self.client.get(self.list_url).data[1], {"username": "renamed"})
+        self.assertEquals(self.client.get(self.detail_url).data["username"], "renamed")
+        create_user("test3", "test")
+        self.assertEquals(len(self.client.get(self.list_url).data), 3)
+        self.user2.delete()
+        self.assertEquals(self.client.get(self.detail_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEquals(len(self.client.get(self.list_url).data), 2)
+
+    def test_login_keeps_entries(self):
+        self.get_cached(self.list_url)
+        self.user1.save(update_fields=["last_login"])
+        # Only the token, whose cache entry any save drops.
+        with self.assertNumQueries(1):
+            self.client.get(self.list_url)
+
+    def test_calendar_changes_invalidate_members(self):
+        other_url = reverse("users-detail", kwargs={"pk": self.user1.pk})
+        self.get_cached(self.detail_url)
+        self.get_cached(other_url)
+        self.calendar.name = "renamed"
+        self.calendar.save()
+        self.assertEquals(self.client.get(self.detail_url).data["calendar_set"][0]["name"], "renamed")
+        self.assertEquals(self.client.get(other_url).data["calendar_set"][0]["name"], "renamed")
+        self.calendar.delete()
+        self.assertEquals(self.client.get(self.detail_url).data["calendar_set"], [])
+
+    def test_unrelated_calendar_keeps_entries(self):
+        self.get_cached(self.detail_url)
+        create_calendar("other", self.user1, [self.user1])
+        with self.assertNumQueries(0):
+            self.client.get(self.detail_url)
+
+    def test_membership_changes_invalidate(self):
+        self.get_cached(self.detail_url)
+        self.client.post(reverse("remove-users", kwargs={"pk": self.calendar.pk}), {"users": ["test2"]},
+                         format="json")
+        self.assertEquals(self.client.get(self.detail_url).data["calendar_set"], [])
+        self.user2.calendar_set.add(self.calendar)
+        self.assertEquals(len(self.client.get(self.detail_url).data["calendar_set"]), 1)
+        self.calendar.users.clear()
+        self.assertEquals(self.client.get(self.detail_url).data["calendar_set"], [])
+
+    @override_settings(USER_DIRECTORY_CACHE={"ENABLED": False})
+    def test_disabled(self):
+        self.client.get(self.list_url)
+        with self.assertNumQueries(1):
+            self.client.get(self.list_url)
+
+    def test_metrics(self):
+        self.get_cached(self.list_url)
+        authenticate_client(self.client, get_user_token(create_user("admin", "test", is_staff=True)))
+        content = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('calendar_user_directory_cache_hits_total{endpoint="list"} 1', content)
+        self.assertIn('calendar_user_directory_cache_misses_total{endpoint="list"} 1', content)
+        self.assertIn('calendar_user_directory_cache_hits_total{endpoint="retrieve"} 0', content)
+
+    def test_deploy_check_warns_about_local_memory_cache(self):
+        self.assertEquals([warning.id for warning in directory.check_shared_cache()], ["user.W001"])
+        shared = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "cache"}}
+        with override_settings(CACHES=shared):
+            self.assertEquals(directory.check_shared_cache(), [])
+        with override_settings(USER_DIRECTORY_CACHE={"ENABLED": False}):
+            self.assertEquals(directory.check_shared_cache(), [])
@@ -1,3 +1,5 @@
+from functools import partial
+
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -6,20 +8,37 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
+from core.representation import FastListMixin
+from core.routing import ReplicaReadMixin
+from . import directory
 from .models import CustomUser
 from .permissions import IsAuthenticatedWithoutCreate
 from .serializers import CustomUserSerializer, CustomUserShortSerializer, CustomUserEmptySerializer
 
 
-class CustomUserViewSet(ModelViewSet):
+class CustomUserViewSet(ReplicaReadMixin, FastListMixin, ModelViewSet):
     queryset = CustomUser.objects.all()
     permission_classes = (IsAuthenticatedWithoutCreate,)
 
+    def get_queryset(self):
+        if self.action == "list":
+            return self.queryset.order_by('id')
+        return self.queryset.prefetch_related('calendar_set')
+
     def get_serializer_class(self):
         if self.action == "list":
             return CustomUserShortSerializer
         return CustomUserSerializer
 
+    def list(self, request, *args, **kwargs):
+        return directory.cached_list(partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        respond = partial(super().retrieve, request, *args, **kwargs)
+        if not self.kwargs['pk'].isdigit():
+            return respond()
+        return directory.cached_user(int(self.kwargs['pk']), respond)
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)